@@ -0,0 +1,124 @@
+"""
+JSON codec benchmark
+
+Measures SDCP messages/sec through the inbound hot path:
+
+- the legacy pipeline (stdlib json.loads, an eager json.dumps(indent=4) for
+  the debug log even at INFO level, and a stdlib encode for the emit)
+  against core.codec with every installed backend;
+- main.ws_msg_handler end to end, in a child process per backend
+  (selected with CHITUI_JSON).
+
+Usage:
+    python3 benchmarks/bench_codec.py [--messages 20000]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_printer import FakePrinter  # noqa: E402
+
+BACKENDS = ('json', 'ujson', 'orjson')
+
+
+def sample_frames(count):
+    """Return `count` raw SDCP frames: mostly status, some responses/attributes"""
+    fleet = [FakePrinter(i) for i in range(20)]
+    frames = []
+    for i in range(count):
+        printer = fleet[i % len(fleet)]
+        if i % 10 == 0:
+            request = {"Id": "x", "Data": {"Cmd": 258, "RequestID": f"{i:016x}"}}
+            message = printer.response_message(request)
+        elif i % 10 == 1:
+            message = printer.attributes_message()
+        else:
+            message = printer.status_message()
+        frames.append(json.dumps(message))
+    return frames
+
+
+def rate(frames, handle):
+    start = time.perf_counter()
+    for frame in frames:
+        handle(frame)
+    return len(frames) / (time.perf_counter() - start)
+
+
+def legacy(frame):
+    data = json.loads(frame)
+    json.dumps(data, indent=4)
+    json.dumps(data, separators=(',', ':'))
+
+
+def run_child(messages):
+    """Feed frames through main.ws_msg_handler and print messages/sec"""
+    import main
+
+    class Conn:
+        printer_id = None
+
+        def ack(self, request_id):
+            pass
+
+    client = main.socketio.test_client(main.app)
+    frames = sample_frames(messages)
+    conn = Conn()
+    result = rate(frames, lambda frame: main.ws_msg_handler(conn, frame))
+    client.disconnect()
+    print(json.dumps({'backend': main.codec.BACKEND, 'rate': result}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--messages', type=int, default=20000)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.messages)
+        return
+
+    frames = sample_frames(args.messages)
+    print(f"{args.messages} SDCP frames, {sum(map(len, frames)) / len(frames):.0f} B average")
+    print(f"{'pipeline':<28} {'msgs/sec':>12}")
+    print(f"{'legacy (stdlib, eager dump)':<28} {rate(frames, legacy):>12,.0f}")
+
+    available = []
+    for backend in BACKENDS:
+        env = dict(os.environ, CHITUI_JSON=backend)
+        probe = subprocess.run([sys.executable, '-c', 'from core import codec; print(codec.BACKEND)'],
+                               cwd=ROOT, env=env, capture_output=True, text=True)
+        if probe.stdout.strip() == backend:
+            available.append(backend)
+
+    for backend in available:
+        code = ("import sys, time; sys.path.insert(0, 'benchmarks'); from bench_codec import sample_frames, rate;"
+                "from core import codec;"
+                f"frames = sample_frames({args.messages});"
+                "print(rate(frames, lambda f: codec.dumps(codec.loads(f))))")
+        out = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True,
+                             env=dict(os.environ, CHITUI_JSON=backend))
+        print(f"{'codec (' + backend + ')':<28} {float(out.stdout.strip()):>12,.0f}")
+
+    print()
+    print(f"{'ws_msg_handler':<28} {'msgs/sec':>12}")
+    for backend in available:
+        env = dict(os.environ, CHITUI_JSON=backend)
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), '--child',
+                              '--messages', str(args.messages)],
+                             cwd=ROOT, env=env, capture_output=True, text=True)
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"{'main (' + result['backend'] + ')':<28} {result['rate']:>12,.0f}")
+
+
+if __name__ == '__main__':
+    main()
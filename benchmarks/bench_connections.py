@@ -0,0 +1,112 @@
+"""
+Connection engine benchmark
+
+Compares the legacy thread-per-printer websocket-client setup against the
+asyncio ConnectionEngine at 5, 20 and 50 simulated printers, reporting RSS,
+OS thread count and CPU time spent receiving status streams.
+
+Usage:
+    python3 benchmarks/bench_connections.py [--duration 10] [--hz 2]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_printer import start_fleet  # noqa: E402
+
+
+def read_proc_status():
+    """Return (rss_kb, threads) for the current process from /proc"""
+    rss_kb, threads = 0, 0
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                rss_kb = int(line.split()[1])
+            elif line.startswith('Threads:'):
+                threads = int(line.split()[1])
+    return rss_kb, threads
+
+
+def run_child(mode, urls, duration):
+    """Connect to every URL using `mode` and report resource usage as JSON"""
+    received = [0]
+    count_lock = threading.Lock()
+
+    def on_message(_, msg):
+        with count_lock:
+            received[0] += 1
+
+    if mode == 'threads':
+        import websocket
+        websocket.setdefaulttimeout(1)
+        for url in urls:
+            ws = websocket.WebSocketApp(url, on_message=on_message)
+            threading.Thread(target=lambda ws=ws: ws.run_forever(reconnect=1), daemon=True).start()
+    else:
+        from core import ConnectionEngine
+        engine = ConnectionEngine(on_message=on_message)
+        for i, url in enumerate(urls):
+            engine.connect(str(i), url, f"printer-{i}")
+
+    time.sleep(2)  # warm up and let every connection open
+    with count_lock:
+        received[0] = 0
+    cpu_start = time.process_time()
+    time.sleep(duration)
+    cpu = time.process_time() - cpu_start
+    rss_kb, threads = read_proc_status()
+    print(json.dumps({
+        'rss_kb': rss_kb,
+        'threads': threads,
+        'cpu_s': round(cpu, 3),
+        'messages': received[0],
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--hz', type=float, default=2.0)
+    parser.add_argument('--sizes', default='5,20,50')
+    parser.add_argument('--child', choices=['threads', 'engine'])
+    parser.add_argument('urls', nargs='*')
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.urls, args.duration)
+        return
+
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+
+    print(f"{'printers':>8} {'mode':>8} {'RSS MB':>8} {'threads':>8} {'CPU s':>8} {'msgs':>8} {'CPU ms/1k msgs':>15}")
+    for size in [int(n) for n in args.sizes.split(',')]:
+        fleet = asyncio.run_coroutine_threadsafe(start_fleet(size, status_hz=args.hz), loop).result()
+        urls = [p.url for p in fleet]
+        for mode in ('threads', 'engine'):
+            out = subprocess.run([sys.executable, __file__, '--child', mode,
+                                  '--duration', str(args.duration)] + urls,
+                                 capture_output=True, text=True)
+            if out.returncode != 0:
+                print(f"{size:>8} {mode:>8} failed: {out.stderr.strip().splitlines()[-1]}")
+                continue
+            r = json.loads(out.stdout.strip().splitlines()[-1])
+            per_k = r['cpu_s'] * 1000 / max(r['messages'], 1) * 1000
+            print(f"{size:>8} {mode:>8} {r['rss_kb'] / 1024:>8.1f} {r['threads']:>8} "
+                  f"{r['cpu_s']:>8.2f} {r['messages']:>8} {per_k:>15.1f}")
+        for printer in fleet:
+            asyncio.run_coroutine_threadsafe(printer.stop(), loop).result()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Discovery subnet sweep benchmark
+
+Hides fake printers at random loopback addresses inside a 127.0.0.0/22
+range (each answering the M99999 probe on UDP :3000) and measures how long
+DiscoveryService.scan() takes to find them, including time to the first
+and last reply.
+
+Usage:
+    python3 benchmarks/bench_discovery.py [--subnet 127.0.0.0/22] [--printers 10] [--window 256]
+"""
+
+import argparse
+import asyncio
+import ipaddress
+import os
+import random
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from core import DiscoveryService  # noqa: E402
+from fake_printer import FakePrinter  # noqa: E402
+
+
+def start_responders(hosts):
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+
+    async def start():
+        fleet = [FakePrinter(i, host=host) for i, host in enumerate(hosts)]
+        for printer in fleet:
+            await printer.start_discovery()
+        return fleet
+
+    return asyncio.run_coroutine_threadsafe(start(), loop).result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--subnet', default='127.0.0.0/22')
+    parser.add_argument('--printers', type=int, default=10)
+    parser.add_argument('--window', type=int, default=256)
+    parser.add_argument('--probe-timeout', type=float, default=0.5)
+    args = parser.parse_args()
+
+    network = ipaddress.ip_network(args.subnet)
+    candidates = [str(h) for h in network.hosts() if str(h) != '127.0.0.1']
+    hosts = random.sample(candidates, args.printers)
+    start_responders(hosts)
+
+    arrivals = []
+    started = time.monotonic()
+    service = DiscoveryService(on_result=lambda pid, p: arrivals.append(time.monotonic() - started),
+                               interval=None, bind_port=0, window=args.window,
+                               probe_timeout=args.probe_timeout)
+    found = service.scan([args.subnet])
+    elapsed = time.monotonic() - started
+
+    print(f"subnet:       {args.subnet} ({network.num_addresses - 2} hosts)")
+    print(f"window:       {args.window} probes, {args.probe_timeout}s probe timeout")
+    print(f"found:        {len(found)}/{args.printers} printers")
+    if arrivals:
+        print(f"first reply:  {arrivals[0] * 1000:.0f} ms")
+        print(f"last reply:   {arrivals[-1] * 1000:.0f} ms")
+    print(f"scan total:   {elapsed:.2f} s")
+
+
+if __name__ == '__main__':
+    main()
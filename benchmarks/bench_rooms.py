@@ -0,0 +1,76 @@
+"""
+Socket.IO fan-out benchmark
+
+Measures the cost of emitting printer status traffic for 20 printers to
+10 clients, broadcasting every message to every client versus emitting to
+per-printer rooms where each client only views one printer.
+
+Usage:
+    python3 benchmarks/bench_rooms.py [--printers 20] [--clients 10] [--rounds 100]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from flask import Flask, request
+from flask_socketio import SocketIO, join_room
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_printer import FakePrinter  # noqa: E402
+
+
+def run(mode, args):
+    app = Flask(__name__)
+    socketio = SocketIO(app, async_mode='threading')
+
+    @socketio.on('printer_info')
+    def subscribe(data):
+        join_room(f"printer:{data['id']}", sid=request.sid)
+
+    fleet = [FakePrinter(i) for i in range(args.printers)]
+    clients = [socketio.test_client(app) for _ in range(args.clients)]
+    for i, client in enumerate(clients):
+        client.emit('printer_info', {'id': fleet[i % len(fleet)].mainboard_id})
+        client.get_received()
+
+    messages = [[p.status_message() for p in fleet] for _ in range(args.rounds)]
+    start = time.perf_counter()
+    for round_messages in messages:
+        for message in round_messages:
+            if mode == 'broadcast':
+                socketio.emit('printer_status', message)
+            else:
+                socketio.emit('printer_status', message, to=f"printer:{message['MainboardID']}")
+    elapsed = time.perf_counter() - start
+
+    delivered, delivered_bytes = 0, 0
+    for client in clients:
+        for packet in client.get_received():
+            delivered += 1
+            delivered_bytes += len(json.dumps(packet['args']))
+        client.disconnect()
+    return elapsed, delivered, delivered_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--printers', type=int, default=20)
+    parser.add_argument('--clients', type=int, default=10)
+    parser.add_argument('--rounds', type=int, default=100)
+    args = parser.parse_args()
+
+    emitted = args.printers * args.rounds
+    print(f"{args.printers} printers x {args.clients} clients, {emitted} status messages")
+    print(f"{'mode':>10} {'emit ms':>10} {'us/emit':>10} {'delivered':>10} {'client MB':>10}")
+    for mode in ('broadcast', 'rooms'):
+        elapsed, delivered, delivered_bytes = run(mode, args)
+        print(f"{mode:>10} {elapsed * 1000:>10.1f} {elapsed * 1e6 / emitted:>10.1f} "
+              f"{delivered:>10} {delivered_bytes / 1e6:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
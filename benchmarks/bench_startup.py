@@ -0,0 +1,140 @@
+"""
+Startup time benchmark
+
+Starts `python main.py` from a cold interpreter with a throwaway HOME (with
+saved printers, as after a reboot) and measures:
+
+- import: seconds to `import main` in a fresh interpreter;
+- http: process spawn until GET /status first answers;
+- ready: process spawn until /status reports every startup stage done
+  (trees without startup reporting count as ready when HTTP answers).
+
+With --rev the same is measured for a git revision (exported with
+`git archive`), e.g. --rev HEAD~1 to compare against the previous commit.
+
+Usage:
+    python3 benchmarks/bench_startup.py [--runs 5] [--printers 5] [--rev <git rev>]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def make_home(printers):
+    """Temporary HOME with saved printers on addresses nothing listens on"""
+    home = tempfile.mkdtemp(prefix='chitui-startup-')
+    os.makedirs(os.path.join(home, '.chitui'))
+    settings = {
+        'printers': {
+            f'bench{i:04d}': {'ip': f'127.0.11.{i + 1}', 'name': f'Bench {i}', 'model': 'Simulated',
+                              'brand': 'ELEGOO', 'enabled': True, 'manual': True}
+            for i in range(printers)
+        },
+        'auto_discover': True,
+    }
+    with open(os.path.join(home, '.chitui', 'chitui_settings.json'), 'w') as f:
+        json.dump(settings, f)
+    return home
+
+
+def get_status(url):
+    try:
+        with urllib.request.urlopen(url, timeout=0.5) as response:
+            return json.loads(response.read())
+    except (OSError, ValueError):
+        return None
+
+
+def measure(tree, printers, timeout=60):
+    """Return (import seconds, http seconds, ready seconds) for one cold start"""
+    home = make_home(printers)
+    env = dict(os.environ, HOME=home, PORT=str(free_port()), PYTHONDONTWRITEBYTECODE='1')
+    try:
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', 'import main'], cwd=tree, env=env,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        import_seconds = time.perf_counter() - start
+
+        url = f"http://127.0.0.1:{env['PORT']}/status"
+        start = time.perf_counter()
+        proc = subprocess.Popen([sys.executable, 'main.py'], cwd=tree, env=env,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        http_seconds = ready_seconds = None
+        try:
+            while time.perf_counter() - start < timeout:
+                if proc.poll() is not None:
+                    raise RuntimeError(f"server exited with {proc.returncode}")
+                status = get_status(url)
+                if status is not None:
+                    now = time.perf_counter() - start
+                    if http_seconds is None:
+                        http_seconds = now
+                    if status.get('startup', {}).get('ready', True):
+                        ready_seconds = now
+                        break
+                time.sleep(0.01)
+        finally:
+            proc.terminate()
+            proc.wait(10)
+        return import_seconds, http_seconds, ready_seconds
+    finally:
+        shutil.rmtree(home, ignore_errors=True)
+
+
+def export_rev(rev):
+    tree = tempfile.mkdtemp(prefix='chitui-rev-')
+    archive = subprocess.run(['git', 'archive', rev], cwd=ROOT, capture_output=True, check=True).stdout
+    with tempfile.TemporaryFile() as f:
+        f.write(archive)
+        f.seek(0)
+        tarfile.open(fileobj=f).extractall(tree)
+    return tree
+
+
+def report(label, tree, runs, printers):
+    samples = [measure(tree, printers) for _ in range(runs)]
+    columns = []
+    for values in zip(*samples):
+        values = [v for v in values if v is not None]
+        columns.append(f"{statistics.median(values) * 1000:>10.0f}" if values else f"{'-':>10}")
+    print(f"{label:<20} {''.join(columns)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--printers', type=int, default=5, help='saved printers in settings')
+    parser.add_argument('--rev', help='also measure this git revision')
+    args = parser.parse_args()
+
+    print(f"median of {args.runs} cold starts, {args.printers} saved printers (ms)")
+    print(f"{'tree':<20} {'import':>10}{'http':>10}{'ready':>10}")
+    if args.rev:
+        tree = export_rev(args.rev)
+        try:
+            report(args.rev, tree, args.runs, args.printers)
+        finally:
+            shutil.rmtree(tree, ignore_errors=True)
+    report('working tree', ROOT, args.runs, args.printers)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Status delta benchmark
+
+Feeds a simulated print's sdcp/status/ stream through StatusDelta and
+compares broadcast bytes and JSON parse time against sending every full
+document.
+
+Usage:
+    python3 benchmarks/bench_status_delta.py [--printers 20] [--updates 500]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from core import StatusDelta  # noqa: E402
+from fake_printer import FakePrinter  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--printers', type=int, default=20)
+    parser.add_argument('--updates', type=int, default=500)
+    args = parser.parse_args()
+
+    fleet = [FakePrinter(i) for i in range(args.printers)]
+    delta = StatusDelta()
+    full_frames, delta_frames = [], []
+
+    for _ in range(args.updates):
+        for printer in fleet:
+            message = printer.status_message()
+            full_frames.append(json.dumps(message, separators=(',', ':')))
+            payload, _ = delta.push(printer.mainboard_id, message)
+            if payload is not None:
+                delta_frames.append(json.dumps(payload, separators=(',', ':')))
+
+    def parse_time(frames):
+        start = time.perf_counter()
+        for frame in frames:
+            json.loads(frame)
+        return time.perf_counter() - start
+
+    full_bytes = sum(len(f) for f in full_frames)
+    delta_bytes = sum(len(f) for f in delta_frames)
+    print(f"messages:        {len(full_frames)}")
+    print(f"full bytes:      {full_bytes:,} ({full_bytes / len(full_frames):.0f} B/msg)")
+    print(f"delta bytes:     {delta_bytes:,} ({delta_bytes / max(len(delta_frames), 1):.0f} B/msg)")
+    print(f"bytes saved:     {100 - delta_bytes * 100 / full_bytes:.1f}%")
+    print(f"parse full:      {parse_time(full_frames) * 1000:.1f} ms")
+    print(f"parse delta:     {parse_time(delta_frames) * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
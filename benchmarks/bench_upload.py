@@ -0,0 +1,214 @@
+"""
+Printer upload throughput benchmark
+
+Sends a file to a simulated printer's /uploadFile/upload endpoint
+(benchmarks/simulator.py) and reports MB/s for:
+
+- legacy: the previous uploader, one `requests.post` (new TCP connection)
+  per 1 MB part, strictly one after another, re-opening the file per part;
+- chunked: core.uploader.ChunkUploader (keep-alive session, read-ahead,
+  adaptive part size, retries) with the default 1 MB largest part;
+- chunked-4m: the same, allowed to grow parts to 4 MB.
+
+Each is measured on a set of link profiles: plain loopback, a Wi-Fi-like
+link (round trip and bandwidth cap per printer) and the same link with
+failing parts. Legacy uploads abort at the first failed part.
+
+With --cpu, each uploader instead sends the file once from a child process
+over loopback, and the child's CPU time per MB and peak RSS are reported
+(the simulator's own work is not counted). ChunkUploader is measured both
+reading ahead from a plain stream (copying each part) and from the
+memory-mapped file (sending parts without copying). Run it with files of
+a few hundred MB on the target hardware, e.g. a Raspberry Pi:
+
+Usage:
+    python3 benchmarks/bench_upload.py [--size 32] [--runs 3]
+    python3 benchmarks/bench_upload.py --cpu --size 300
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from core.uploader import ChunkUploader, UploadError  # noqa: E402
+from simulator import start_simulator  # noqa: E402
+from soak import free_port  # noqa: E402
+
+# name: (round trip seconds, bytes/sec, failing part fraction)
+PROFILES = {
+    'loopback': (0.0, 0, 0.0),
+    'wifi': (0.02, 4e6, 0.0),
+    'wifi-lossy': (0.02, 4e6, 0.05),
+}
+
+
+def legacy_upload(url, filepath, md5):
+    """The uploader before ChunkUploader, kept here as the baseline"""
+    part_size = 1048576
+    size = os.path.getsize(filepath)
+    post_data = {'S-File-MD5': md5, 'Check': 1, 'Offset': 0, 'Uuid': uuid.uuid4(), 'TotalSize': size}
+    num_parts = int(size / part_size)
+    i = 0
+    while i <= num_parts:
+        offset = i * part_size
+        with open(filepath, 'rb') as f:
+            f.seek(offset)
+            file_part = f.read(part_size)
+        post_data['Offset'] = offset
+        response = requests.post(url, data=post_data, files={'File': (os.path.basename(filepath), file_part)},
+                                 timeout=30)
+        if not response.json().get('success'):
+            raise UploadError(f"part {i} failed")
+        i += 1
+
+
+class PlainStream:
+    """A file that can only be read (so it is read ahead, not memory-mapped)"""
+
+    def __init__(self, f):
+        self.read = f.read
+
+
+def chunked_upload(max_part, mapped=True):
+    uploader = ChunkUploader(max_part=max_part, backoff=0.05)
+
+    def upload(url, filepath, md5):
+        with open(filepath, 'rb') as f:
+            uploader.upload(url, os.path.basename(filepath), f if mapped else PlainStream(f),
+                            os.path.getsize(filepath), md5)
+    return upload
+
+
+# Uploaders compared by --cpu
+CPU_UPLOADERS = {
+    'legacy': legacy_upload,
+    'chunked-read': chunked_upload(1048576, mapped=False),
+    'chunked-mmap': chunked_upload(1048576),
+}
+
+
+def usage():
+    """Return (CPU seconds, peak RSS in MB) of this process"""
+    rusage = resource.getrusage(resource.RUSAGE_SELF)
+    try:
+        # ru_maxrss carries over the parent's peak through fork and exec;
+        # VmHWM is this program's own
+        with open('/proc/self/status') as f:
+            peak = next(int(line.split()[1]) for line in f if line.startswith('VmHWM:'))
+    except (OSError, StopIteration):
+        peak = rusage.ru_maxrss
+    return rusage.ru_utime + rusage.ru_stime, peak / 1024
+
+
+def child(args):
+    """Run one upload and print its CPU seconds, peak RSS and wall time as JSON"""
+    upload = CPU_UPLOADERS[args.child]
+    cpu_before, rss_before = usage()
+    start = time.perf_counter()
+    upload(args.url, args.file, args.md5)
+    seconds = time.perf_counter() - start
+    cpu_after, rss_after = usage()
+    print(json.dumps({'cpu': cpu_after - cpu_before, 'rss': rss_after, 'rss_before': rss_before,
+                      'seconds': seconds}))
+
+
+def cpu_report(url, filepath, md5, runs):
+    size_mb = os.path.getsize(filepath) / 1e6
+    print(f"{size_mb:.1f} MB, median of {runs} uploads in a child process")
+    print(f"{'uploader':<14}{'MB/s':>10}{'CPU ms/MB':>12}{'peak RSS MB':>14}{'RSS growth':>12}")
+    for name in CPU_UPLOADERS:
+        samples = []
+        for _ in range(runs):
+            out = subprocess.run([sys.executable, __file__, '--child', name, '--url', url,
+                                  '--file', filepath, '--md5', md5],
+                                 capture_output=True, text=True, check=True).stdout
+            samples.append(json.loads(out.strip().splitlines()[-1]))
+
+        def median(key):
+            return statistics.median(s[key] for s in samples)
+        print(f"{name:<14}{size_mb / median('seconds'):>10.1f}{median('cpu') * 1000 / size_mb:>12.2f}"
+              f"{median('rss'):>14.1f}{median('rss') - median('rss_before'):>12.1f}")
+
+
+def measure(upload, url, filepath, md5, runs):
+    """Return (median MB/s of successful runs, successful runs)"""
+    rates = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        try:
+            upload(url, filepath, md5)
+        except UploadError:
+            continue
+        rates.append(os.path.getsize(filepath) / (time.perf_counter() - start) / 1e6)
+    return (statistics.median(rates) if rates else None), len(rates)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--size', type=float, default=32, help='file size in MB')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--cpu', action='store_true', help='report CPU per MB and peak RSS per uploader')
+    parser.add_argument('--child', choices=CPU_UPLOADERS, help=argparse.SUPPRESS)
+    parser.add_argument('--url', help=argparse.SUPPRESS)
+    parser.add_argument('--file', help=argparse.SUPPRESS)
+    parser.add_argument('--md5', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args)
+        return
+
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name='simulator', daemon=True).start()
+    port = free_port()
+    printer = asyncio.run_coroutine_threadsafe(
+        start_simulator(1, same_host=True, base_port=port, status_hz=0), loop).result()[0]
+    url = f'http://127.0.0.1:{port}/uploadFile/upload'
+
+    # Not a multiple of 1 MB: the legacy uploader sends an empty extra part
+    # for those, which printers reject
+    data = os.urandom(int(args.size * 1e6) + 12345)
+    md5 = hashlib.md5(data).hexdigest()
+    uploaders = {
+        'legacy': legacy_upload,
+        'chunked': chunked_upload(1048576),
+        'chunked-4m': chunked_upload(4 * 1048576),
+    }
+
+    with tempfile.NamedTemporaryFile(suffix='.ctb') as f:
+        f.write(data)
+        f.flush()
+        if args.cpu:
+            del data
+            cpu_report(url, f.name, md5, args.runs)
+            return
+        print(f"{len(data) / 1e6:.1f} MB, median of {args.runs} uploads (MB/s, successful runs)")
+        print(f"{'profile':<14}" + ''.join(f"{name:>16}" for name in uploaders))
+        for profile, (latency, rate, fail_rate) in PROFILES.items():
+            printer.upload_latency = latency
+            printer.upload_rate = rate
+            printer.upload_fail_rate = fail_rate
+            cells = []
+            for upload in uploaders.values():
+                mb_s, ok = measure(upload, url, f.name, md5, args.runs)
+                cells.append(f"{mb_s:>10.1f} ({ok}/{args.runs})" if mb_s else f"{'-':>10} (0/{args.runs})")
+            print(f"{profile:<14}" + ''.join(f"{cell:>16}" for cell in cells))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+"""
+Fake SDCP printer for ChitUI benchmarks
+
+Serves the SDCP websocket protocol well enough to exercise ChitUI's
+connection handling: it answers requests and pushes periodic status updates.
+It can also answer the UDP discovery probe (M99999) on port 3000.
+"""
+
+import asyncio
+import json
+import os
+import time
+import websockets
+
+
+class FakePrinter:
+    """A single simulated Elegoo mainboard"""
+
+    def __init__(self, index, host='127.0.0.1', port=0, status_hz=2.0):
+        self.index = index
+        self.host = host
+        self.port = port
+        self.status_hz = status_hz
+        self.mainboard_id = f"fake{index:04d}" + os.urandom(6).hex()
+        self.name = f"Fake Printer {index}"
+        self.layer = 0
+        self.server = None
+        self.discovery = None
+
+    @property
+    def url(self):
+        return f"ws://{self.host}:{self.port}/websocket"
+
+    def status_message(self):
+        self.layer += 1
+        return {
+            "Status": {
+                "CurrentStatus": [1],
+                "PreviousStatus": 0,
+                "PrintScreen": 0,
+                "ReleaseFilm": 0,
+                "TempOfUVLED": 28,
+                "TimeLapseStatus": 0,
+                "PrintInfo": {
+                    "Status": 3,
+                    "CurrentLayer": self.layer,
+                    "TotalLayer": 1000,
+                    "CurrentTicks": self.layer * 4500,
+                    "TotalTicks": 4500000,
+                    "Filename": "benchmark.goo",
+                    "ErrorNumber": 0,
+                    "TaskId": "00000000-0000-0000-0000-000000000000",
+                },
+            },
+            "MainboardID": self.mainboard_id,
+            "TimeStamp": int(time.time()),
+            "Topic": f"sdcp/status/{self.mainboard_id}",
+        }
+
+    def attributes_message(self):
+        return {
+            "Attributes": {
+                "Name": self.name,
+                "MachineName": "Saturn 4 Ultra",
+                "BrandName": "ELEGOO",
+                "ProtocolVersion": "V3.0.0",
+                "FirmwareVersion": "V1.0.0",
+                "Resolution": "11520x5120",
+                "XYZsize": "218.88x122.88x220",
+                "MainboardIP": self.host,
+                "MainboardID": self.mainboard_id,
+                "RemainingMemory": 12 * 1024 ** 3,
+            },
+            "MainboardID": self.mainboard_id,
+            "TimeStamp": int(time.time()),
+            "Topic": f"sdcp/attributes/{self.mainboard_id}",
+        }
+
+    def discovery_reply(self):
+        return {
+            "Id": os.urandom(16).hex(),
+            "Data": {
+                "Name": self.name,
+                "MachineName": "Saturn 4 Ultra",
+                "BrandName": "ELEGOO",
+                "MainboardIP": self.host,
+                "MainboardID": self.mainboard_id,
+                "ProtocolVersion": "V3.0.0",
+                "FirmwareVersion": "V1.0.0",
+            },
+        }
+
+    def response_message(self, request):
+        data = request.get("Data", {})
+        payload = {"Ack": 0}
+        if data.get("Cmd") == 258:
+            payload["FileList"] = [
+                {"name": f"/local/part_{i}.goo", "usedSize": 1024 * i, "type": 1}
+                for i in range(10)
+            ]
+        return {
+            "Id": request.get("Id", ""),
+            "Data": {
+                "Cmd": data.get("Cmd"),
+                "Data": payload,
+                "RequestID": data.get("RequestID"),
+                "MainboardID": self.mainboard_id,
+                "TimeStamp": int(time.time()),
+            },
+            "Topic": f"sdcp/response/{self.mainboard_id}",
+        }
+
+    async def _handler(self, ws, path=None):
+        pusher = asyncio.ensure_future(self._push_status(ws))
+        try:
+            async for raw in ws:
+                request = json.loads(raw)
+                await ws.send(json.dumps(self.response_message(request)))
+                cmd = request.get("Data", {}).get("Cmd")
+                if cmd == 0:
+                    await ws.send(json.dumps(self.status_message()))
+                elif cmd == 1:
+                    await ws.send(json.dumps(self.attributes_message()))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            pusher.cancel()
+
+    async def _push_status(self, ws):
+        if self.status_hz <= 0:
+            return
+        interval = 1.0 / self.status_hz
+        while True:
+            await asyncio.sleep(interval)
+            await ws.send(json.dumps(self.status_message()))
+
+    async def start(self):
+        self.server = await websockets.serve(self._handler, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def start_discovery(self, port=3000):
+        """Answer discovery probes sent to host:port"""
+        loop = asyncio.get_running_loop()
+        self.discovery, _ = await loop.create_datagram_endpoint(
+            lambda: DiscoveryResponder(self), local_addr=(self.host, port))
+        return self
+
+    async def stop(self):
+        if self.discovery is not None:
+            self.discovery.close()
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+
+class DiscoveryResponder(asyncio.DatagramProtocol):
+    """Replies to M99999 probes the way a mainboard does"""
+
+    def __init__(self, printer):
+        self.printer = printer
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        if data.strip() == b'M99999':
+            self.transport.sendto(json.dumps(self.printer.discovery_reply()).encode(), addr)
+
+
+async def start_fleet(count, host='127.0.0.1', status_hz=2.0):
+    """Start `count` fake printers on ephemeral ports and return them"""
+    fleet = [FakePrinter(i, host=host, status_hz=status_hz) for i in range(count)]
+    for printer in fleet:
+        await printer.start()
+    return fleet
@@ -0,0 +1,416 @@
+"""
+SDCP printer fleet simulator
+
+Runs N simulated Elegoo mainboards that ChitUI can use like real ones:
+
+- the SDCP websocket on ws://<ip>:3030/websocket, pushing status as the
+  simulated print job advances and answering requests (status,
+  attributes, print/pause/stop/resume, file list, delete, task details);
+- the chunked upload endpoint POST http://<ip>:3030/uploadFile/upload,
+  which checks offsets and the final MD5;
+- the M99999 discovery probe on UDP <ip>:3000.
+
+Each printer gets its own loopback alias (127.0.10.1, 127.0.10.2, ...),
+which Linux routes to `lo` without any setup. With --same-host every
+printer runs on 127.0.0.1 on consecutive ports instead. Discovery is off in
+that mode, and ChitUI can't connect because it always uses port 3030.
+
+Usage:
+    python3 benchmarks/simulator.py [--printers 20] [--host-base 127.0.10.1]
+                                    [--status-hz 2] [--upload-rate 0] [--upload-fail-rate 0]
+                                    [--upload-latency 0]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import ipaddress
+import json
+import os
+import random
+import sys
+import time
+import websockets
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_printer import FakePrinter  # noqa: E402
+
+SDCP_PORT = 3030
+
+# CurrentStatus values
+MACHINE_IDLE = 0
+MACHINE_PRINTING = 1
+MACHINE_FILE_TRANSFERRING = 2
+
+# PrintInfo.Status values
+PRINT_IDLE = 0
+PRINT_EXPOSURING = 3
+PRINT_LIFTING = 4
+PRINT_PAUSED = 6
+PRINT_STOPPED = 8
+PRINT_COMPLETE = 9
+
+UPLOAD_OK = {"code": "000000", "messages": None, "data": {}, "success": True}
+
+
+def upload_error(message):
+    return {"code": "111111", "messages": [{"field": "common_field", "message": message}],
+            "data": {}, "success": False}
+
+
+def parse_multipart(content_type, body):
+    """Split a multipart/form-data body into {field name: bytes}"""
+    boundary = None
+    for param in content_type.split(';')[1:]:
+        key, _, value = param.strip().partition('=')
+        if key.lower() == 'boundary':
+            boundary = value.strip('"').encode()
+    if boundary is None:
+        raise ValueError("multipart body without boundary")
+
+    fields = {}
+    for part in body.split(b'--' + boundary)[1:]:
+        if part.startswith(b'--'):
+            break
+        head, _, content = part.partition(b'\r\n\r\n')
+        name = None
+        for line in head.decode('latin-1').split('\r\n'):
+            if line.lower().startswith('content-disposition:'):
+                for param in line.split(';')[1:]:
+                    key, _, value = param.strip().partition('=')
+                    if key == 'name':
+                        name = value.strip('"')
+        if name is not None:
+            fields[name] = content[:-2] if content.endswith(b'\r\n') else content
+    return fields
+
+
+class SimulatedPrinter(FakePrinter):
+    """A mainboard with a print job lifecycle, file storage and upload endpoint"""
+
+    def __init__(self, index, host='127.0.10.1', port=SDCP_PORT, status_hz=2.0,
+                 upload_rate=0, upload_fail_rate=0.0, upload_latency=0.0, discovery=True):
+        """
+        Initialize the simulated printer.
+
+        Args:
+            index: Printer number (used in its name and MainboardID)
+            host: Address to serve on
+            port: Websocket/HTTP port
+            status_hz: Status pushes per second (0 = only on request)
+            upload_rate: Upload bandwidth in bytes/sec (0 = unlimited)
+            upload_fail_rate: Fraction of upload chunks answered with an error
+            upload_latency: Network round trip in seconds, added to each upload
+                            answer and once more to a connection's first request
+            discovery: Answer M99999 on UDP host:3000
+        """
+        super().__init__(index, host=host, port=port, status_hz=status_hz)
+        self.upload_rate = upload_rate
+        self.upload_fail_rate = upload_fail_rate
+        self.upload_latency = upload_latency
+        self.discovery_enabled = discovery
+        self.files = {f"/local/part_{i}.goo": 8 * 1024 ** 2 * (i + 1) for i in range(5)}
+        self.uploads = {}
+        self.job = None
+        self.idle_ticks = random.randint(0, 20)
+        self.front = None
+        self.stats = {'requests': 0, 'status_sent': 0, 'upload_chunks': 0, 'upload_bytes': 0,
+                      'uploads_completed': 0, 'upload_errors': 0}
+
+    # ---- SDCP state ----
+
+    def start_job(self, filename):
+        total = random.randint(400, 2000)
+        self.job = {"Filename": filename, "CurrentLayer": 0, "TotalLayer": total,
+                    "Status": PRINT_EXPOSURING, "TaskId": os.urandom(16).hex(),
+                    "started": time.time()}
+
+    def tick(self):
+        """Advance the simulated print by one status interval"""
+        job = self.job
+        if job is None:
+            self.idle_ticks -= 1
+            if self.idle_ticks <= 0:
+                self.start_job(random.choice(list(self.files) or ["/local/benchmark.goo"]))
+            return
+        if job["Status"] in (PRINT_EXPOSURING, PRINT_LIFTING):
+            if job["Status"] == PRINT_LIFTING:
+                job["CurrentLayer"] += 1
+            job["Status"] = PRINT_LIFTING if job["Status"] == PRINT_EXPOSURING else PRINT_EXPOSURING
+            if job["CurrentLayer"] >= job["TotalLayer"]:
+                job["Status"] = PRINT_COMPLETE
+        elif job["Status"] in (PRINT_COMPLETE, PRINT_STOPPED):
+            self.job = None
+            self.idle_ticks = random.randint(10, 60)
+
+    def status_message(self):
+        job = self.job
+        if self.uploads:
+            current = MACHINE_FILE_TRANSFERRING
+        elif job is not None and job["Status"] not in (PRINT_COMPLETE, PRINT_STOPPED):
+            current = MACHINE_PRINTING
+        else:
+            current = MACHINE_IDLE
+        layer = job["CurrentLayer"] if job else 0
+        total = job["TotalLayer"] if job else 0
+        self.stats['status_sent'] += 1
+        return {
+            "Status": {
+                "CurrentStatus": [current],
+                "PreviousStatus": 0,
+                "PrintScreen": 0,
+                "ReleaseFilm": 0,
+                "TempOfUVLED": round(28 + (4 if current == MACHINE_PRINTING else 0) + random.random(), 1),
+                "TempOfBox": round(24 + random.random(), 1),
+                "TempTargetBox": 0,
+                "TimeLapseStatus": 0,
+                "PrintInfo": {
+                    "Status": job["Status"] if job else PRINT_IDLE,
+                    "CurrentLayer": layer,
+                    "TotalLayer": total,
+                    "CurrentTicks": layer * 4500,
+                    "TotalTicks": total * 4500,
+                    "Filename": job["Filename"] if job else "",
+                    "ErrorNumber": 0,
+                    "TaskId": job["TaskId"] if job else "",
+                },
+                "FileTransferInfo": {
+                    "Status": 1 if self.uploads else 0,
+                    "DownloadOffset": sum(u["received"] for u in self.uploads.values()),
+                    "CheckOffset": 0,
+                    "FileTotalSize": sum(u["total"] for u in self.uploads.values()),
+                    "Filename": next(iter(self.uploads.values()))["name"] if self.uploads else "",
+                },
+            },
+            "MainboardID": self.mainboard_id,
+            "TimeStamp": int(time.time()),
+            "Topic": f"sdcp/status/{self.mainboard_id}",
+        }
+
+    def response_message(self, request):
+        self.stats['requests'] += 1
+        data = request.get("Data", {})
+        cmd = data.get("Cmd")
+        args = data.get("Data") or {}
+        payload = {"Ack": 0}
+        if cmd == 128:
+            self.start_job(args.get("Filename", "/local/benchmark.goo"))
+        elif cmd == 129 and self.job:
+            self.job["Status"] = PRINT_PAUSED
+        elif cmd == 131 and self.job:
+            self.job["Status"] = PRINT_EXPOSURING
+        elif cmd == 130 and self.job:
+            self.job["Status"] = PRINT_STOPPED
+        elif cmd == 258:
+            payload["FileList"] = [{"name": name, "usedSize": size, "type": 1}
+                                   for name, size in sorted(self.files.items())]
+        elif cmd == 259:
+            for name in args.get("FileList", []):
+                self.files.pop(name, None)
+        elif cmd == 321:
+            payload["HistoryDetailList"] = [{
+                "TaskId": task_id, "TaskName": "benchmark.goo", "TaskStatus": 9,
+                "BeginTime": int(time.time()) - 3600, "EndTime": int(time.time()),
+                "Thumbnail": "", "SliceInformation": {},
+            } for task_id in args.get("Id", [])]
+        return {
+            "Id": request.get("Id", ""),
+            "Data": {
+                "Cmd": cmd,
+                "Data": payload,
+                "RequestID": data.get("RequestID"),
+                "MainboardID": self.mainboard_id,
+                "TimeStamp": int(time.time()),
+            },
+            "Topic": f"sdcp/response/{self.mainboard_id}",
+        }
+
+    async def _push_status(self, ws):
+        if self.status_hz <= 0:
+            return
+        interval = 1.0 / self.status_hz
+        while True:
+            await asyncio.sleep(interval)
+            self.tick()
+            await ws.send(json.dumps(self.status_message()))
+
+    # ---- HTTP upload endpoint ----
+
+    def handle_upload_chunk(self, fields):
+        file_uuid = fields["Uuid"].decode()
+        offset = int(fields["Offset"])
+        total = int(fields["TotalSize"])
+        chunk = fields["File"]
+        upload = self.uploads.get(file_uuid)
+        if upload is None:
+            if offset != 0:
+                return upload_error(f"unknown upload {file_uuid}")
+            upload = {"md5": hashlib.md5(), "received": 0, "total": total,
+                      "expected_md5": fields["S-File-MD5"].decode(), "name": f"/local/upload_{file_uuid[:8]}.goo"}
+            self.uploads[file_uuid] = upload
+        if offset != upload["received"]:
+            return upload_error(f"offset {offset} != expected {upload['received']}")
+        if self.upload_fail_rate and random.random() < self.upload_fail_rate:
+            return upload_error("injected failure")
+
+        upload["md5"].update(chunk)
+        upload["received"] += len(chunk)
+        self.stats['upload_chunks'] += 1
+        self.stats['upload_bytes'] += len(chunk)
+        if upload["received"] >= total:
+            del self.uploads[file_uuid]
+            if upload["md5"].hexdigest() != upload["expected_md5"]:
+                return upload_error("MD5 mismatch")
+            self.files[upload["name"]] = total
+            self.stats['uploads_completed'] += 1
+        return UPLOAD_OK
+
+    async def _front(self, reader, writer):
+        """Serve HTTP on the SDCP port, handing websocket upgrades to the SDCP server"""
+        new_connection = True
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+                lines = head.decode('latin-1').split('\r\n')
+                method, path, _ = lines[0].split(' ', 2)
+                headers = {}
+                for line in lines[1:]:
+                    key, sep, value = line.partition(':')
+                    if sep:
+                        headers[key.strip().lower()] = value.strip()
+
+                if headers.get('upgrade', '').lower() == 'websocket':
+                    await self._proxy_websocket(head, reader, writer)
+                    return
+
+                if headers.get('transfer-encoding', '').lower() == 'chunked':
+                    body = await self._read_chunked(reader)
+                else:
+                    body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+                if method == 'POST' and path.startswith('/uploadFile/upload'):
+                    if self.upload_latency:
+                        # The TCP handshake of a new connection costs a round trip
+                        await asyncio.sleep(self.upload_latency * (2 if new_connection else 1))
+                    new_connection = False
+                    try:
+                        result = self.handle_upload_chunk(parse_multipart(headers.get('content-type', ''), body))
+                    except (KeyError, ValueError) as e:
+                        result = upload_error(f"malformed chunk: {e}")
+                    if not result["success"]:
+                        self.stats['upload_errors'] += 1
+                    if self.upload_rate:
+                        await asyncio.sleep(len(body) / self.upload_rate)
+                    status, payload = '200 OK', json.dumps(result).encode()
+                else:
+                    status, payload = '404 Not Found', b'{}'
+
+                writer.write(f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                             f"Content-Length: {len(payload)}\r\n\r\n".encode() + payload)
+                await writer.drain()
+                if headers.get('connection', '').lower() == 'close':
+                    return
+        finally:
+            writer.close()
+
+    async def _read_chunked(self, reader):
+        body = bytearray()
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            if size == 0:
+                await reader.readline()
+                return bytes(body)
+            body += await reader.readexactly(size)
+            await reader.readline()
+
+    async def _proxy_websocket(self, head, reader, writer):
+        up_reader, up_writer = await asyncio.open_connection('127.0.0.1', self.ws_port)
+        up_writer.write(head)
+
+        async def pipe(src, dst):
+            try:
+                while True:
+                    data = await src.read(65536)
+                    if not data:
+                        break
+                    dst.write(data)
+                    await dst.drain()
+            except ConnectionError:
+                pass
+            finally:
+                dst.close()
+
+        await asyncio.gather(pipe(reader, up_writer), pipe(up_reader, writer))
+
+    # ---- lifecycle ----
+
+    async def start(self):
+        # The websocket server itself listens privately; the front server on
+        # the SDCP port routes upgrades to it and serves uploads directly
+        self.server = await websockets.serve(self._handler, '127.0.0.1', 0)
+        self.ws_port = self.server.sockets[0].getsockname()[1]
+        self.front = await asyncio.start_server(self._front, self.host, self.port)
+        self.port = self.front.sockets[0].getsockname()[1]
+        if self.discovery_enabled:
+            await self.start_discovery()
+        return self
+
+    async def stop(self):
+        if self.front is not None:
+            self.front.close()
+        await super().stop()
+
+
+async def start_simulator(count, host_base='127.0.10.1', same_host=False, base_port=SDCP_PORT, **options):
+    """Start `count` simulated printers and return them"""
+    fleet = []
+    for i in range(count):
+        if same_host:
+            printer = SimulatedPrinter(i, host='127.0.0.1', port=base_port + i, discovery=False, **options)
+        else:
+            host = str(ipaddress.ip_address(host_base) + i)
+            printer = SimulatedPrinter(i, host=host, port=base_port, **options)
+        fleet.append(await printer.start())
+    return fleet
+
+
+async def run(args):
+    fleet = await start_simulator(args.printers, host_base=args.host_base, same_host=args.same_host,
+                                  status_hz=args.status_hz, upload_rate=args.upload_rate,
+                                  upload_fail_rate=args.upload_fail_rate, upload_latency=args.upload_latency)
+    for printer in fleet:
+        print(f"{printer.mainboard_id}  {printer.name:<18} ws://{printer.host}:{printer.port}/websocket")
+    sys.stdout.flush()
+    while True:
+        await asyncio.sleep(args.report)
+        totals = {}
+        for printer in fleet:
+            for key, value in printer.stats.items():
+                totals[key] = totals.get(key, 0) + value
+        print(time.strftime('%H:%M:%S'), ' '.join(f"{k}={v}" for k, v in totals.items()))
+        sys.stdout.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--printers', type=int, default=20)
+    parser.add_argument('--host-base', default='127.0.10.1', help='first loopback alias')
+    parser.add_argument('--same-host', action='store_true', help='use 127.0.0.1 and consecutive ports')
+    parser.add_argument('--status-hz', type=float, default=2.0)
+    parser.add_argument('--upload-rate', type=float, default=0, help='bytes/sec per printer (0 = unlimited)')
+    parser.add_argument('--upload-fail-rate', type=float, default=0.0)
+    parser.add_argument('--upload-latency', type=float, default=0.0, help='seconds of round trip per upload part')
+    parser.add_argument('--report', type=float, default=30, help='seconds between stats lines')
+    args = parser.parse_args()
+    try:
+        asyncio.run(run(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,347 @@
+"""
+ChitUI load/soak harness
+
+Starts a simulated printer fleet (benchmarks/simulator.py), runs main.py
+against it in a child process with a throwaway HOME, and drives it with
+Socket.IO clients for as long as asked, sampling:
+
+- server CPU (% of one core) and RSS, with RSS growth extrapolated per hour;
+- request latency: `printer_files` emitted until its `printer_response`;
+- the rate of status/attribute emits reaching the clients;
+- POST /upload and POST /discover durations, run periodically.
+
+A line is printed every --interval seconds and a summary at the end. With
+--json the summary is also written to a file for comparing runs.
+
+Usage:
+    python3 benchmarks/soak.py [--duration 3600] [--printers 20] [--status-hz 2]
+                               [--clients 2] [--upload-every 300] [--discover-every 600]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+import socketio
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from simulator import start_simulator  # noqa: E402
+
+STATUS_EVENTS = ('printer_status', 'printer_status_delta', 'printer_attributes', 'printer_summary')
+CLK_TCK = os.sysconf('SC_CLK_TCK')
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def proc_sample(pid):
+    """Return (cpu seconds, RSS bytes) of a process from /proc"""
+    with open(f'/proc/{pid}/stat') as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    cpu = (int(fields[11]) + int(fields[12])) / CLK_TCK
+    rss = 0
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                rss = int(line.split()[1]) * 1024
+                break
+    return cpu, rss
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def slope_per_hour(points):
+    """Least-squares slope of (seconds, value) points, scaled to one hour"""
+    if len(points) < 2:
+        return 0.0
+    xs = [p[0] for p in points]
+    ys = [p[1] for p in points]
+    mx, my = statistics.fmean(xs), statistics.fmean(ys)
+    den = sum((x - mx) ** 2 for x in xs)
+    if not den:
+        return 0.0
+    return sum((x - mx) * (y - my) for x, y in zip(xs, ys)) / den * 3600
+
+
+class SoakClient:
+    """A dashboard: follows printers, and asks one of them for its file list"""
+
+    def __init__(self, url, printer_ids):
+        self.printer_ids = printer_ids
+        self.sio = socketio.Client(reconnection=True)
+        self.lock = threading.Lock()
+        self.events = 0
+        self.pending = []
+        self.latencies = []
+        self.timeouts = 0
+        self.sio.on('printer_response', self._on_response)
+        for event in STATUS_EVENTS:
+            self.sio.on(event, self._on_status)
+        self.sio.connect(url, transports=['websocket'])
+        for printer_id in printer_ids:
+            self.sio.emit('printer_info', {'id': printer_id})
+
+    def _on_status(self, data):
+        with self.lock:
+            self.events += 1
+
+    def _on_response(self, data):
+        if data.get('Data', {}).get('Cmd') != 258:
+            return
+        with self.lock:
+            if self.pending:
+                self.latencies.append(time.perf_counter() - self.pending.pop(0))
+
+    def request(self):
+        """Ask a random printer for its file list"""
+        with self.lock:
+            # Requests unanswered for 10s are counted once and forgotten
+            cutoff = time.perf_counter() - 10
+            stale = [t for t in self.pending if t < cutoff]
+            self.timeouts += len(stale)
+            self.pending = [t for t in self.pending if t >= cutoff]
+            self.pending.append(time.perf_counter())
+        self.sio.emit('printer_files', {'id': random.choice(self.printer_ids), 'url': '/local'})
+
+    def take(self):
+        """Return and reset (events, latencies, timeouts) since the last call"""
+        with self.lock:
+            result = (self.events, self.latencies, self.timeouts)
+            self.events, self.latencies, self.timeouts = 0, [], 0
+            return result
+
+    def close(self):
+        self.sio.disconnect()
+
+
+class Periodic(threading.Thread):
+    """Runs a timed HTTP action every `every` seconds and records durations"""
+
+    def __init__(self, name, every, action):
+        super().__init__(name=name, daemon=True)
+        self.every = every
+        self.action = action
+        self.results = []
+        self.stop_event = threading.Event()
+
+    def run(self):
+        while not self.stop_event.wait(self.every):
+            start = time.perf_counter()
+            try:
+                ok, detail = self.action()
+            except Exception as e:
+                ok, detail = False, str(e)
+            self.results.append({'seconds': round(time.perf_counter() - start, 3), 'ok': ok, 'detail': detail})
+
+
+def write_settings(home, fleet, subnet):
+    data_folder = os.path.join(home, '.chitui')
+    os.makedirs(data_folder, exist_ok=True)
+    settings = {
+        'printers': {
+            printer.mainboard_id: {
+                'ip': printer.host, 'name': printer.name, 'model': 'Simulated',
+                'brand': 'ELEGOO', 'enabled': True, 'manual': False,
+            }
+            for printer in fleet
+        },
+        'auto_discover': False,
+        'discovery_subnets': [subnet],
+    }
+    with open(os.path.join(data_folder, 'chitui_settings.json'), 'w') as f:
+        json.dump(settings, f, indent=2)
+
+
+def wait_ready(base, proc, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited with {proc.returncode}")
+        try:
+            if requests.get(f'{base}/status', timeout=1).ok:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError('server did not start')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--duration', type=float, default=3600, help='seconds to run')
+    parser.add_argument('--interval', type=float, default=30, help='seconds between report lines')
+    parser.add_argument('--printers', type=int, default=20)
+    parser.add_argument('--host-base', default='127.0.10.1')
+    parser.add_argument('--status-hz', type=float, default=2.0)
+    parser.add_argument('--clients', type=int, default=2)
+    parser.add_argument('--request-hz', type=float, default=1.0, help='file list requests per client per second')
+    parser.add_argument('--upload-every', type=float, default=300, help='seconds between uploads (0 = off)')
+    parser.add_argument('--upload-size', type=float, default=4, help='upload size in MB')
+    parser.add_argument('--discover-every', type=float, default=600, help='seconds between discovery sweeps (0 = off)')
+    parser.add_argument('--keep', action='store_true', help='keep the temporary HOME with the server log')
+    parser.add_argument('--json', help='also write the summary to this file')
+    args = parser.parse_args()
+
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name='simulator', daemon=True).start()
+    fleet = asyncio.run_coroutine_threadsafe(
+        start_simulator(args.printers, host_base=args.host_base, status_hz=args.status_hz), loop).result()
+    printer_ids = [printer.mainboard_id for printer in fleet]
+
+    home = tempfile.mkdtemp(prefix='chitui-soak-')
+    write_settings(home, fleet, f"{args.host_base.rsplit('.', 1)[0]}.0/24")
+    port = free_port()
+    base = f'http://127.0.0.1:{port}'
+    log = open(os.path.join(home, 'server.log'), 'w')
+    proc = subprocess.Popen([sys.executable, 'main.py'], cwd=ROOT, stdout=log, stderr=subprocess.STDOUT,
+                            env=dict(os.environ, HOME=home, PORT=str(port)))
+    clients = []
+    periodic = []
+    try:
+        wait_ready(base, proc)
+        # Let the server connect the fleet before measuring
+        time.sleep(2)
+        clients = [SoakClient(base, printer_ids) for _ in range(args.clients)]
+
+        payload = os.urandom(int(args.upload_size * 1000 * 1000))
+
+        def upload():
+            response = requests.post(f'{base}/upload', files={'file': ('soak.ctb', payload)},
+                                     data={'printer': random.choice(printer_ids)}, timeout=600)
+            return response.ok, response.status_code
+
+        def discover():
+            response = requests.post(f'{base}/discover', json={'refresh': True}, timeout=60)
+            return response.ok, len(response.json()) if response.ok else response.status_code
+
+        if args.upload_every:
+            periodic.append(Periodic('upload', args.upload_every, upload))
+        if args.discover_every:
+            periodic.append(Periodic('discover', args.discover_every, discover))
+        for thread in periodic:
+            thread.start()
+
+        started = time.monotonic()
+        cpu_start, rss_start = proc_sample(proc.pid)
+        last_cpu, last_at = cpu_start, started
+        rss_points = [(0.0, rss_start)]
+        cpu_samples, rate_samples, all_latencies = [], [], []
+        timeouts = 0
+        next_report = started + args.interval
+        request_gap = 1 / args.request_hz if args.request_hz else None
+        next_request = started
+
+        print(f"{args.printers} printers at {args.status_hz} Hz, {args.clients} clients, server pid {proc.pid}")
+        print(f"{'elapsed':>8} {'cpu %':>7} {'rss MB':>8} {'emits/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'lost':>5}")
+        while time.monotonic() - started < args.duration:
+            now = time.monotonic()
+            if request_gap and now >= next_request:
+                for client in clients:
+                    client.request()
+                next_request += request_gap
+            if now >= next_report:
+                if proc.poll() is not None:
+                    raise RuntimeError(f"server exited with {proc.returncode}")
+                cpu, rss = proc_sample(proc.pid)
+                cpu_pct = (cpu - last_cpu) / (now - last_at) * 100
+                events, latencies, lost = 0, [], 0
+                for client in clients:
+                    e, lat, t = client.take()
+                    events += e
+                    latencies += lat
+                    lost += t
+                emit_rate = events / (now - last_at)
+                last_cpu, last_at = cpu, now
+                rss_points.append((now - started, rss))
+                cpu_samples.append(cpu_pct)
+                rate_samples.append(emit_rate)
+                all_latencies += latencies
+                timeouts += lost
+                p50, p95 = percentile(latencies, 50), percentile(latencies, 95)
+                print(f"{now - started:>8.0f} {cpu_pct:>7.1f} {rss / 1e6:>8.1f} {emit_rate:>9.1f} "
+                      f"{p50 * 1000 if p50 is not None else float('nan'):>8.1f} "
+                      f"{p95 * 1000 if p95 is not None else float('nan'):>8.1f} {lost:>5}")
+                sys.stdout.flush()
+                next_report += args.interval
+            time.sleep(max(0.0, min(next_request if request_gap else next_report, next_report) - time.monotonic()))
+
+        def ms(value):
+            return round(value * 1000, 1) if value is not None else None
+
+        summary = {
+            'duration': round(time.monotonic() - started),
+            'printers': args.printers,
+            'status_hz': args.status_hz,
+            'clients': args.clients,
+            'cpu_pct_mean': round(statistics.fmean(cpu_samples), 1) if cpu_samples else None,
+            'cpu_pct_max': round(max(cpu_samples), 1) if cpu_samples else None,
+            'rss_mb_start': round(rss_start / 1e6, 1),
+            'rss_mb_end': round(rss_points[-1][1] / 1e6, 1),
+            'rss_mb_per_hour': round(slope_per_hour(rss_points) / 1e6, 2),
+            'emits_per_sec': round(statistics.fmean(rate_samples), 1) if rate_samples else None,
+            'latency_ms_p50': ms(percentile(all_latencies, 50)),
+            'latency_ms_p95': ms(percentile(all_latencies, 95)),
+            'latency_ms_p99': ms(percentile(all_latencies, 99)),
+            'requests_answered': len(all_latencies),
+            'requests_lost': timeouts,
+        }
+        for thread in periodic:
+            durations = [r['seconds'] for r in thread.results]
+            summary[thread.name] = {
+                'runs': len(thread.results),
+                'failed': sum(1 for r in thread.results if not r['ok']),
+                'seconds_mean': round(statistics.fmean(durations), 3) if durations else None,
+                'seconds_max': max(durations) if durations else None,
+            }
+        summary['simulator'] = {}
+        for printer in fleet:
+            for key, value in printer.stats.items():
+                summary['simulator'][key] = summary['simulator'].get(key, 0) + value
+
+        print()
+        print(json.dumps(summary, indent=2))
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump(summary, f, indent=2)
+    finally:
+        for thread in periodic:
+            thread.stop_event.set()
+        for client in clients:
+            client.close()
+        proc.terminate()
+        try:
+            proc.wait(10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        log.close()
+        for printer in fleet:
+            asyncio.run_coroutine_threadsafe(printer.stop(), loop).result(5)
+        if args.keep:
+            print(f"Server log: {os.path.join(home, 'server.log')}")
+        else:
+            shutil.rmtree(home, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
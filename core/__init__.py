@@ -0,0 +1,32 @@
+"""
+ChitUI Core Services
+
+Shared infrastructure used by main.py: printer connections and protocol helpers.
+"""
+
+from .connection import ConnectionEngine, PrinterConnection
+from .commands import CommandAPI, CommandError, CommandTimeout, PendingRequests
+from .state import PrinterStateCache, StatusDelta
+from .emitter import CoalescingEmitter
+from .outbound import OutboundQueue, QueueFull
+from .discovery import DiscoveryService
+from .settings import SettingsStore
+from .registry import PrinterRegistry, PrinterRecord, RegistrySnapshot
+from .startup import StartupTracker
+from .warmcache import WarmCache
+from .transfers import TransferScheduler, Transfer, TransferExists
+from .uploader import ChunkUploader, UploadError, ResumeRejected, ChecksumMismatch
+from .uploadsessions import UploadSessionStore, UploadSession
+from . import codec
+
+__all__ = [
+    'ConnectionEngine', 'PrinterConnection',
+    'CommandAPI', 'CommandError', 'CommandTimeout', 'PendingRequests',
+    'PrinterStateCache', 'StatusDelta', 'CoalescingEmitter',
+    'OutboundQueue', 'QueueFull', 'DiscoveryService', 'SettingsStore',
+    'PrinterRegistry', 'PrinterRecord', 'RegistrySnapshot', 'StartupTracker',
+    'WarmCache', 'TransferScheduler', 'Transfer', 'TransferExists', 'ChunkUploader', 'UploadError', 'ResumeRejected',
+    'ChecksumMismatch',
+    'UploadSessionStore', 'UploadSession',
+    'codec',
+]
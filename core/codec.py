@@ -0,0 +1,72 @@
+"""
+JSON Codec for ChitUI
+
+One JSON implementation for the SDCP and Socket.IO hot path: orjson or
+ujson when installed, otherwise the standard library. The CHITUI_JSON
+environment variable (orjson, ujson or json) forces a backend.
+
+The module has the loads()/dumps() interface python-socketio expects, so it
+can be passed as SocketIO(json=codec).
+"""
+
+import json as _stdlib
+import os
+
+
+def _select_backend():
+    preferred = os.environ.get('CHITUI_JSON')
+    for name in ([preferred] if preferred else []) + ['orjson', 'ujson']:
+        if name == 'json':
+            break
+        try:
+            return name, __import__(name)
+        except ImportError:
+            continue
+    return 'json', _stdlib
+
+
+BACKEND, _impl = _select_backend()
+
+if BACKEND == 'orjson':
+    _OPTIONS = _impl.OPT_NON_STR_KEYS
+
+    def loads(s, **kwargs):
+        """Decode JSON text (str or bytes)"""
+        return _impl.loads(s)
+
+    def dumps(obj, sort_keys=False, **kwargs):
+        """Encode compactly to str (other stdlib keyword arguments are ignored)"""
+        options = _OPTIONS | (_impl.OPT_SORT_KEYS if sort_keys else 0)
+        return _impl.dumps(obj, option=options).decode('utf-8')
+
+    def dumps_pretty(obj):
+        """Encode indented for logs"""
+        return _impl.dumps(obj, option=_OPTIONS | _impl.OPT_INDENT_2).decode('utf-8')
+
+elif BACKEND == 'ujson':
+    def loads(s, **kwargs):
+        """Decode JSON text (str or bytes)"""
+        return _impl.loads(s)
+
+    def dumps(obj, sort_keys=False, **kwargs):
+        """Encode compactly to str (other stdlib keyword arguments are ignored)"""
+        return _impl.dumps(obj, ensure_ascii=False, escape_forward_slashes=False,
+                           sort_keys=sort_keys)
+
+    def dumps_pretty(obj):
+        """Encode indented for logs"""
+        return _impl.dumps(obj, ensure_ascii=False, escape_forward_slashes=False, indent=2)
+
+else:
+    def loads(s, **kwargs):
+        """Decode JSON text (str or bytes)"""
+        return _stdlib.loads(s, **kwargs)
+
+    def dumps(obj, sort_keys=False, **kwargs):
+        """Encode compactly to str"""
+        kwargs.setdefault('separators', (',', ':'))
+        return _stdlib.dumps(obj, sort_keys=sort_keys, **kwargs)
+
+    def dumps_pretty(obj):
+        """Encode indented for logs"""
+        return _stdlib.dumps(obj, indent=2)
@@ -0,0 +1,327 @@
+"""
+SDCP Command API for ChitUI
+
+Correlates outgoing SDCP requests with their sdcp/response/ messages by
+RequestID, so callers can wait for (or be called back with) the answer to
+their own command instead of watching the broadcast stream.
+"""
+
+import heapq
+import os
+import threading
+import time
+from concurrent.futures import Future
+from loguru import logger
+
+from . import codec
+from .outbound import QUERY_CMDS
+
+
+# Per-command response timeouts in seconds (Cmd -> timeout)
+DEFAULT_TIMEOUTS = {
+    258: 15,  # Retrieve file list (large directories are slow)
+    320: 20,  # Clear print history
+    321: 10,  # Retrieve task details
+    322: 30,  # Format local storage
+}
+
+
+class CommandError(Exception):
+    """Raised when an SDCP command could not be completed"""
+
+
+class CommandTimeout(CommandError):
+    """Raised when a printer does not answer a command in time"""
+
+
+def new_request_id():
+    """Return a fresh SDCP RequestID"""
+    return os.urandom(8).hex()
+
+
+class PendingRequest:
+    """A request waiting for its sdcp/response/ message"""
+
+    __slots__ = ('request_id', 'printer_id', 'cmd', 'future', 'sent_at',
+                 'deadline', 'broadcast')
+
+    def __init__(self, request_id, printer_id, cmd, timeout, broadcast):
+        self.request_id = request_id
+        self.printer_id = printer_id
+        self.cmd = cmd
+        self.future = Future()
+        self.sent_at = time.monotonic()
+        self.deadline = self.sent_at + timeout
+        self.broadcast = broadcast
+
+
+class PendingRequests:
+    """Table of in-flight SDCP requests keyed by RequestID"""
+
+    def __init__(self, default_timeout=10, timeouts=None):
+        """
+        Initialize the pending request table.
+
+        Args:
+            default_timeout: Response timeout for commands without an override
+            timeouts: Optional dict of Cmd -> timeout overriding DEFAULT_TIMEOUTS
+        """
+        self.default_timeout = default_timeout
+        self.timeouts = dict(DEFAULT_TIMEOUTS)
+        self.timeouts.update(timeouts or {})
+        self._pending = {}
+        self._aliases = {}
+        self._deadlines = []
+        self._stats = {}
+        self._cond = threading.Condition()
+        self._sweeper = None
+
+    def register(self, printer_id, request_id, cmd, timeout=None, broadcast=True):
+        """
+        Start tracking a request before it is sent.
+
+        Args:
+            printer_id: Printer the request is sent to
+            request_id: RequestID placed in the SDCP payload
+            cmd: SDCP command number
+            timeout: Seconds to wait for the response (None = per-command default)
+            broadcast: Whether the response should still be broadcast to all clients
+
+        Returns:
+            concurrent.futures.Future resolved with the response message
+        """
+        if timeout is None:
+            timeout = self.timeouts.get(cmd, self.default_timeout)
+        entry = PendingRequest(request_id, printer_id, cmd, timeout, broadcast)
+        with self._cond:
+            self._pending[request_id] = entry
+            heapq.heappush(self._deadlines, (entry.deadline, request_id))
+            if self._sweeper is None:
+                self._sweeper = threading.Thread(target=self._sweep,
+                                                 name='sdcp-pending', daemon=True)
+                self._sweeper.start()
+            self._cond.notify()
+        return entry.future
+
+    def resolve(self, message):
+        """
+        Complete the request a response message belongs to.
+
+        Args:
+            message: Decoded SDCP message
+
+        Returns:
+            The matching PendingRequest, or None if the message answers no tracked request
+        """
+        data = message.get('Data')
+        request_id = data.get('RequestID') if isinstance(data, dict) else None
+        if not request_id:
+            return None
+
+        with self._cond:
+            entry = self._pending.pop(request_id, None)
+            if entry is None:
+                return None
+            self._record(entry, (time.monotonic() - entry.sent_at) * 1000)
+            riders = self._pop_aliases(request_id)
+
+        self._complete(entry, result=message)
+        for rider in riders:
+            self._complete(rider, result=message)
+        return entry
+
+    def alias(self, request_id, carrier_id):
+        """
+        Resolve a request with the response to another one.
+
+        Used when an identical query is already in flight and only the
+        carrier request is actually sent.
+
+        Returns:
+            True if the carrier is still waiting for its response
+        """
+        with self._cond:
+            rider = self._pending.get(request_id)
+            carrier = self._pending.get(carrier_id)
+            if rider is None or carrier is None:
+                return False
+            carrier.broadcast = carrier.broadcast or rider.broadcast
+            self._aliases.setdefault(carrier_id, []).append(request_id)
+            return True
+
+    def fail(self, request_id, error):
+        """Fail a tracked request immediately (e.g. the send itself failed)"""
+        with self._cond:
+            entry = self._pending.pop(request_id, None)
+            riders = self._pop_aliases(request_id)
+        for e in ([entry] if entry is not None else []) + riders:
+            self._complete(e, error=error)
+
+    def in_flight(self, printer_id=None):
+        """Return the number of unanswered requests, optionally for one printer"""
+        with self._cond:
+            if printer_id is None:
+                return len(self._pending)
+            return sum(1 for e in self._pending.values() if e.printer_id == printer_id)
+
+    def get_stats(self):
+        """
+        Return per-command latency statistics.
+
+        Returns:
+            Dict of Cmd -> {'count', 'timeouts', 'avg_ms', 'max_ms', 'last_ms'}
+        """
+        with self._cond:
+            stats = {}
+            for cmd, s in self._stats.items():
+                stats[cmd] = {
+                    'count': s['count'],
+                    'timeouts': s['timeouts'],
+                    'avg_ms': round(s['total_ms'] / s['count'], 1) if s['count'] else None,
+                    'max_ms': round(s['max_ms'], 1),
+                    'last_ms': round(s['last_ms'], 1) if s['last_ms'] is not None else None,
+                }
+            return stats
+
+    def _pop_aliases(self, request_id):
+        riders = []
+        for alias_id in self._aliases.pop(request_id, ()):
+            rider = self._pending.pop(alias_id, None)
+            if rider is not None:
+                riders.append(rider)
+        return riders
+
+    def _stats_for(self, cmd):
+        s = self._stats.get(cmd)
+        if s is None:
+            s = {'count': 0, 'timeouts': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'last_ms': None}
+            self._stats[cmd] = s
+        return s
+
+    def _record(self, entry, latency_ms):
+        s = self._stats_for(entry.cmd)
+        s['count'] += 1
+        s['total_ms'] += latency_ms
+        s['last_ms'] = latency_ms
+        if latency_ms > s['max_ms']:
+            s['max_ms'] = latency_ms
+
+    def _complete(self, entry, result=None, error=None):
+        try:
+            if error is not None:
+                entry.future.set_exception(error)
+            else:
+                entry.future.set_result(result)
+        except Exception as e:
+            # Future was cancelled by its owner, or a done-callback raised
+            logger.debug(f"Could not complete request {entry.request_id}: {e}")
+
+    def _sweep(self):
+        """Expire requests whose deadline has passed"""
+        while True:
+            with self._cond:
+                now = time.monotonic()
+                expired = []
+                while self._deadlines and self._deadlines[0][0] <= now:
+                    _, request_id = heapq.heappop(self._deadlines)
+                    self._aliases.pop(request_id, None)
+                    entry = self._pending.pop(request_id, None)
+                    if entry is not None:
+                        self._stats_for(entry.cmd)['timeouts'] += 1
+                        expired.append(entry)
+                if not expired:
+                    wait = self._deadlines[0][0] - now if self._deadlines else None
+                    self._cond.wait(wait)
+                    continue
+
+            for entry in expired:
+                logger.warning(f"Printer {entry.printer_id} did not answer Cmd {entry.cmd} "
+                               f"(RequestID {entry.request_id})")
+                self._complete(entry, error=CommandTimeout(
+                    f"Cmd {entry.cmd} to printer {entry.printer_id} timed out"))
+
+
+class CommandAPI:
+    """
+    Blocking and asynchronous access to printer commands.
+
+    Available to plugins as app.extensions['chitui_commands'].
+    """
+
+    def __init__(self, send, pending):
+        """
+        Initialize the command API.
+
+        Args:
+            send: Callable send(printer_id, cmd, data, request_id) -> bool that
+                  writes the SDCP request to the printer
+            pending: PendingRequests table used for correlation
+        """
+        self._send = send
+        self.pending = pending
+        self._in_flight = {}
+        self._coalesced = {}
+        self._lock = threading.Lock()
+
+    def call_async(self, printer_id, cmd, data=None, timeout=None, broadcast=False):
+        """
+        Send a command and return a Future for its response.
+
+        Use asyncio.wrap_future() to await it from a coroutine. The response
+        is only broadcast to every Socket.IO client if `broadcast` is True.
+        Queries (QUERY_CMDS) identical to one still in flight are not
+        sent again; they resolve with the response to the earlier request.
+
+        Returns:
+            concurrent.futures.Future resolved with the sdcp/response/ message,
+            or failed with CommandError / CommandTimeout
+        """
+        if data is None:
+            data = {}
+        request_id = new_request_id()
+        future = self.pending.register(printer_id, request_id, cmd, timeout, broadcast)
+
+        if cmd in QUERY_CMDS:
+            key = (printer_id, cmd, codec.dumps(data, sort_keys=True))
+            with self._lock:
+                carrier = self._in_flight.setdefault(key, request_id)
+            if carrier != request_id:
+                if self.pending.alias(request_id, carrier):
+                    with self._lock:
+                        self._coalesced[cmd] = self._coalesced.get(cmd, 0) + 1
+                    return future
+                # Carrier completed in the meantime; this request goes out itself
+                with self._lock:
+                    self._in_flight[key] = request_id
+            future.add_done_callback(lambda _, key=key: self._land(key, request_id))
+
+        if not self._send(printer_id, cmd, data, request_id):
+            self.pending.fail(request_id, CommandError(
+                f"Could not send Cmd {cmd} to printer {printer_id}"))
+        return future
+
+    def call(self, printer_id, cmd, data=None, timeout=None):
+        """
+        Send a command and block until the printer answers.
+
+        Returns:
+            The sdcp/response/ message
+
+        Raises:
+            CommandError: If the command could not be sent
+            CommandTimeout: If the printer did not answer in time
+        """
+        return self.call_async(printer_id, cmd, data, timeout).result()
+
+    def get_stats(self):
+        """Return per-command latency statistics and coalesced call counts"""
+        stats = self.pending.get_stats()
+        with self._lock:
+            for cmd, coalesced in self._coalesced.items():
+                stats.setdefault(cmd, {})['coalesced'] = coalesced
+        return stats
+
+    def _land(self, key, request_id):
+        with self._lock:
+            if self._in_flight.get(key) == request_id:
+                del self._in_flight[key]
@@ -0,0 +1,350 @@
+"""
+SDCP Connection Engine for ChitUI
+
+Multiplexes every printer websocket (ws://<ip>:3030/websocket) on a single
+asyncio event loop running in one background thread, instead of running a
+websocket-client WebSocketApp thread per printer. Outgoing frames go
+through a per-printer OutboundQueue drained by one writer coroutine.
+
+Each connection is supervised: it moves between connecting, online,
+offline and backoff, retries with exponential backoff and jitter, and
+detects half-open sockets with websocket ping heartbeats.
+"""
+
+import asyncio
+import random
+import threading
+import time
+import websockets
+from loguru import logger
+
+from .outbound import OutboundQueue
+
+
+# Connection states
+CONNECTING = 'connecting'
+ONLINE = 'online'
+OFFLINE = 'offline'
+BACKOFF = 'backoff'
+
+
+class PrinterConnection:
+    """
+    Handle for a single printer websocket.
+
+    Exposes the small part of the WebSocketApp interface the rest of ChitUI
+    uses (send/close), plus the outbound command queue. Safe to call from
+    any thread.
+    """
+
+    def __init__(self, engine, printer_id, url, name):
+        """
+        Initialize the connection handle.
+
+        Args:
+            engine: Owning ConnectionEngine
+            printer_id: Mainboard ID of the printer
+            url: Websocket URL of the printer
+            name: Display name used in log messages
+        """
+        self.engine = engine
+        self.printer_id = printer_id
+        self.url = url
+        self.name = name
+        self.ws = None
+        self.connected = False
+        self.closed = False
+        self.queue = OutboundQueue(engine.max_queue, engine.max_unacked, engine.ack_timeout)
+        self.state = OFFLINE
+        self.failures = 0
+        self.retry_at = None
+        self._attempted = threading.Event()
+        self._task = None
+        self._wakeup = None
+        self._retry = None
+
+    def send(self, msg):
+        """
+        Queue a raw text frame for the printer.
+
+        Raises:
+            ConnectionError: If the printer is not currently connected
+            QueueFull: If the outbound queue is at capacity
+        """
+        self.send_request(None, None, None, msg)
+
+    def send_request(self, request_id, cmd, data, msg):
+        """
+        Queue an SDCP request for the printer.
+
+        Args:
+            request_id: RequestID inside `msg`
+            cmd: SDCP command number
+            data: Command Data
+            msg: Serialized request
+
+        Returns:
+            RequestID that will carry this request (differs from `request_id`
+            when an identical query was already queued)
+
+        Raises:
+            ConnectionError: If the printer is not currently connected
+            QueueFull: If the outbound queue is at capacity
+        """
+        if not self.connected:
+            raise ConnectionError(f"Printer '{self.name}' is not connected")
+        carrier = self.queue.put(request_id, cmd, data, msg)
+        self._wake()
+        return carrier
+
+    def ack(self, request_id):
+        """Record the printer's answer to a request, releasing backpressure"""
+        if self.queue.ack(request_id):
+            self._wake()
+
+    def close(self):
+        """Close the websocket and stop reconnecting"""
+        self.closed = True
+        if self.engine.loop is not None:
+            self.engine.loop.call_soon_threadsafe(self._cancel)
+
+    def _cancel(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    def wait_online(self, timeout=None):
+        """
+        Block until the first connection attempt has finished.
+
+        Args:
+            timeout: Maximum seconds to wait (None = no limit)
+
+        Returns:
+            True if the printer is online, False if the attempt failed or timed out
+        """
+        self._attempted.wait(timeout)
+        return self.state == ONLINE
+
+    def get_state(self):
+        """Return the supervisor state as a JSON-friendly dict"""
+        retry_in = None
+        if self.state == BACKOFF and self.retry_at is not None:
+            retry_in = round(max(0.0, self.retry_at - time.time()), 1)
+        return {'id': self.printer_id, 'state': self.state,
+                'failures': self.failures, 'retry_in': retry_in}
+
+    def _wake(self):
+        loop = self.engine.loop
+        if loop is not None and self._wakeup is not None:
+            loop.call_soon_threadsafe(self._wakeup.set)
+
+
+class ConnectionEngine:
+    """Runs all printer websockets on one event loop"""
+
+    def __init__(self, on_message, on_open=None, on_close=None, on_error=None,
+                 on_dropped=None, on_state=None, reconnect_delay=1, max_reconnect_delay=60,
+                 open_timeout=2, heartbeat_interval=10, heartbeat_timeout=10,
+                 max_queue=64, max_unacked=4, ack_timeout=10):
+        """
+        Initialize the connection engine.
+
+        Callbacks run on the engine thread and receive the PrinterConnection
+        as their first argument, mirroring the WebSocketApp callbacks.
+
+        Args:
+            on_message: Called as on_message(conn, msg) for every text frame
+            on_open: Called as on_open(conn) once a connection is established
+            on_close: Called as on_close(conn) when an open connection drops
+            on_error: Called as on_error(conn, error) when connecting fails
+            on_dropped: Called as on_dropped(conn, request_id) for each queued
+                        request discarded because the connection went away
+            on_state: Called as on_state(conn, previous_state) whenever
+                      conn.state changes
+            reconnect_delay: Initial seconds to wait before reconnecting
+            max_reconnect_delay: Upper bound of the exponential backoff
+            open_timeout: Seconds allowed for the websocket handshake
+            heartbeat_interval: Seconds between websocket pings (0 = no heartbeat)
+            heartbeat_timeout: Seconds to wait for a pong before dropping the socket
+            max_queue: Outbound queue capacity per printer
+            max_unacked: Unanswered requests per printer before ordinary commands wait
+            ack_timeout: Seconds before an unanswered request stops holding the queue
+        """
+        self.on_message = on_message
+        self.on_open = on_open
+        self.on_close = on_close
+        self.on_error = on_error
+        self.on_dropped = on_dropped
+        self.on_state = on_state
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.open_timeout = open_timeout
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.max_queue = max_queue
+        self.max_unacked = max_unacked
+        self.ack_timeout = ack_timeout
+        self.connections = {}
+        self.loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the event loop thread (no-op if already running)"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self.loop = asyncio.new_event_loop()
+            ready = threading.Event()
+            self._thread = threading.Thread(target=self._run, args=(ready,),
+                                            name='sdcp-engine', daemon=True)
+            self._thread.start()
+        ready.wait()
+
+    def _run(self, ready):
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(ready.set)
+        self.loop.run_forever()
+
+    def connect(self, printer_id, url, name):
+        """
+        Open (or replace) the connection to a printer.
+
+        Returns:
+            PrinterConnection handle
+        """
+        self.start()
+        conn = PrinterConnection(self, printer_id, url, name)
+        previous = self.connections.get(printer_id)
+        self.connections[printer_id] = conn
+        if previous is not None:
+            previous.close()
+        self.loop.call_soon_threadsafe(self._spawn, conn)
+        return conn
+
+    def disconnect(self, printer_id):
+        """Close and forget the connection to a printer"""
+        conn = self.connections.pop(printer_id, None)
+        if conn is not None:
+            conn.close()
+
+    def wake(self, printer_id):
+        """Retry a backed-off connection now (e.g. the printer answered discovery)"""
+        conn = self.connections.get(printer_id)
+        if conn is not None and conn.state == BACKOFF and self.loop is not None:
+            self.loop.call_soon_threadsafe(self._wake_retry, conn)
+
+    def _wake_retry(self, conn):
+        if conn._retry is not None:
+            conn._retry.set()
+
+    def get_states(self):
+        """Return the supervisor state of every connection"""
+        return {printer_id: conn.get_state()
+                for printer_id, conn in list(self.connections.items())}
+
+    def get_stats(self):
+        """Return outbound queue statistics per printer"""
+        return {printer_id: conn.queue.get_stats()
+                for printer_id, conn in list(self.connections.items())}
+
+    def _spawn(self, conn):
+        if not conn.closed:
+            conn._task = self.loop.create_task(self._run_connection(conn))
+
+    async def _run_connection(self, conn):
+        conn._retry = asyncio.Event()
+        while not conn.closed:
+            self._set_state(conn, CONNECTING)
+            try:
+                async with websockets.connect(conn.url,
+                                              open_timeout=self.open_timeout,
+                                              ping_interval=self.heartbeat_interval or None,
+                                              ping_timeout=self.heartbeat_timeout or None,
+                                              compression=None,
+                                              max_size=2 ** 24) as ws:
+                    conn.ws = ws
+                    conn._wakeup = asyncio.Event()
+                    conn.connected = True
+                    conn.failures = 0
+                    writer = self.loop.create_task(self._write_loop(conn, ws))
+                    self._set_state(conn, ONLINE)
+                    self._call(self.on_open, conn)
+                    try:
+                        async for msg in ws:
+                            self._call(self.on_message, conn, msg)
+                    finally:
+                        conn.connected = False
+                        conn.ws = None
+                        writer.cancel()
+                        for item in conn.queue.drain():
+                            self._drop(conn, item)
+                        self._set_state(conn, OFFLINE)
+                        self._call(self.on_close, conn)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                conn.failures += 1
+                self._call(self.on_error, conn, e)
+
+            if conn.closed:
+                break
+            delay = self._backoff_delay(conn.failures)
+            conn.retry_at = time.time() + delay
+            conn._retry.clear()
+            self._set_state(conn, BACKOFF)
+            try:
+                await asyncio.wait_for(conn._retry.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+            except asyncio.CancelledError:
+                break
+            conn.retry_at = None
+
+        self._set_state(conn, OFFLINE)
+
+    def _backoff_delay(self, failures):
+        """Exponential backoff with equal jitter"""
+        delay = min(self.max_reconnect_delay, self.reconnect_delay * 2 ** max(0, failures - 1))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def _set_state(self, conn, state):
+        previous = conn.state
+        if previous == state:
+            return
+        conn.state = state
+        if state != CONNECTING:
+            conn._attempted.set()
+        self._call(self.on_state, conn, previous)
+
+    async def _write_loop(self, conn, ws):
+        """Single writer for a connection: drains its outbound queue in order"""
+        queue = conn.queue
+        while True:
+            conn._wakeup.clear()
+            item = queue.pop()
+            if item is None:
+                try:
+                    await asyncio.wait_for(conn._wakeup.wait(), queue.blocked_for())
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await ws.send(item.msg)
+            except Exception as e:
+                logger.error(f"Failed to send to '{conn.name}': {e}")
+                self._drop(conn, item)
+                return
+            queue.sent(item)
+
+    def _drop(self, conn, item):
+        if item.request_id:
+            self._call(self.on_dropped, conn, item.request_id)
+
+    def _call(self, callback, *args):
+        if callback is None:
+            return
+        try:
+            callback(*args)
+        except Exception as e:
+            logger.error(f"Connection callback {getattr(callback, '__name__', callback)} failed: {e}")
@@ -0,0 +1,237 @@
+"""
+SDCP Printer Discovery for ChitUI
+
+A long-lived service that owns the discovery UDP socket, broadcasts the
+`M99999` probe periodically and listens for replies continuously, keeping
+a TTL cache of the mainboards it has seen. Readers get the cache instantly;
+a blocking sweep is only done when explicitly asked for.
+
+Printers on routed subnets or behind broadcast-filtering switches are found
+by probing every host of the configured CIDR ranges by unicast, with a
+bounded number of unanswered probes in flight.
+"""
+
+import ipaddress
+import socket
+import threading
+import time
+from loguru import logger
+
+from . import codec
+
+
+DISCOVERY_PORT = 3000
+DISCOVERY_PROBE = b'M99999'
+
+# Largest range scan() accepts (a /16)
+MAX_SCAN_HOSTS = 65534
+
+
+def parse_discovery_reply(data):
+    """
+    Decode a printer's reply to the discovery probe.
+
+    Returns:
+        (MainboardID, printer dict) tuple
+    """
+    j = codec.loads(data)
+    printer = {}
+    printer['connection'] = j['Id']
+    printer['name'] = j['Data']['Name']
+    printer['model'] = j['Data']['MachineName']
+    printer['brand'] = j['Data']['BrandName']
+    printer['ip'] = j['Data']['MainboardIP']
+    printer['protocol'] = j['Data']['ProtocolVersion']
+    printer['firmware'] = j['Data']['FirmwareVersion']
+    return j['Data']['MainboardID'], printer
+
+
+class DiscoveryService:
+    """Periodic broadcast discovery with a TTL cache of replies"""
+
+    def __init__(self, on_result=None, interval=30, ttl=90, bind_port=54781,
+                 broadcast_address='255.255.255.255', subnets=None,
+                 window=256, probe_timeout=0.5):
+        """
+        Initialize the discovery service.
+
+        Args:
+            on_result: Called as on_result(printer_id, printer) for every reply,
+                       on the discovery thread
+            interval: Seconds between broadcast probes (None = only on sweep())
+            ttl: Seconds a printer stays cached after its last reply
+            bind_port: Local UDP port; an ephemeral port is used if it is taken
+            broadcast_address: Address the probe is sent to
+            subnets: CIDR ranges also probed host by host (e.g. ['10.0.4.0/22'])
+            window: Maximum unanswered unicast probes in flight
+            probe_timeout: Seconds a unicast probe counts as in flight
+        """
+        self.on_result = on_result
+        self.interval = interval
+        self.ttl = ttl
+        self.bind_port = bind_port
+        self.broadcast_address = broadcast_address
+        self.subnets = list(subnets or [])
+        self.window = window
+        self.probe_timeout = probe_timeout
+        self._cache = {}
+        self._sock = None
+        self._thread = None
+        self._next_probe = 0.0
+        self._lock = threading.Lock()
+        self._scan_lock = threading.Lock()
+        self._scan_cond = threading.Condition()
+        self._in_flight = {}
+
+    def start(self):
+        """Bind the socket and start the listener thread (no-op if running)"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            try:
+                sock.bind(('', self.bind_port))
+            except OSError as e:
+                logger.warning(f"Discovery port {self.bind_port} unavailable ({e}), using an ephemeral port")
+                sock.bind(('', 0))
+            self._sock = sock
+            self._thread = threading.Thread(target=self._run, name='sdcp-discovery', daemon=True)
+            self._thread.start()
+
+    def probe(self, address=None):
+        """Send the discovery probe (to the broadcast address by default)"""
+        self.start()
+        try:
+            self._sock.sendto(DISCOVERY_PROBE, (address or self.broadcast_address, DISCOVERY_PORT))
+        except OSError as e:
+            logger.error(f"Failed to send discovery probe: {e}")
+
+    def sweep(self, timeout=1):
+        """
+        Probe now (broadcast plus configured subnets) and wait for replies.
+
+        Args:
+            timeout: Minimum seconds to collect replies
+
+        Returns:
+            Dict of MainboardID -> printer for every printer that answered
+        """
+        logger.info("Starting printer discovery.")
+        started = time.monotonic()
+        self.probe()
+        if self.subnets:
+            self.scan(self.subnets)
+        remaining = started + timeout - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+        with self._lock:
+            found = {pid: printer for pid, (printer, seen) in self._cache.items() if seen >= started}
+        logger.info("Discovery done.")
+        return found
+
+    def scan(self, subnets):
+        """
+        Probe every host of the given CIDR ranges by unicast.
+
+        At most `window` probes are unanswered at any time; a probe stops
+        counting once its host replies or after `probe_timeout`. Replies are
+        reported through on_result as they arrive.
+
+        Args:
+            subnets: Iterable of CIDR strings
+
+        Returns:
+            Dict of MainboardID -> printer for every printer that answered
+        """
+        hosts = []
+        for cidr in subnets:
+            try:
+                network = ipaddress.ip_network(cidr.strip(), strict=False)
+            except ValueError as e:
+                logger.warning(f"Ignoring discovery subnet {cidr!r}: {e}")
+                continue
+            if network.version != 4 or network.num_addresses > MAX_SCAN_HOSTS + 2:
+                logger.warning(f"Ignoring discovery subnet {cidr}: only IPv4 ranges up to /16 are scanned")
+                continue
+            if network.num_addresses == 1:
+                hosts.append(str(network.network_address))
+            else:
+                hosts.extend(str(host) for host in network.hosts())
+
+        self.start()
+        with self._scan_lock:
+            started = time.monotonic()
+            logger.info(f"Scanning {len(hosts)} addresses for printers")
+            with self._scan_cond:
+                for host in hosts:
+                    while self._expire_probes() >= self.window:
+                        self._scan_cond.wait(self._next_expiry())
+                    try:
+                        self._sock.sendto(DISCOVERY_PROBE, (host, DISCOVERY_PORT))
+                    except OSError as e:
+                        logger.debug(f"Discovery probe to {host} failed: {e}")
+                        continue
+                    self._in_flight[host] = time.monotonic()
+                while self._expire_probes():
+                    self._scan_cond.wait(self._next_expiry())
+            with self._lock:
+                found = {pid: printer for pid, (printer, seen) in self._cache.items() if seen >= started}
+            logger.info(f"Subnet scan done in {time.monotonic() - started:.2f}s, {len(found)} printers")
+            return found
+
+    def _expire_probes(self):
+        """Drop timed-out probes; return how many are still in flight"""
+        cutoff = time.monotonic() - self.probe_timeout
+        for host in [h for h, sent in self._in_flight.items() if sent < cutoff]:
+            del self._in_flight[host]
+        return len(self._in_flight)
+
+    def _next_expiry(self):
+        """Seconds until the oldest in-flight probe times out"""
+        oldest = min(self._in_flight.values())
+        return max(0.01, oldest + self.probe_timeout - time.monotonic())
+
+    def results(self):
+        """Return cached printers that replied within the TTL"""
+        cutoff = time.monotonic() - self.ttl
+        with self._lock:
+            for pid in [p for p, (_, seen) in self._cache.items() if seen < cutoff]:
+                del self._cache[pid]
+            return {pid: dict(printer) for pid, (printer, _) in self._cache.items()}
+
+    def _run(self):
+        while True:
+            now = time.monotonic()
+            if self.interval and now >= self._next_probe:
+                self.probe()
+                if self.subnets and not self._scan_lock.locked():
+                    threading.Thread(target=self.scan, args=(self.subnets,),
+                                     name='sdcp-discovery-scan', daemon=True).start()
+                self._next_probe = now + self.interval
+            self._sock.settimeout(max(0.1, self._next_probe - now) if self.interval else None)
+            try:
+                data, address = self._sock.recvfrom(8192)
+            except socket.timeout:
+                continue
+            except OSError as e:
+                logger.error(f"Discovery socket error: {e}")
+                time.sleep(1)
+                continue
+
+            with self._scan_cond:
+                if self._in_flight.pop(address[0], None) is not None:
+                    self._scan_cond.notify()
+            try:
+                printer_id, printer = parse_discovery_reply(data)
+            except (ValueError, KeyError, TypeError) as e:
+                logger.debug(f"Ignoring malformed discovery reply: {e}")
+                continue
+            with self._lock:
+                self._cache[printer_id] = (printer, time.monotonic())
+            if self.on_result is not None:
+                try:
+                    self.on_result(printer_id, dict(printer))
+                except Exception as e:
+                    logger.error(f"Discovery callback failed: {e}")
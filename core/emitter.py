@@ -0,0 +1,89 @@
+"""
+Coalescing Emitter for ChitUI
+
+Buffers bursty per-printer updates and hands only the latest one of each
+kind to a flush callback, at most `max_rate` times per second per printer.
+Flushing happens on a dedicated thread so printer sockets never wait on
+Socket.IO clients.
+"""
+
+import threading
+import time
+from loguru import logger
+
+
+class CoalescingEmitter:
+    """Rate-limited, latest-wins buffer of per-printer updates"""
+
+    def __init__(self, flush, max_rate=4.0):
+        """
+        Initialize the emitter.
+
+        Args:
+            flush: Called as flush(printer_id, key, payload) on the emitter thread
+            max_rate: Maximum flushes per second per printer (0 = no limit)
+        """
+        self.flush = flush
+        self.interval = 1.0 / max_rate if max_rate > 0 else 0.0
+        self._pending = {}
+        self._last_flush = {}
+        self._stats = {'submitted': 0, 'emitted': 0, 'coalesced': 0}
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def submit(self, printer_id, key, payload):
+        """
+        Queue an update, replacing any not-yet-flushed update with the same key.
+
+        Args:
+            printer_id: Printer the update belongs to
+            key: Update kind (e.g. 'status'); one pending payload is kept per key
+            payload: Latest payload for that kind
+        """
+        with self._cond:
+            pending = self._pending.setdefault(printer_id, {})
+            if key in pending:
+                self._stats['coalesced'] += 1
+            pending[key] = payload
+            self._stats['submitted'] += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='status-emitter', daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def discard(self, printer_id):
+        """Drop any pending updates for a printer"""
+        with self._cond:
+            self._pending.pop(printer_id, None)
+            self._last_flush.pop(printer_id, None)
+
+    def get_stats(self):
+        """Return submitted/emitted/coalesced counters"""
+        with self._cond:
+            return dict(self._stats, max_rate=round(1.0 / self.interval, 2) if self.interval else None)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    due = [pid for pid in self._pending
+                           if now - self._last_flush.get(pid, float('-inf')) >= self.interval]
+                    if due:
+                        break
+                    wait = None
+                    if self._pending:
+                        wait = min(self._last_flush[pid] for pid in self._pending) + self.interval - now
+                    self._cond.wait(wait)
+                batches = []
+                for pid in due:
+                    batches.append((pid, self._pending.pop(pid)))
+                    self._last_flush[pid] = now
+                    self._stats['emitted'] += 1
+
+            for pid, updates in batches:
+                for key, payload in updates.items():
+                    try:
+                        self.flush(pid, key, payload)
+                    except Exception as e:
+                        logger.error(f"Error emitting {key} for printer {pid}: {e}")
@@ -0,0 +1,200 @@
+"""
+Outbound Command Queue for ChitUI
+
+Every printer connection owns one OutboundQueue, drained by a single writer
+coroutine on the engine loop, so requests from Flask, Socket.IO and plugin
+threads reach the websocket one at a time and in order.
+
+- Stop/pause jump ahead of everything else.
+- Identical queries still waiting in the queue are sent once.
+- When the printer stops acknowledging requests, ordinary commands wait
+  until it catches up instead of piling onto the socket.
+"""
+
+import threading
+import time
+from collections import deque
+
+from . import codec
+
+
+# Commands that skip the line and ignore backpressure
+PRIORITY_CMDS = frozenset({
+    129,  # Pause print
+    130,  # Stop print
+})
+
+# Read-only queries where identical requests can share one send (queued
+# here, or in flight in core.commands)
+QUERY_CMDS = frozenset({
+    0,    # Status
+    1,    # Attributes
+    258,  # Retrieve file list
+    321,  # Retrieve task details
+})
+
+
+class QueueFull(Exception):
+    """Raised when a printer's outbound queue is at capacity"""
+
+
+class OutboundItem:
+    """A serialized request waiting to be written"""
+
+    __slots__ = ('request_id', 'cmd', 'msg', 'key', 'priority', 'queued_at')
+
+    def __init__(self, request_id, cmd, msg, key, priority):
+        self.request_id = request_id
+        self.cmd = cmd
+        self.msg = msg
+        self.key = key
+        self.priority = priority
+        self.queued_at = time.monotonic()
+
+
+class OutboundQueue:
+    """Bounded two-class queue of requests for one printer"""
+
+    def __init__(self, max_depth=64, max_unacked=4, ack_timeout=10):
+        """
+        Initialize the queue.
+
+        Args:
+            max_depth: Maximum queued ordinary commands (priority commands are always accepted)
+            max_unacked: Sent-but-unanswered requests allowed before ordinary commands wait
+            ack_timeout: Seconds after which an unanswered request stops counting as unacked
+        """
+        self.max_depth = max_depth
+        self.max_unacked = max_unacked
+        self.ack_timeout = ack_timeout
+        self._high = deque()
+        self._normal = deque()
+        self._queued_keys = {}
+        self._unacked = {}
+        self._lock = threading.Lock()
+        self._stats = {'queued': 0, 'sent': 0, 'deduped': 0, 'rejected': 0,
+                       'max_depth_seen': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'last_ms': None}
+
+    def put(self, request_id, cmd, data, msg):
+        """
+        Queue a serialized request.
+
+        Args:
+            request_id: RequestID inside `msg`
+            cmd: SDCP command number
+            data: Command Data (used to detect identical queries)
+            msg: Text frame to write
+
+        Returns:
+            RequestID of the queued request that will carry this one: the
+            given request_id, or that of an identical query already queued
+
+        Raises:
+            QueueFull: If the queue is at capacity
+        """
+        priority = cmd in PRIORITY_CMDS
+        key = None
+        if cmd in QUERY_CMDS:
+            key = (cmd, codec.dumps(data, sort_keys=True))
+
+        with self._lock:
+            if key is not None and key in self._queued_keys:
+                self._stats['deduped'] += 1
+                return self._queued_keys[key].request_id
+            if not priority and len(self._normal) >= self.max_depth:
+                self._stats['rejected'] += 1
+                raise QueueFull(f"Outbound queue full ({self.max_depth} commands)")
+
+            item = OutboundItem(request_id, cmd, msg, key, priority)
+            (self._high if priority else self._normal).append(item)
+            if key is not None:
+                self._queued_keys[key] = item
+            self._stats['queued'] += 1
+            depth = len(self._high) + len(self._normal)
+            if depth > self._stats['max_depth_seen']:
+                self._stats['max_depth_seen'] = depth
+            return request_id
+
+    def pop(self):
+        """
+        Take the next request allowed to be written.
+
+        Returns:
+            OutboundItem, or None if the queue is empty or ordinary commands
+            are held back by unacknowledged requests
+        """
+        with self._lock:
+            if self._high:
+                item = self._high.popleft()
+            elif self._normal and self._unacked_count() < self.max_unacked:
+                item = self._normal.popleft()
+            else:
+                return None
+            if item.key is not None:
+                self._queued_keys.pop(item.key, None)
+            return item
+
+    def sent(self, item):
+        """Record that a request was written to the websocket"""
+        now = time.monotonic()
+        latency_ms = (now - item.queued_at) * 1000
+        with self._lock:
+            if item.request_id:
+                self._unacked[item.request_id] = now
+            s = self._stats
+            s['sent'] += 1
+            s['total_ms'] += latency_ms
+            s['last_ms'] = latency_ms
+            if latency_ms > s['max_ms']:
+                s['max_ms'] = latency_ms
+
+    def ack(self, request_id):
+        """
+        Record that the printer answered a request.
+
+        Returns:
+            True if the request was waiting for its answer
+        """
+        with self._lock:
+            return self._unacked.pop(request_id, None) is not None
+
+    def blocked_for(self):
+        """Seconds until the oldest unacked request expires, or None if not blocked"""
+        with self._lock:
+            if not self._normal or self._unacked_count() < self.max_unacked:
+                return None
+            return max(0.0, min(self._unacked.values()) + self.ack_timeout - time.monotonic())
+
+    def drain(self):
+        """Remove and return every queued request"""
+        with self._lock:
+            items = list(self._high) + list(self._normal)
+            self._high.clear()
+            self._normal.clear()
+            self._queued_keys.clear()
+            self._unacked.clear()
+            return items
+
+    def get_stats(self):
+        """Return depth, dedupe/backpressure counters and send latency"""
+        with self._lock:
+            s = self._stats
+            return {
+                'depth': len(self._high) + len(self._normal),
+                'priority_depth': len(self._high),
+                'max_depth_seen': s['max_depth_seen'],
+                'unacked': self._unacked_count(),
+                'queued': s['queued'],
+                'sent': s['sent'],
+                'deduped': s['deduped'],
+                'rejected': s['rejected'],
+                'avg_send_ms': round(s['total_ms'] / s['sent'], 2) if s['sent'] else None,
+                'max_send_ms': round(s['max_ms'], 2),
+                'last_send_ms': round(s['last_ms'], 2) if s['last_ms'] is not None else None,
+            }
+
+    def _unacked_count(self):
+        cutoff = time.monotonic() - self.ack_timeout
+        for request_id in [r for r, t in self._unacked.items() if t < cutoff]:
+            del self._unacked[request_id]
+        return len(self._unacked)
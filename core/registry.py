@@ -0,0 +1,180 @@
+"""
+Printer Registry for ChitUI
+
+Known printers and their websocket connections, shared by discovery, Flask
+request threads and websocket callbacks. Writers take a lock and publish a
+new immutable, versioned snapshot; readers and emits use the current
+snapshot without locking, so they never see a half-applied change.
+"""
+
+import threading
+from types import MappingProxyType
+from loguru import logger
+
+
+PRINTER_FIELDS = ('connection', 'name', 'model', 'brand', 'ip', 'protocol', 'firmware')
+
+
+class PrinterRecord:
+    """Immutable description of one printer (as sent to clients)"""
+
+    __slots__ = PRINTER_FIELDS
+
+    def __init__(self, connection, name, ip, model='Unknown', brand='Unknown',
+                 protocol='Unknown', firmware='Unknown'):
+        for field, value in zip(PRINTER_FIELDS, (connection, name, model, brand, ip, protocol, firmware)):
+            object.__setattr__(self, field, value)
+
+    @classmethod
+    def from_dict(cls, printer):
+        """Build a record from a printer dict (discovery reply, settings entry)"""
+        return cls(**{field: printer[field] for field in PRINTER_FIELDS if field in printer})
+
+    def replace(self, **changes):
+        """Return a copy with some fields changed"""
+        fields = self.to_dict()
+        fields.update(changes)
+        return PrinterRecord(**fields)
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in PRINTER_FIELDS}
+
+    def __setattr__(self, name, value):
+        raise AttributeError('PrinterRecord is immutable')
+
+    def __eq__(self, other):
+        if not isinstance(other, PrinterRecord):
+            return NotImplemented
+        return all(getattr(self, f) == getattr(other, f) for f in PRINTER_FIELDS)
+
+    def __hash__(self):
+        return hash(tuple(getattr(self, f) for f in PRINTER_FIELDS))
+
+    def __repr__(self):
+        return f"PrinterRecord({self.name!r}, {self.ip!r})"
+
+
+class RegistrySnapshot:
+    """The set of known printers at one version; never changes once published"""
+
+    __slots__ = ('version', 'records', 'printers')
+
+    def __init__(self, version, records):
+        self.version = version
+        self.records = MappingProxyType(records)
+        # Built once per version and shared by every emit; treat as read-only
+        self.printers = {printer_id: record.to_dict() for printer_id, record in records.items()}
+
+    def get(self, printer_id):
+        return self.records.get(printer_id)
+
+    def __contains__(self, printer_id):
+        return printer_id in self.records
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __len__(self):
+        return len(self.records)
+
+
+class PrinterRegistry:
+    """Thread-safe registry of printers (copy-on-write) and their connections"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = RegistrySnapshot(0, {})
+        self._connections = {}
+        self._subscribers = []
+
+    # ---- Printers ----
+
+    def snapshot(self):
+        """Return the current snapshot (no locking; safe to iterate and emit)"""
+        return self._snapshot
+
+    def get(self, printer_id):
+        """Return a printer's record, or None"""
+        return self._snapshot.records.get(printer_id)
+
+    def put(self, printer_id, record):
+        """
+        Add or replace a printer.
+
+        Returns:
+            True if the registry changed
+        """
+        return self.merge({printer_id: record})
+
+    def merge(self, records, replace=True):
+        """
+        Add several printers as one change.
+
+        Args:
+            records: Dict of printer_id -> PrinterRecord
+            replace: Also overwrite printers that are already known
+
+        Returns:
+            True if the registry changed
+        """
+        def apply(current):
+            changed = False
+            for printer_id, record in records.items():
+                existing = current.get(printer_id)
+                if existing is None or (replace and existing != record):
+                    current[printer_id] = record
+                    changed = True
+            return changed
+
+        return self._commit(apply)
+
+    def remove(self, printer_id):
+        """
+        Forget a printer.
+
+        Returns:
+            True if it was known
+        """
+        return self._commit(lambda current: current.pop(printer_id, None) is not None)
+
+    def subscribe(self, callback):
+        """Call callback(old, new) with snapshots after every change, on the changing thread"""
+        self._subscribers.append(callback)
+
+    def _commit(self, apply):
+        with self._lock:
+            old = self._snapshot
+            records = dict(old.records)
+            if not apply(records):
+                return False
+            new = self._snapshot = RegistrySnapshot(old.version + 1, records)
+        for callback in list(self._subscribers):
+            try:
+                callback(old, new)
+            except Exception as e:
+                logger.error(f"Registry subscriber failed: {e}")
+        return True
+
+    # ---- Connections ----
+
+    def connection(self, printer_id):
+        """Return a printer's PrinterConnection, or None"""
+        with self._lock:
+            return self._connections.get(printer_id)
+
+    def connections(self):
+        """Return a copy of printer_id -> PrinterConnection"""
+        with self._lock:
+            return dict(self._connections)
+
+    def attach(self, printer_id, conn):
+        """Record a printer's connection, returning the one it replaces"""
+        with self._lock:
+            previous = self._connections.get(printer_id)
+            self._connections[printer_id] = conn
+            return previous
+
+    def detach(self, printer_id):
+        """Forget a printer's connection, returning it"""
+        with self._lock:
+            return self._connections.pop(printer_id, None)
@@ -0,0 +1,140 @@
+"""
+Settings Store for ChitUI
+
+Loads chitui_settings.json once and serves reads from memory. Changes are
+written behind on a background thread, debounced so bursts of updates end
+up in one write, and each write is atomic (temp file, fsync, rename) so a
+power cut on an SD card never leaves a truncated settings file.
+"""
+
+import copy
+import json
+import os
+import threading
+import time
+from loguru import logger
+
+
+def write_atomic(path, text):
+    """Replace a file's contents so readers see either the old or the new file"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    # Persist the rename itself
+    dir_fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
+class SettingsStore:
+    """Process-wide, thread-safe settings with write-behind persistence"""
+
+    def __init__(self, path, defaults=None, write_delay=0.5):
+        """
+        Initialize the settings store.
+
+        Args:
+            path: Settings JSON file
+            defaults: Settings used when the file is missing or unreadable
+            write_delay: Seconds to wait for further changes before writing
+        """
+        self.path = path
+        self.defaults = defaults or {}
+        self.write_delay = write_delay
+        self._settings = None
+        self._subscribers = []
+        self._dirty = False
+        self._write_at = 0.0
+        self._writer = None
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+
+    def get(self):
+        """Return a copy of the current settings"""
+        with self._cond:
+            return copy.deepcopy(self._load())
+
+    def set(self, settings):
+        """Replace the settings and schedule a write"""
+        with self._cond:
+            old = self._load()
+            self._settings = copy.deepcopy(settings)
+            new = copy.deepcopy(self._settings)
+            self._schedule()
+        self._notify(old, new)
+
+    def update(self, mutate):
+        """
+        Change the settings in place and schedule a write.
+
+        Args:
+            mutate: Called with the live settings dict while the store is locked
+        """
+        with self._cond:
+            old = copy.deepcopy(self._load())
+            mutate(self._settings)
+            new = copy.deepcopy(self._settings)
+            self._schedule()
+        self._notify(old, new)
+
+    def subscribe(self, callback):
+        """Call callback(old, new) after every change, on the changing thread"""
+        self._subscribers.append(callback)
+
+    def flush(self):
+        """Write pending changes now (e.g. at exit)"""
+        # Copy and write under the write lock, so an older copy can never
+        # be written over a newer one
+        with self._write_lock:
+            with self._cond:
+                if not self._dirty:
+                    return
+                self._dirty = False
+                settings = copy.deepcopy(self._settings)
+            self._write(settings)
+
+    def _load(self):
+        if self._settings is None:
+            self._settings = copy.deepcopy(self.defaults)
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path, 'r') as f:
+                        self._settings = json.load(f)
+                    logger.info(f"Loaded settings: {len(self._settings.get('printers', {}))} printers configured")
+                except Exception as e:
+                    logger.error(f"Error loading settings: {e}")
+        return self._settings
+
+    def _schedule(self):
+        self._dirty = True
+        self._write_at = time.monotonic() + self.write_delay
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._run, name='settings-writer', daemon=True)
+            self._writer.start()
+        self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._dirty or time.monotonic() < self._write_at:
+                    self._cond.wait(max(0.0, self._write_at - time.monotonic()) if self._dirty else None)
+            self.flush()
+
+    def _write(self, settings):
+        try:
+            write_atomic(self.path, json.dumps(settings, indent=2))
+            logger.info(f"Settings saved successfully to {self.path}")
+        except Exception as e:
+            logger.error(f"Error saving settings: {e}")
+
+    def _notify(self, old, new):
+        for callback in list(self._subscribers):
+            try:
+                callback(old, new)
+            except Exception as e:
+                logger.error(f"Settings subscriber failed: {e}")
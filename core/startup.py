@@ -0,0 +1,115 @@
+"""
+Staged Startup for ChitUI
+
+Runs the slow parts of startup (storage checks, discovery, printer
+connections) on background threads while the HTTP server is already
+answering, and keeps track of each stage for /status.
+"""
+
+import threading
+import time
+from loguru import logger
+
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class StartupStage:
+    """Progress of one startup stage"""
+
+    __slots__ = ('name', 'state', 'started', 'finished', 'error', 'event')
+
+    def __init__(self, name):
+        self.name = name
+        self.state = PENDING
+        self.started = None
+        self.finished = None
+        self.error = None
+        self.event = threading.Event()
+
+
+class StartupTracker:
+    """Runs named startup stages and reports their readiness"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def run(self, name, func, after=()):
+        """
+        Run a stage on a background thread.
+
+        Args:
+            name: Stage name reported in status()
+            func: Called with no arguments
+            after: Names of stages that must finish first
+        """
+        stage = self._add(name)
+        waits = [self._stages[n] for n in after]
+
+        def target():
+            for other in waits:
+                other.event.wait()
+            self._execute(stage, func)
+
+        threading.Thread(target=target, name=f'startup-{name}', daemon=True).start()
+
+    def run_now(self, name, func):
+        """Run a stage on the calling thread (for steps that must finish before serving)"""
+        self._execute(self._add(name), func)
+
+    def wait(self, name, timeout=None):
+        """
+        Block until a stage has finished.
+
+        Returns:
+            True if it completed successfully, False if it failed, timed out or doesn't exist
+        """
+        stage = self._stages.get(name)
+        if stage is None:
+            return False
+        stage.event.wait(timeout)
+        return stage.state == DONE
+
+    def status(self):
+        """Return overall readiness and per-stage state/duration"""
+        with self._lock:
+            stages = list(self._stages.values())
+        now = time.monotonic()
+        report = {}
+        for stage in stages:
+            seconds = None
+            if stage.started is not None:
+                seconds = round((stage.finished or now) - stage.started, 3)
+            report[stage.name] = {'state': stage.state, 'seconds': seconds, 'error': stage.error}
+        ready = all(stage.state in (DONE, FAILED) for stage in stages)
+        finished = [stage.finished for stage in stages if stage.finished is not None]
+        return {
+            'ready': ready,
+            'seconds': round((max(finished) if ready and finished else now) - self.started, 3),
+            'stages': report,
+        }
+
+    def _add(self, name):
+        with self._lock:
+            stage = self._stages[name] = StartupStage(name)
+            return stage
+
+    def _execute(self, stage, func):
+        stage.state = RUNNING
+        stage.started = time.monotonic()
+        try:
+            func()
+            stage.state = DONE
+        except Exception as e:
+            stage.error = str(e)
+            stage.state = FAILED
+            logger.error(f"Startup stage '{stage.name}' failed: {e}")
+        finally:
+            stage.finished = time.monotonic()
+            stage.event.set()
+        logger.debug(f"Startup stage '{stage.name}' {stage.state} in {stage.finished - stage.started:.3f}s")
@@ -0,0 +1,217 @@
+"""
+Printer State Cache for ChitUI
+
+Keeps the last-known status, attributes and notice message per printer, so
+new clients can be served immediately without querying the mainboard.
+"""
+
+import threading
+import time
+
+
+# SDCP topic prefix -> cache kind
+TOPIC_KINDS = {
+    'sdcp/status/': 'status',
+    'sdcp/attributes/': 'attributes',
+    'sdcp/notice/': 'notice',
+}
+
+
+def topic_kind(topic):
+    """Return the cache kind for an SDCP topic, or None if it is not cached"""
+    for prefix, kind in TOPIC_KINDS.items():
+        if topic.startswith(prefix):
+            return kind
+    return None
+
+
+def topic_printer_id(topic):
+    """Return the MainboardID an SDCP topic (sdcp/<type>/<MainboardID>) refers to"""
+    return topic.rsplit('/', 1)[-1]
+
+
+def for_printer(message, printer_id):
+    """
+    Return a message addressed to ChitUI's id for the printer.
+
+    Printers added by IP are registered as md5(ip) rather than their
+    MainboardID. Their messages are copied (plugins share the original) with
+    MainboardID, at the top and in Data, set to that id.
+    """
+    if topic_printer_id(message.get('Topic', '')) == printer_id:
+        return message
+    message = dict(message, MainboardID=printer_id)
+    if isinstance(message.get('Data'), dict) and 'MainboardID' in message['Data']:
+        message['Data'] = dict(message['Data'], MainboardID=printer_id)
+    return message
+
+
+class PrinterStateCache:
+    """Last-known printer messages, keyed by printer and kind"""
+
+    def __init__(self, max_age=10):
+        """
+        Initialize the cache.
+
+        Args:
+            max_age: Seconds after which a cached entry is considered stale
+        """
+        self.max_age = max_age
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def update(self, printer_id, kind, message):
+        """Store the latest message of a kind for a printer"""
+        with self._lock:
+            self._entries.setdefault(printer_id, {})[kind] = (message, time.monotonic())
+
+    def seed(self, printer_id, kind, message):
+        """Store a message from a previous run; it is served but always stale"""
+        with self._lock:
+            kinds = self._entries.setdefault(printer_id, {})
+            if kind not in kinds:
+                kinds[kind] = (message, float('-inf'))
+
+    def seeded(self, printer_id):
+        """True if everything cached for a printer comes from seed() (nothing live yet)"""
+        with self._lock:
+            kinds = self._entries.get(printer_id)
+            return bool(kinds) and all(t == float('-inf') for _, t in kinds.values())
+
+    def get(self, printer_id, kind):
+        """Return the cached message, or None"""
+        with self._lock:
+            entry = self._entries.get(printer_id, {}).get(kind)
+        return entry[0] if entry else None
+
+    def get_fresh(self, printer_id, kind, max_age=None):
+        """Return the cached message if younger than max_age, otherwise None"""
+        if max_age is None:
+            max_age = self.max_age
+        with self._lock:
+            entry = self._entries.get(printer_id, {}).get(kind)
+        if entry and time.monotonic() - entry[1] <= max_age:
+            return entry[0]
+        return None
+
+    def snapshot(self, printer_ids=None):
+        """
+        Return the cached messages for several printers.
+
+        Args:
+            printer_ids: Iterable of printer IDs (None = all cached printers)
+
+        Returns:
+            Dict of printer_id -> {kind: message}
+        """
+        with self._lock:
+            if printer_ids is None:
+                printer_ids = list(self._entries)
+            return {
+                pid: {kind: entry[0] for kind, entry in self._entries[pid].items()}
+                for pid in printer_ids if pid in self._entries
+            }
+
+    def forget(self, printer_id):
+        """Drop everything cached for a printer"""
+        with self._lock:
+            self._entries.pop(printer_id, None)
+
+
+def status_summary(printer_id, message):
+    """
+    Reduce an sdcp/status/ message to the fields the printer list needs.
+
+    Returns:
+        Dict with MainboardID, CurrentStatus and print progress
+    """
+    status = message.get('Status', {})
+    print_info = status.get('PrintInfo') or {}
+    return {
+        'MainboardID': printer_id,
+        'CurrentStatus': status.get('CurrentStatus'),
+        'PrintStatus': print_info.get('Status'),
+        'CurrentLayer': print_info.get('CurrentLayer'),
+        'TotalLayer': print_info.get('TotalLayer'),
+    }
+
+
+def diff_status(old, new):
+    """
+    Compute a nested patch turning `old` into `new`.
+
+    Returns:
+        (changes, removed) where `changes` holds new or changed values (nested
+        dicts are diffed recursively) and `removed` lists key paths that vanished
+    """
+    changes = {}
+    removed = []
+    for key, value in new.items():
+        if key not in old:
+            changes[key] = value
+            continue
+        previous = old[key]
+        if isinstance(value, dict) and isinstance(previous, dict):
+            sub_changes, sub_removed = diff_status(previous, value)
+            if sub_changes:
+                changes[key] = sub_changes
+            removed.extend([key] + path for path in sub_removed)
+        elif value != previous:
+            changes[key] = value
+    removed.extend([key] for key in old if key not in new)
+    return changes, removed
+
+
+class StatusDelta:
+    """
+    Turns successive sdcp/status/ messages into sequence-numbered deltas.
+
+    The first message for a printer (or the first after reset()) is emitted in
+    full; later ones only carry the keys that changed since the last broadcast.
+    """
+
+    def __init__(self):
+        self._last = {}
+        self._lock = threading.Lock()
+
+    def push(self, printer_id, message):
+        """
+        Record a new status message.
+
+        Returns:
+            (payload, is_full): the full message (with 'Seq') or a delta dict,
+            or (None, False) if nothing changed
+        """
+        with self._lock:
+            last = self._last.get(printer_id)
+            if last is None:
+                full = dict(message, Seq=1)
+                self._last[printer_id] = full
+                return full, True
+
+            changes, removed = diff_status(last.get('Status', {}), message.get('Status', {}))
+            if not changes and not removed:
+                return None, False
+
+            seq = last['Seq'] + 1
+            self._last[printer_id] = dict(message, Seq=seq)
+
+        delta = {
+            'MainboardID': printer_id,
+            'Seq': seq,
+            'TimeStamp': message.get('TimeStamp'),
+            'Changes': changes,
+        }
+        if removed:
+            delta['Removed'] = removed
+        return delta, False
+
+    def full(self, printer_id):
+        """Return the last broadcast status message (with 'Seq') for a resync"""
+        with self._lock:
+            return self._last.get(printer_id)
+
+    def reset(self, printer_id):
+        """Forget a printer so its next status is broadcast in full"""
+        with self._lock:
+            self._last.pop(printer_id, None)
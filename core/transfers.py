@@ -0,0 +1,212 @@
+"""
+Transfer Scheduler for ChitUI
+
+Runs file transfers to printers: transfers to different printers proceed
+at the same time, each printer receives one file at a time, and a global
+cap limits concurrent transfers and total bandwidth. Requests beyond the
+limits wait in a FIFO queue instead of being rejected.
+"""
+
+import threading
+import time
+from collections import deque
+from loguru import logger
+
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class TransferExists(Exception):
+    """Raised when a transfer ID is already used by an unfinished transfer"""
+
+
+class Transfer:
+    """One file transfer and its progress"""
+
+    __slots__ = ('id', 'printer_id', 'filename', 'total', 'sent', 'state', 'error',
+                 'queued_at', 'started_at', 'finished_at', 'job', '_done')
+
+    def __init__(self, transfer_id, printer_id, job, filename=None, total=0):
+        self.id = transfer_id
+        self.printer_id = printer_id
+        self.filename = filename
+        self.total = total
+        self.sent = 0
+        self.state = QUEUED
+        self.error = None
+        self.queued_at = time.monotonic()
+        self.started_at = None
+        self.finished_at = None
+        self.job = job
+        self._done = threading.Event()
+
+    @property
+    def finished(self):
+        return self.state in (DONE, FAILED)
+
+    def progress(self):
+        """Percent of bytes sent (100 once done)"""
+        if self.state == DONE:
+            return 100
+        if not self.total:
+            return 0
+        return min(99, int(self.sent * 100 / self.total))
+
+    def rate(self):
+        """Average bytes/sec since the transfer started"""
+        if self.started_at is None:
+            return 0.0
+        elapsed = (self.finished_at or time.monotonic()) - self.started_at
+        return self.sent / elapsed if elapsed > 0 else 0.0
+
+    def wait(self, timeout=None):
+        """Block until the transfer has finished; returns True if it succeeded"""
+        self._done.wait(timeout)
+        return self.state == DONE
+
+
+class TransferScheduler:
+    """FIFO transfer queue with per-printer and global limits"""
+
+    def __init__(self, max_concurrent=2, max_bandwidth=0, keep_finished=60):
+        """
+        Initialize the scheduler.
+
+        Args:
+            max_concurrent: Transfers running at the same time (across printers)
+            max_bandwidth: Total bytes/sec across transfers (0 = unlimited)
+            keep_finished: Seconds finished transfers stay visible to progress queries
+        """
+        self.max_concurrent = max_concurrent
+        self.max_bandwidth = max_bandwidth
+        self.keep_finished = keep_finished
+        self._queue = deque()
+        self._running = {}
+        self._transfers = {}
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+        self._bandwidth_lock = threading.Lock()
+        self._stats = {'submitted': 0, 'completed': 0, 'failed': 0, 'bytes': 0}
+
+    def submit(self, transfer_id, printer_id, job, filename=None, total=0):
+        """
+        Queue a transfer.
+
+        Args:
+            transfer_id: Unique ID, used by progress queries (a finished
+                         transfer's ID may be reused)
+            printer_id: Printer the file goes to (one transfer per printer at a time)
+            job: Called as job(transfer) on a worker thread; returns True on success.
+                 It should call throttle(nbytes) before sending each chunk and
+                 add what was sent to transfer.sent
+            filename: Name shown in progress reports
+            total: Size in bytes
+
+        Returns:
+            Transfer
+
+        Raises:
+            TransferExists: A queued or running transfer has the same ID
+        """
+        transfer = Transfer(transfer_id, printer_id, job, filename, total)
+        with self._lock:
+            self._purge()
+            existing = self._transfers.get(transfer_id)
+            if existing is not None and not existing.finished:
+                raise TransferExists(f"Transfer {transfer_id} is already {existing.state}")
+            self._transfers[transfer_id] = transfer
+            self._queue.append(transfer)
+            self._stats['submitted'] += 1
+            self._dispatch()
+        return transfer
+
+    def throttle(self, nbytes):
+        """Wait until `nbytes` more may be sent without exceeding the bandwidth cap"""
+        if self.max_bandwidth <= 0:
+            return
+        with self._bandwidth_lock:
+            now = time.monotonic()
+            start = max(now, self._next_slot)
+            self._next_slot = start + nbytes / self.max_bandwidth
+        if start > now:
+            time.sleep(start - now)
+
+    def get(self, transfer_id):
+        """Return a transfer, or None"""
+        with self._lock:
+            return self._transfers.get(transfer_id)
+
+    def describe(self, transfer):
+        """Return a transfer's state, queue position and throughput as a dict"""
+        with self._lock:
+            position = None
+            if transfer.state == QUEUED:
+                position = next((i for i, t in enumerate(self._queue, 1) if t is transfer), None)
+        return {
+            'id': transfer.id,
+            'printer': transfer.printer_id,
+            'filename': transfer.filename,
+            'state': transfer.state,
+            'position': position,
+            'progress': transfer.progress(),
+            'sent': transfer.sent,
+            'total': transfer.total,
+            'rate': round(transfer.rate()),
+            'error': transfer.error,
+        }
+
+    def list(self):
+        """Describe every queued, running and recently finished transfer"""
+        with self._lock:
+            self._purge()
+            transfers = list(self._transfers.values())
+        return [self.describe(transfer) for transfer in transfers]
+
+    def get_stats(self):
+        """Return queue depth, active transfers and totals"""
+        with self._lock:
+            active = list(self._running.values())
+            stats = dict(self._stats, queued=len(self._queue), running=len(active),
+                         max_concurrent=self.max_concurrent, max_bandwidth=self.max_bandwidth)
+        stats['rate'] = round(sum(t.rate() for t in active))
+        return stats
+
+    def _dispatch(self):
+        # Start the oldest queued transfers whose printer is free, within the cap
+        for transfer in list(self._queue):
+            if len(self._running) >= self.max_concurrent:
+                break
+            if transfer.printer_id in self._running:
+                continue
+            self._queue.remove(transfer)
+            self._running[transfer.printer_id] = transfer
+            transfer.state = RUNNING
+            transfer.started_at = time.monotonic()
+            threading.Thread(target=self._run, args=(transfer,),
+                             name=f'transfer-{transfer.printer_id}', daemon=True).start()
+
+    def _run(self, transfer):
+        try:
+            ok = transfer.job(transfer)
+        except Exception as e:
+            logger.error(f"Transfer {transfer.id} failed: {e}")
+            transfer.error = str(e)
+            ok = False
+        with self._lock:
+            transfer.finished_at = time.monotonic()
+            transfer.state = DONE if ok else FAILED
+            transfer.job = None
+            del self._running[transfer.printer_id]
+            self._stats['completed' if ok else 'failed'] += 1
+            self._stats['bytes'] += transfer.sent
+            self._dispatch()
+        transfer._done.set()
+
+    def _purge(self):
+        cutoff = time.monotonic() - self.keep_finished
+        for transfer_id in [i for i, t in self._transfers.items()
+                            if t.finished and t.finished_at < cutoff]:
+            del self._transfers[transfer_id]
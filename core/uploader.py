@@ -0,0 +1,384 @@
+"""
+Chunk Uploader for ChitUI
+
+Sends files to a printer's HTTP upload endpoint (/uploadFile/upload), which
+takes the file in parts, each posted with the file's MD5, the part's offset
+and the total size.
+
+- One keep-alive session per printer, so parts reuse a TCP connection.
+- The source is read ahead on a background thread while the current part
+  is on the wire, so disk reads or a still-arriving request body overlap
+  with the printer acknowledging the previous part.
+- The part size follows the measured bandwidth and round-trip time: parts
+  take about `target_seconds` to send, or longer on high-latency links so
+  the per-request round trip stays a small share.
+- A part that fails is retried at the same offset with exponential backoff.
+- An upload can continue an earlier one (same `Uuid`) from the offset the
+  printer last acknowledged; see core.uploadsessions.
+- Sources that are files on disk (e.g. uploads spooled past their
+  in-memory size) are memory-mapped and each part's multipart body is sent
+  straight from a slice of the mapping, so parts are not copied; other
+  sources are read ahead on a background thread.
+
+Printers expect parts in offset order, so only one part is in flight.
+"""
+
+import binascii
+import hashlib
+import io
+import mmap
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from loguru import logger
+
+
+class UploadError(Exception):
+    """Raised when a file could not be sent to a printer"""
+
+
+class PartRefused(UploadError):
+    """Raised when the printer answered a part with an error (rather than not answering)"""
+
+
+class ChecksumMismatch(UploadError):
+    """Raised when the data sent doesn't match the MD5 the upload was started with"""
+
+
+class ResumeRejected(UploadError):
+    """Raised when the printer refuses to continue an earlier partial upload"""
+
+
+class ThroughputEstimator:
+    """Fits part duration = rtt + size / bandwidth over recent parts"""
+
+    def __init__(self, samples=8):
+        self._samples = deque(maxlen=samples)
+
+    def add(self, size, seconds):
+        self._samples.append((size, max(seconds, 1e-6)))
+
+    def estimate(self):
+        """
+        Return (bandwidth bytes/sec, rtt seconds), or (None, None) without samples.
+        """
+        if not self._samples:
+            return None, None
+        n = len(self._samples)
+        mean_size = sum(s for s, _ in self._samples) / n
+        mean_time = sum(t for _, t in self._samples) / n
+        var = sum((s - mean_size) ** 2 for s, _ in self._samples)
+        if var > 0:
+            slope = sum((s - mean_size) * (t - mean_time) for s, t in self._samples) / var
+            if slope > 0:
+                rtt = max(0.0, mean_time - slope * mean_size)
+                return 1.0 / slope, rtt
+        # All parts the same size (or too noisy to fit): assume no round trip
+        return mean_size / mean_time, 0.0
+
+
+class Prefetcher:
+    """Reads `total` bytes from a stream ahead of the sender, up to `window` bytes"""
+
+    def __init__(self, stream, total, window, read_size=262144):
+        self._stream = stream
+        self._remaining = total
+        self._window = window
+        self._read_size = read_size
+        self._buffer = bytearray()
+        self._error = None
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name='upload-prefetch', daemon=True)
+        self._thread.start()
+
+    def take(self, size):
+        """
+        Return the next `size` bytes (fewer only at the end of the file).
+
+        Raises:
+            UploadError: The stream failed or ended early
+        """
+        with self._cond:
+            while len(self._buffer) < size and self._remaining > 0 and self._error is None:
+                self._cond.wait()
+            if self._error is not None and len(self._buffer) < size:
+                raise UploadError(self._error)
+            part = bytes(self._buffer[:size])
+            del self._buffer[:size]
+            self._cond.notify_all()
+            return part
+
+    def close(self, timeout=5):
+        """Stop reading ahead and wait for the reader to let go of the stream"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def _run(self):
+        read = 0
+        total = self._remaining
+        while True:
+            with self._cond:
+                while len(self._buffer) >= self._window and not self._closed:
+                    self._cond.wait()
+                if self._closed or self._remaining <= 0:
+                    return
+                want = min(self._read_size, self._remaining)
+            try:
+                data = self._stream.read(want)
+            except Exception as e:
+                data = None
+                error = f"Reading upload failed: {e}"
+            else:
+                error = None if data else f"Upload ended after {read} of {total} bytes"
+            with self._cond:
+                if error is not None:
+                    self._error = error
+                    self._cond.notify_all()
+                    return
+                read += len(data)
+                self._buffer += data
+                self._remaining -= len(data)
+                self._cond.notify_all()
+
+
+class MultipartBody:
+    """
+    multipart/form-data request body (as requests builds it) whose file part
+    is sent from the given buffer, e.g. a memoryview, without copying it.
+    """
+
+    def __init__(self, fields, name, filename, data):
+        boundary = binascii.hexlify(os.urandom(16)).decode()
+        filename = filename.replace('"', '%22').replace('\r', '%0D').replace('\n', '%0A')
+        head = ''.join(f'--{boundary}\r\nContent-Disposition: form-data; name="{key}"\r\n\r\n{value}\r\n'
+                       for key, value in fields.items())
+        head += f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n\r\n'
+        self.content_type = f'multipart/form-data; boundary={boundary}'
+        self._chunks = (head.encode(), data, f'\r\n--{boundary}--\r\n'.encode())
+
+    def __iter__(self):
+        return iter(self._chunks)
+
+    def __len__(self):
+        return sum(len(chunk) for chunk in self._chunks)
+
+
+def map_file(stream, total):
+    """
+    Memory-map the file behind a stream (read-only).
+
+    Returns:
+        mmap of the whole file, or None if the stream isn't a file of `total`
+        bytes on disk
+    """
+    if getattr(stream, '_rolled', True) is False:
+        # A SpooledTemporaryFile still held in memory; fileno() would write
+        # it out to disk just to map it
+        return None
+    try:
+        fileno = stream.fileno()
+        if total <= 0 or os.fstat(fileno).st_size != total:
+            return None
+        return mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+    except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+        return None
+
+
+class ChunkUploader:
+    """Sends files to printers' upload endpoints in adaptively sized parts"""
+
+    def __init__(self, min_part=262144, max_part=1048576, target_seconds=1.0,
+                 retries=4, backoff=0.5, timeout=30):
+        """
+        Initialize the uploader.
+
+        Args:
+            min_part: Smallest part size in bytes (also the first, probing part)
+            max_part: Largest part size in bytes
+            target_seconds: Time each part should take to send
+            retries: Attempts per part after the first
+            backoff: Seconds before the first retry, doubled for each next one
+            timeout: Seconds to wait for the printer to answer a part
+        """
+        self.min_part = min_part
+        self.max_part = max(min_part, max_part)
+        self.target_seconds = target_seconds
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._stats = {'uploads': 0, 'parts': 0, 'retries': 0, 'failures': 0, 'bytes': 0}
+
+    def upload(self, url, filename, stream, total, md5, verify=False, throttle=None, progress=None,
+               file_uuid=None, offset=0, digest=None):
+        """
+        Send a file.
+
+        Args:
+            url: The printer's upload endpoint
+            filename: Name of the file on the printer
+            stream: File object to read the file from, sequentially, starting
+                    at `offset`; a file on disk holding the whole file
+                    (`total` bytes) is memory-mapped instead
+            total: File size in bytes
+            md5: Hex MD5 of the file
+            verify: Hash the data while sending and don't send the last part
+                    if it doesn't match md5 (for MD5s supplied by clients).
+                    When starting past offset 0, only if `digest` is given
+            throttle: Called with each part's size before it is sent
+            progress: Called with each part's size once the printer accepted it
+            file_uuid: Upload Uuid; pass an earlier upload's to continue it
+            offset: Bytes of that earlier upload the printer acknowledged
+            digest: hashlib MD5 object already fed the file's first `offset`
+                    bytes, which verify continues from
+
+        Raises:
+            ChecksumMismatch: verify is set and the data didn't match md5
+            ResumeRejected: The printer refused to continue at `offset`
+            UploadError: The file could not be read or the printer refused a part
+        """
+        md5 = md5.lower()
+        fields = {
+            'S-File-MD5': md5,
+            'Check': 1,
+            'Offset': 0,
+            'Uuid': file_uuid or str(uuid.uuid4()),
+            'TotalSize': total,
+        }
+        resume_offset = offset
+        session = self._session(url)
+        estimator = ThroughputEstimator()
+        if not verify:
+            digest = None
+        elif digest is None and not offset:
+            digest = hashlib.md5()
+        mapped = map_file(stream, total)
+        if mapped is not None:
+            view = memoryview(mapped)
+            released = 0
+            prefetch = None
+            if hasattr(mapped, 'madvise'):
+                mapped.madvise(mmap.MADV_SEQUENTIAL)
+        else:
+            prefetch = Prefetcher(stream, total - offset, window=2 * self.max_part)
+        self._count('uploads')
+        try:
+            size = self.min_part
+            while True:
+                size = min(size, total - offset)
+                part = view[offset:offset + size] if mapped is not None else prefetch.take(size)
+                last = offset + len(part) >= total
+                if digest is not None:
+                    digest.update(part)
+                    if last and digest.hexdigest() != md5:
+                        raise ChecksumMismatch("File does not match its MD5 checksum")
+                if throttle is not None:
+                    throttle(len(part))
+                try:
+                    seconds = self._send_part(session, url, fields, filename, part, offset)
+                except PartRefused as e:
+                    if offset == resume_offset and resume_offset > 0:
+                        raise ResumeRejected(f"Printer refused to continue the upload at offset {offset}: {e}")
+                    raise
+                estimator.add(len(part), seconds)
+                if progress is not None:
+                    progress(len(part))
+                offset += len(part)
+                if mapped is not None and hasattr(mapped, 'madvise'):
+                    # Unmap pages the printer has acknowledged, so the upload
+                    # doesn't keep the whole file resident (they stay cached)
+                    boundary = offset // mmap.PAGESIZE * mmap.PAGESIZE
+                    if boundary > released:
+                        mapped.madvise(mmap.MADV_DONTNEED, released, boundary - released)
+                        released = boundary
+                if last:
+                    return
+                size = self._next_size(estimator)
+        except UploadError:
+            self._count('failures')
+            raise
+        finally:
+            if prefetch is not None:
+                prefetch.close()
+            if mapped is not None:
+                part = None
+                view.release()
+                try:
+                    mapped.close()
+                except BufferError:
+                    # A part is still referenced (e.g. by a traceback); the
+                    # mapping closes when it is collected
+                    pass
+
+    def get_stats(self):
+        """Return totals of uploads, parts, retries and failures"""
+        with self._lock:
+            return dict(self._stats, sessions=len(self._sessions))
+
+    def close(self):
+        """Close every printer session"""
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
+
+    def _session(self, url):
+        # One session per printer address; the transfer scheduler runs one
+        # upload per printer at a time, so a session is never shared
+        host = url.split('/')[2]
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                import requests
+                session = self._sessions[host] = requests.Session()
+            return session
+
+    def _send_part(self, session, url, fields, filename, part, offset):
+        """Post one part, retrying with backoff; returns the seconds the successful attempt took"""
+        fields['Offset'] = offset
+        error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self._count('retries')
+                delay = self.backoff * 2 ** (attempt - 1)
+                logger.warning(f"Retrying part at offset {offset} in {delay:.1f}s ({error})")
+                time.sleep(delay)
+            start = time.perf_counter()
+            answered = False
+            try:
+                body = MultipartBody(fields, 'File', filename, part)
+                response = session.post(url, data=body, headers={'Content-Type': body.content_type},
+                                        timeout=self.timeout)
+                status = response.json()
+                answered = True
+            except Exception as e:
+                error = str(e)
+                continue
+            # Anything but {"success": true, ...} (including a JSON list,
+            # string or null) is a refusal
+            if isinstance(status, dict) and status.get('success'):
+                seconds = time.perf_counter() - start
+                with self._lock:
+                    self._stats['parts'] += 1
+                    self._stats['bytes'] += len(part)
+                return seconds
+            error = f"printer answered {status}"
+        message = f"Printer did not accept the part at offset {offset}: {error}"
+        raise PartRefused(message) if answered else UploadError(message)
+
+    def _next_size(self, estimator):
+        bandwidth, rtt = estimator.estimate()
+        seconds = max(self.target_seconds, 10 * rtt)
+        size = int(bandwidth * seconds) // 65536 * 65536
+        return min(self.max_part, max(self.min_part, size))
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
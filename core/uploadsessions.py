@@ -0,0 +1,167 @@
+"""
+Upload Sessions for ChitUI
+
+A printer receives an upload in parts, all carrying the same `Uuid`, and
+keeps what it has acknowledged. An upload session remembers that Uuid and
+the acknowledged offset for one file (printer, MD5, size), so a retry of
+the same file - after a failed part, a browser retry or a ChitUI restart -
+continues at the last good offset instead of sending everything again.
+
+Sessions are persisted to a small JSON file, written behind at most every
+`write_interval` seconds and whenever an upload stops.
+"""
+
+import os
+import threading
+import time
+import uuid
+from loguru import logger
+
+from . import codec
+from .settings import write_atomic
+
+
+class UploadSession:
+    """Progress of one file's upload to one printer"""
+
+    __slots__ = ('printer_id', 'md5', 'total', 'filename', 'uuid', 'offset', 'updated_at')
+
+    def __init__(self, printer_id, md5, total, filename, file_uuid=None, offset=0, updated_at=None):
+        self.printer_id = printer_id
+        self.md5 = md5
+        self.total = total
+        self.filename = filename
+        self.uuid = file_uuid or str(uuid.uuid4())
+        self.offset = offset
+        self.updated_at = updated_at or time.time()
+
+    @property
+    def key(self):
+        return session_key(self.printer_id, self.md5, self.total)
+
+    def to_dict(self):
+        return {'printer_id': self.printer_id, 'md5': self.md5, 'total': self.total,
+                'filename': self.filename, 'uuid': self.uuid, 'offset': self.offset,
+                'updated_at': self.updated_at}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['printer_id'], data['md5'], data['total'], data.get('filename'),
+                   data['uuid'], data.get('offset', 0), data.get('updated_at'))
+
+
+def session_key(printer_id, md5, total):
+    return f"{printer_id}:{md5.lower()}:{total}"
+
+
+class UploadSessionStore:
+    """Persistent upload sessions, keyed by printer, file MD5 and size"""
+
+    def __init__(self, path, max_age=86400, max_sessions=32, write_interval=2):
+        """
+        Initialize the store.
+
+        Args:
+            path: Sessions file
+            max_age: Seconds after the last acknowledged part that a session is dropped
+            max_sessions: Sessions kept (the least recently updated go first)
+            write_interval: Minimum seconds between writes of the file
+        """
+        self.path = path
+        self.max_age = max_age
+        self.max_sessions = max_sessions
+        self.write_interval = write_interval
+        self._sessions = {}
+        self._dirty = False
+        self._writer = None
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def load(self):
+        """Read the sessions file"""
+        sessions = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'rb') as f:
+                    for data in codec.loads(f.read()).get('sessions', []):
+                        session = UploadSession.from_dict(data)
+                        sessions[session.key] = session
+                logger.info(f"Loaded {len(sessions)} resumable upload sessions")
+            except Exception as e:
+                logger.error(f"Error loading upload sessions: {e}")
+        with self._lock:
+            self._sessions = sessions
+            self._purge()
+
+    def find(self, printer_id, md5, total):
+        """Return the session for a file, or None"""
+        with self._lock:
+            self._purge()
+            return self._sessions.get(session_key(printer_id, md5, total))
+
+    def open(self, printer_id, md5, total, filename):
+        """Return the session for a file, starting a new one at offset 0 if there is none"""
+        with self._lock:
+            self._purge()
+            key = session_key(printer_id, md5, total)
+            session = self._sessions.get(key)
+            if session is None:
+                session = self._sessions[key] = UploadSession(printer_id, md5.lower(), total, filename)
+                self._schedule()
+            return session
+
+    def acked(self, session, offset):
+        """Record that the printer has everything before `offset`"""
+        with self._lock:
+            session.offset = offset
+            session.updated_at = time.time()
+            if self._sessions.get(session.key) is session:
+                self._schedule()
+
+    def forget(self, session):
+        """Drop a session (the upload finished, or the printer no longer has it)"""
+        with self._lock:
+            if self._sessions.get(session.key) is session:
+                del self._sessions[session.key]
+                self._schedule()
+
+    def list(self):
+        """Return every session as a dict"""
+        with self._lock:
+            self._purge()
+            return [session.to_dict() for session in self._sessions.values()]
+
+    def flush(self):
+        """Write pending changes now (e.g. when an upload stops, or at exit)"""
+        # Writes land in the order their snapshots were taken
+        with self._write_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                self._dirty = False
+                text = codec.dumps({'sessions': [s.to_dict() for s in self._sessions.values()]})
+            try:
+                write_atomic(self.path, text)
+            except Exception as e:
+                logger.error(f"Error saving upload sessions: {e}")
+
+    def _purge(self):
+        cutoff = time.time() - self.max_age
+        stale = [key for key, s in self._sessions.items() if s.updated_at < cutoff]
+        by_age = sorted(self._sessions.items(), key=lambda item: item[1].updated_at)
+        stale += [key for key, _ in by_age[:max(0, len(by_age) - self.max_sessions)]]
+        for key in set(stale):
+            del self._sessions[key]
+        if stale:
+            self._schedule()
+
+    def _schedule(self):
+        self._dirty = True
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._run, name='upload-sessions-writer', daemon=True)
+            self._writer.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.write_interval)
+            self.flush()
@@ -0,0 +1,128 @@
+"""
+Warm Printer Cache for ChitUI
+
+Persists the last-known state of every printer (record, status, attributes
+and file lists) to a compact JSON file, so after a restart dashboards can
+render immediately from the previous run while the printers are queried
+again in the background.
+
+Updates only touch memory; a background thread writes the file at most
+every `write_interval` seconds, atomically.
+"""
+
+import os
+import threading
+import time
+from loguru import logger
+
+from . import codec
+from .settings import write_atomic
+
+
+class WarmCache:
+    """Last-known per-printer state, persisted across restarts"""
+
+    def __init__(self, path, write_interval=60, max_file_lists=4):
+        """
+        Initialize the cache.
+
+        Args:
+            path: Cache file
+            write_interval: Minimum seconds between writes of the file
+            max_file_lists: File lists (storage locations) kept per printer
+        """
+        self.path = path
+        self.write_interval = write_interval
+        self.max_file_lists = max_file_lists
+        self._printers = {}
+        self._dirty = False
+        self._writer = None
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def load(self):
+        """
+        Read the cache file.
+
+        Returns:
+            Dict of printer_id -> {'saved_at', and any of 'printer', 'status',
+            'attributes', 'files'}
+        """
+        printers = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'rb') as f:
+                    printers = codec.loads(f.read()).get('printers', {})
+                logger.info(f"Loaded cached state for {len(printers)} printers")
+            except Exception as e:
+                logger.error(f"Error loading printer cache: {e}")
+        with self._lock:
+            self._printers = printers
+            return {printer_id: dict(entry) for printer_id, entry in printers.items()}
+
+    def get(self, printer_id, key):
+        """Return a cached value, or None"""
+        with self._lock:
+            return self._printers.get(printer_id, {}).get(key)
+
+    def files(self, printer_id, url):
+        """Return the cached file list response for a storage location, or None"""
+        with self._lock:
+            return self._printers.get(printer_id, {}).get('files', {}).get(url)
+
+    def update(self, printer_id, key, value):
+        """Remember a value ('printer', 'status', 'attributes') for a printer"""
+        with self._lock:
+            entry = self._printers.setdefault(printer_id, {})
+            entry[key] = value
+            entry['saved_at'] = time.time()
+            self._schedule()
+
+    def set_files(self, printer_id, url, message):
+        """Remember the file list response for a storage location"""
+        with self._lock:
+            entry = self._printers.setdefault(printer_id, {})
+            files = entry.setdefault('files', {})
+            files.pop(url, None)
+            files[url] = message
+            # Keep the most recently listed locations
+            for stale_url in list(files)[:-self.max_file_lists]:
+                del files[stale_url]
+            entry['saved_at'] = time.time()
+            self._schedule()
+
+    def forget(self, printer_id):
+        """Drop everything cached for a printer"""
+        with self._lock:
+            if self._printers.pop(printer_id, None) is not None:
+                self._schedule()
+
+    def flush(self):
+        """Write pending changes now (e.g. at exit)"""
+        # Held from serializing to writing: a snapshot taken later is also
+        # written later
+        with self._write_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                self._dirty = False
+                text = codec.dumps({'printers': self._printers})
+            self._write(text)
+
+    def _schedule(self):
+        self._dirty = True
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._run, name='printer-cache-writer', daemon=True)
+            self._writer.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.write_interval)
+            self.flush()
+
+    def _write(self, text):
+        try:
+            write_atomic(self.path, text)
+            logger.debug(f"Printer cache saved to {self.path} ({len(text)} bytes)")
+        except Exception as e:
+            logger.error(f"Error saving printer cache: {e}")
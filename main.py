@@ -1,29 +1,38 @@
-from flask import Flask, Response, request, stream_with_context, jsonify, send_file, render_template_string
+from flask import Flask, Request, Response, request, stream_with_context, jsonify, send_file, render_template_string
 from werkzeug.utils import secure_filename
-from flask_socketio import SocketIO
+from flask_socketio import SocketIO, join_room, leave_room
 from threading import Thread
 from loguru import logger
-import socket
 import json
 import os
-import websocket
 import time
 import sys
-import requests
 import hashlib
 import uuid
 import threading
 import subprocess
+import atexit
+import importlib.util
+import signal
+import shutil
+import tempfile
 
 # Plugin system imports
 from plugins import PluginManager
 
-# Camera imports
-try:
-    import cv2
-    CAMERA_SUPPORT = True
-except ImportError:
-    CAMERA_SUPPORT = False
+# Core services
+from core import (ConnectionEngine, CommandAPI, CommandError, PendingRequests, PrinterStateCache,
+                  QueueFull, DiscoveryService, SettingsStore, codec,
+                  StatusDelta, CoalescingEmitter, PrinterRegistry, PrinterRecord, StartupTracker,
+                  WarmCache, TransferScheduler, TransferExists, ChunkUploader, UploadError,
+                  ResumeRejected, ChecksumMismatch, UploadSessionStore)
+from core.state import for_printer, topic_kind, status_summary
+
+# Camera support is detected without importing OpenCV, which takes seconds
+# to load on a Pi; load_cv2() imports it when the camera is first started
+CAMERA_SUPPORT = importlib.util.find_spec('cv2') is not None
+cv2 = None
+if not CAMERA_SUPPORT:
     logger.warning("Camera support not available - install opencv-python")
 
 debug = False
@@ -40,12 +49,82 @@ if os.environ.get("PORT") is not None:
     port = int(os.environ.get("PORT"))
 
 discovery_timeout = 1
+
+# Seconds between background discovery broadcasts, and how long replies are cached
+discovery_interval = 30
+if os.environ.get("DISCOVERY_INTERVAL") is not None:
+    discovery_interval = float(os.environ.get("DISCOVERY_INTERVAL"))
+discovery_ttl = 90
+if os.environ.get("DISCOVERY_TTL") is not None:
+    discovery_ttl = float(os.environ.get("DISCOVERY_TTL"))
+
+# Seconds a cached printer status/attributes message is served before re-querying
+status_cache_max_age = 10
+if os.environ.get("STATUS_CACHE_MAX_AGE") is not None:
+    status_cache_max_age = float(os.environ.get("STATUS_CACHE_MAX_AGE"))
+
+# Maximum status/attributes emits per second per printer (0 = unlimited)
+status_emit_rate = 4.0
+if os.environ.get("STATUS_EMIT_RATE") is not None:
+    status_emit_rate = float(os.environ.get("STATUS_EMIT_RATE"))
+
+# Seconds between websocket heartbeats to each printer (0 = disabled), and
+# the longest wait between reconnect attempts to an offline printer
+heartbeat_interval = 10
+if os.environ.get("HEARTBEAT_INTERVAL") is not None:
+    heartbeat_interval = float(os.environ.get("HEARTBEAT_INTERVAL"))
+max_reconnect_delay = 60
+if os.environ.get("MAX_RECONNECT_DELAY") is not None:
+    max_reconnect_delay = float(os.environ.get("MAX_RECONNECT_DELAY"))
+
+# Uploads sent to printers at the same time, and their combined bytes/sec
+# (0 = unlimited); further uploads wait in a queue
+upload_concurrency = 2
+if os.environ.get("UPLOAD_CONCURRENCY") is not None:
+    upload_concurrency = int(os.environ.get("UPLOAD_CONCURRENCY"))
+upload_bandwidth = 0
+if os.environ.get("UPLOAD_BANDWIDTH") is not None:
+    upload_bandwidth = float(os.environ.get("UPLOAD_BANDWIDTH"))
+
+# Largest part sent to a printer in one request (parts shrink on slow links),
+# and retries of a part the printer didn't accept
+upload_max_part = 1048576
+if os.environ.get("UPLOAD_MAX_PART") is not None:
+    upload_max_part = int(os.environ.get("UPLOAD_MAX_PART"))
+upload_retries = 4
+if os.environ.get("UPLOAD_RETRIES") is not None:
+    upload_retries = int(os.environ.get("UPLOAD_RETRIES"))
+
+# Seconds between writes of the last-known printer state kept for restarts
+warm_cache_interval = 60
+if os.environ.get("WARM_CACHE_INTERVAL") is not None:
+    warm_cache_interval = float(os.environ.get("WARM_CACHE_INTERVAL"))
+
+# Seconds a request handler waits for a new printer socket to open or the
+# camera's first frame before answering without it
+readiness_timeout = 3
+if os.environ.get("READINESS_TIMEOUT") is not None:
+    readiness_timeout = float(os.environ.get("READINESS_TIMEOUT"))
+
+# Commands queued per printer, and unanswered requests before queries wait
+outbound_queue_size = 64
+if os.environ.get("OUTBOUND_QUEUE_SIZE") is not None:
+    outbound_queue_size = int(os.environ.get("OUTBOUND_QUEUE_SIZE"))
+outbound_max_unacked = 4
+if os.environ.get("OUTBOUND_MAX_UNACKED") is not None:
+    outbound_max_unacked = int(os.environ.get("OUTBOUND_MAX_UNACKED"))
+
 app = Flask(__name__,
             static_url_path='',
             static_folder='web')
-socketio = SocketIO(app, async_mode='threading', cors_allowed_origins="*")
-websockets = {}
-printers = {}
+socketio = SocketIO(app, async_mode='threading', cors_allowed_origins="*", json=codec)
+# Known printers and their connections; readers use immutable snapshots
+printer_registry = PrinterRegistry()
+printer_state = PrinterStateCache(max_age=status_cache_max_age)
+status_delta = StatusDelta()
+fleet_summaries = {}  # Last printer_summary sent per printer
+viewing_printer = {}  # Socket.IO sid -> printer the client is subscribed to
+startup = StartupTracker()
 
 # ===== Plugin System =====
 plugin_manager = PluginManager(os.path.join(os.path.dirname(__file__), 'plugins'))
@@ -54,56 +133,95 @@ plugin_manager = PluginManager(os.path.join(os.path.dirname(__file__), 'plugins'
 # USB Gadget folder - where files are saved so printer can access them as USB storage
 USB_GADGET_FOLDER = os.environ.get('USB_GADGET_PATH', '/mnt/usb_share')
 
-# Check if USB gadget is available and writable
+# Whether files go to the USB gadget is decided by detect_storage() during
+# startup; until then uploads wait for it
 USE_USB_GADGET = False
 USB_GADGET_ERROR = None
 
-if os.path.exists(USB_GADGET_FOLDER):
-    # Test if writable
-    test_file = os.path.join(USB_GADGET_FOLDER, '.write_test')
-    try:
-        with open(test_file, 'w') as f:
-            f.write('test')
-        os.remove(test_file)
-        logger.info(f"✓ USB gadget found and writable at {USB_GADGET_FOLDER}")
-        UPLOAD_FOLDER = USB_GADGET_FOLDER
-        USE_USB_GADGET = True
-    except PermissionError as e:
-        USB_GADGET_ERROR = f"Permission denied - USB gadget folder is not writable. Check permissions: sudo chmod 777 {USB_GADGET_FOLDER}"
-        logger.error(f"✗ {USB_GADGET_ERROR}")
-        logger.warning("⚠ Files will be uploaded directly to printer via network instead")
-        USE_USB_GADGET = False
-    except OSError as e:
-        USB_GADGET_ERROR = f"USB gadget folder exists but cannot be used: {e}"
-        logger.error(f"✗ {USB_GADGET_ERROR}")
-        logger.warning("⚠ Files will be uploaded directly to printer via network instead")
+
+def detect_storage():
+    """Check that the USB gadget folder is writable and pick the upload folder"""
+    global USE_USB_GADGET, USB_GADGET_ERROR, UPLOAD_FOLDER
+    if os.path.exists(USB_GADGET_FOLDER):
+        # Test if writable
+        test_file = os.path.join(USB_GADGET_FOLDER, '.write_test')
+        try:
+            with open(test_file, 'w') as f:
+                f.write('test')
+            os.remove(test_file)
+            logger.info(f"✓ USB gadget found and writable at {USB_GADGET_FOLDER}")
+            UPLOAD_FOLDER = USB_GADGET_FOLDER
+            USE_USB_GADGET = True
+        except PermissionError as e:
+            USB_GADGET_ERROR = f"Permission denied - USB gadget folder is not writable. Check permissions: sudo chmod 777 {USB_GADGET_FOLDER}"
+            logger.error(f"✗ {USB_GADGET_ERROR}")
+            logger.warning("⚠ Files will be uploaded directly to printer via network instead")
+            USE_USB_GADGET = False
+        except OSError as e:
+            USB_GADGET_ERROR = f"USB gadget folder exists but cannot be used: {e}"
+            logger.error(f"✗ {USB_GADGET_ERROR}")
+            logger.warning("⚠ Files will be uploaded directly to printer via network instead")
+            USE_USB_GADGET = False
+    else:
+        USB_GADGET_ERROR = f"USB gadget not found at {USB_GADGET_FOLDER}. To enable USB gadget mode, create this folder and mount your USB gadget device there."
+        logger.warning(f"⚠ {USB_GADGET_ERROR}")
+        logger.info("ℹ Files will be uploaded directly to printer via network")
         USE_USB_GADGET = False
-else:
-    USB_GADGET_ERROR = f"USB gadget not found at {USB_GADGET_FOLDER}. To enable USB gadget mode, create this folder and mount your USB gadget device there."
-    logger.warning(f"⚠ {USB_GADGET_ERROR}")
-    logger.info("ℹ Files will be uploaded directly to printer via network")
-    USE_USB_GADGET = False
+
+    if not USE_USB_GADGET:
+        UPLOAD_FOLDER = NETWORK_UPLOAD_FOLDER
+    app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+    logger.info(f"Upload folder: {UPLOAD_FOLDER}")
 
 # Data folder for settings
 DATA_FOLDER = os.path.expanduser('~/.chitui')
-if not USE_USB_GADGET:
-    UPLOAD_FOLDER = os.path.join(DATA_FOLDER, 'uploads')
-    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+# Staging folder for network uploads (and the upload folder until detect_storage() runs)
+NETWORK_UPLOAD_FOLDER = os.path.join(DATA_FOLDER, 'uploads')
+UPLOAD_FOLDER = NETWORK_UPLOAD_FOLDER
+os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+# Uploads that have to be spooled go to memory-backed tmpfs when it has room
+# (plus headroom for the system), so they don't wear the SD card
+UPLOAD_SPOOL_FOLDER = os.environ.get('UPLOAD_SPOOL_PATH', '/dev/shm')
+UPLOAD_SPOOL_HEADROOM = 64 * 1048576
+# Block size for copying upload bodies to the USB gadget or a spool file
+UPLOAD_BLOCK_SIZE = 1048576
 
 ALLOWED_EXTENSIONS = {'ctb', 'goo', 'prz'}
 SETTINGS_FILE = os.path.join(DATA_FOLDER, 'chitui_settings.json')
+PRINTER_CACHE_FILE = os.path.join(DATA_FOLDER, 'printer_cache.json')
+UPLOAD_SESSIONS_FILE = os.path.join(DATA_FOLDER, 'upload_sessions.json')
 
 # Create directories if they don't exist
 os.makedirs(DATA_FOLDER, exist_ok=True)
 
 logger.info(f"Data folder: {DATA_FOLDER}")
-logger.info(f"Upload folder: {UPLOAD_FOLDER}")
 logger.info(f"Settings file: {SETTINGS_FILE}")
 # ===== END CONFIG =====
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
 
+def spool_folder(size):
+    """Folder to spool an upload of `size` bytes in: tmpfs if it has room, else NETWORK_UPLOAD_FOLDER"""
+    try:
+        if size is not None and shutil.disk_usage(UPLOAD_SPOOL_FOLDER).free > size + UPLOAD_SPOOL_HEADROOM:
+            return UPLOAD_SPOOL_FOLDER
+    except OSError:
+        pass
+    return NETWORK_UPLOAD_FOLDER
+
+
+class UploadRequest(Request):
+    """Request that spools multipart file uploads in spool_folder() instead of /tmp"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return tempfile.SpooledTemporaryFile(max_size=500 * 1024, mode='rb+',
+                                             dir=spool_folder(total_content_length))
+
+
+app.request_class = UploadRequest
+
+
 # ===== USB GADGET HELPER FUNCTIONS =====
 
 def trigger_usb_gadget_refresh():
@@ -250,12 +368,24 @@ def trigger_usb_gadget_refresh():
 camera_stream_active = False
 camera_latest_frame = None
 camera_frame_lock = threading.Lock()
+# Notified whenever a new frame is encoded or the stream stops
+camera_frame_ready = threading.Condition(camera_frame_lock)
 camera_instance = None
+camera_thread = None
 camera_printer_ip = None
 
 
 # ============ CAMERA CLASSES ============
 
+def load_cv2():
+    """Import OpenCV on first use"""
+    global cv2
+    if cv2 is None:
+        import cv2 as module
+        cv2 = module
+    return cv2
+
+
 class RTSPCamera:
     def __init__(self, printer_ip):
         self.rtsp_url = f"rtsp://{printer_ip}:554/video"
@@ -265,6 +395,7 @@ class RTSPCamera:
     def start(self):
         self.running = True
         os.environ['OPENCV_FFMPEG_CAPTURE_OPTIONS'] = 'rtsp_transport;udp'
+        load_cv2()
         
         logger.info(f"Connecting to camera: {self.rtsp_url}")
         
@@ -329,8 +460,9 @@ def camera_capture_frames():
                 ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 75])
                 
                 if ret:
-                    with camera_frame_lock:
+                    with camera_frame_ready:
                         camera_latest_frame = buffer.tobytes()
+                        camera_frame_ready.notify_all()
                     frame_count += 1
                     
         except Exception as e:
@@ -346,22 +478,24 @@ def camera_generate():
     last_frame = None
     
     while camera_stream_active:
-        with camera_frame_lock:
+        with camera_frame_ready:
+            camera_frame_ready.wait_for(
+                lambda: not camera_stream_active or (camera_latest_frame is not None
+                                                     and camera_latest_frame is not last_frame),
+                timeout=1)
             frame = camera_latest_frame
         
-        if frame and frame != last_frame:
+        if frame and frame is not last_frame:
             last_frame = frame
             yield (b'--frame\r\n'
                    b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
-        else:
-            time.sleep(0.01)
 
 
 # ============ CAMERA ROUTES ============
 
 @app.route('/camera/start', methods=['POST'])
 def camera_start():
-    global camera_stream_active, camera_instance, camera_latest_frame, camera_printer_ip
+    global camera_stream_active, camera_instance, camera_latest_frame, camera_printer_ip, camera_thread
     
     if not CAMERA_SUPPORT:
         return jsonify({'ok': False, 'msg': 'Camera support not installed. Run: pip install opencv-python'})
@@ -371,12 +505,13 @@ def camera_start():
     
     try:
         # Get printer IP from first available printer or use saved printer
-        if not printers:
+        snapshot = printer_registry.snapshot()
+        if not snapshot:
             return jsonify({'ok': False, 'msg': 'No printers connected'})
         
         # Use the first printer's IP
-        first_printer = next(iter(printers.values()))
-        camera_printer_ip = first_printer['ip']
+        first_printer = next(iter(snapshot.records.values()))
+        camera_printer_ip = first_printer.ip
         
         logger.info(f"Starting camera for printer: {camera_printer_ip}")
         
@@ -385,9 +520,17 @@ def camera_start():
         
         if camera_instance.start():
             camera_stream_active = True
-            Thread(target=camera_capture_frames, daemon=True).start()
-            time.sleep(1)  # Give it a moment to capture first frame
-            return jsonify({'ok': True})
+            camera_thread = Thread(target=camera_capture_frames, daemon=True)
+            camera_thread.start()
+            # Answer as soon as the first frame is encoded
+            with camera_frame_ready:
+                ready = camera_frame_ready.wait_for(lambda: camera_latest_frame is not None,
+                                                    timeout=readiness_timeout)
+            if not ready:
+                logger.warning(f"No camera frame after {readiness_timeout}s; stream stays open")
+                return jsonify({'ok': True, 'ready': False,
+                                'msg': 'Timed out waiting for the first camera frame'})
+            return jsonify({'ok': True, 'ready': True})
         else:
             camera_stream_active = False
             camera_instance = None
@@ -402,14 +545,20 @@ def camera_start():
 
 @app.route('/camera/stop', methods=['POST'])
 def camera_stop():
-    global camera_stream_active, camera_instance, camera_latest_frame
+    global camera_stream_active, camera_instance, camera_latest_frame, camera_thread
     
     try:
-        # Stop the stream first
-        camera_stream_active = False
+        # Stop the stream first, waking any video responses so they end
+        with camera_frame_ready:
+            camera_stream_active = False
+            camera_frame_ready.notify_all()
         
-        # Give the camera thread a moment to stop
-        time.sleep(0.2)
+        # Wait for the capture thread to leave its read before releasing the capture
+        if camera_thread is not None:
+            camera_thread.join(timeout=readiness_timeout)
+            if camera_thread.is_alive():
+                logger.warning("Camera capture thread did not stop in time")
+            camera_thread = None
         
         camera_latest_frame = None
         
@@ -460,29 +609,25 @@ def proxy_thumbnail(printer_id):
 
 # ============ SETTINGS FUNCTIONS ============
 
+# Loaded once; changes are written behind, atomically
+settings_store = SettingsStore(SETTINGS_FILE, defaults={"printers": {}, "auto_discover": False})
+atexit.register(settings_store.flush)
+
+# Last-known printer state from the previous run, served (as stale) until
+# the printers answer again
+warm_cache = WarmCache(PRINTER_CACHE_FILE, write_interval=warm_cache_interval)
+atexit.register(warm_cache.flush)
+
+
 def load_settings():
-    """Load settings from persistent storage"""
-    if os.path.exists(SETTINGS_FILE):
-        try:
-            with open(SETTINGS_FILE, 'r') as f:
-                settings = json.load(f)
-                logger.info(f"Loaded settings: {len(settings.get('printers', {}))} printers configured")
-                return settings
-        except Exception as e:
-            logger.error(f"Error loading settings: {e}")
-    return {"printers": {}, "auto_discover": False}
+    """Return a copy of the current settings"""
+    return settings_store.get()
 
 
 def save_settings(settings):
-    """Save settings to persistent storage"""
-    try:
-        with open(SETTINGS_FILE, 'w') as f:
-            json.dump(settings, f, indent=2)
-        logger.info(f"Settings saved successfully to {SETTINGS_FILE}")
-        return True
-    except Exception as e:
-        logger.error(f"Error saving settings: {e}")
-        return False
+    """Replace the settings; they are persisted in the background"""
+    settings_store.set(settings)
+    return True
 
 
 # ============ WEB ROUTES ============
@@ -512,7 +657,9 @@ def get_settings():
 def update_settings():
     """Update settings"""
     try:
-        settings = request.json
+        settings = request.get_json(silent=True)
+        if not isinstance(settings, dict):
+            return jsonify({"success": False, "message": "Settings must be a JSON object"}), 400
         if save_settings(settings):
             return jsonify({"success": True, "message": "Settings saved successfully"})
         else:
@@ -533,7 +680,13 @@ def get_status():
         },
         "upload_folder": UPLOAD_FOLDER,
         "data_folder": DATA_FOLDER,
-        "camera_support": CAMERA_SUPPORT
+        "camera_support": CAMERA_SUPPORT,
+        "startup": startup.status(),
+        "transfers": transfer_scheduler.get_stats(),
+        "commands": command_api.get_stats(),
+        "connections": connection_engine.get_states(),
+        "outbound": connection_engine.get_stats(),
+        "status_emitter": state_emitter.get_stats()
     })
 
 
@@ -599,6 +752,11 @@ def restart_application():
             logger.info("Exiting for restart (exit code 42)...")
             logger.info("If using run.sh, the application will restart automatically")
 
+            # os._exit skips atexit handlers
+            settings_store.flush()
+            warm_cache.flush()
+            upload_sessions.flush()
+
             # Exit with code 42 - the run.sh wrapper will catch this and restart
             os._exit(42)
 
@@ -628,6 +786,9 @@ def reboot_system():
             import time
             time.sleep(2)
             logger.info("Rebooting system...")
+            settings_store.flush()
+            warm_cache.flush()
+            upload_sessions.flush()
             subprocess.run(['sudo', 'reboot'], check=False)
 
         # Start the reboot in a background thread
@@ -653,6 +814,12 @@ def get_plugins():
     return jsonify(plugin_manager.get_plugin_info())
 
 
+@app.route('/plugins/stats', methods=['GET'])
+def get_plugin_stats():
+    """Get event queue statistics for all loaded plugins"""
+    return jsonify(plugin_manager.get_dispatch_stats())
+
+
 @app.route('/plugins/<plugin_id>/enable', methods=['POST'])
 def enable_plugin(plugin_id):
     """Enable a plugin"""
@@ -818,24 +985,39 @@ def get_plugin_ui():
 
 @app.route('/discover', methods=['POST'])
 def manual_discover():
-    """Manually trigger printer discovery"""
+    """
+    Return discovered printers; sweep first if {"refresh": true} is posted.
+
+    A Socket.IO client that posts its `sid` gets each reply as a
+    printer_discovered event while the sweep runs.
+    """
     try:
-        discovered = discover_printers()
+        body = request.get_json(silent=True) or {}
+        refresh = bool(body.get('refresh', False))
+        sid = body.get('sid')
+        if sid:
+            discovery_listeners.add(sid)
+        try:
+            discovered = discover_printers(refresh=refresh)
+        finally:
+            discovery_listeners.discard(sid)
         if discovered and len(discovered) > 0:
-            settings = load_settings()
-            for printer_id, printer in discovered.items():
-                settings["printers"][printer_id] = {
-                    "ip": printer["ip"],
-                    "name": printer["name"],
-                    "model": printer.get("model", "Unknown"),
-                    "brand": printer.get("brand", "Unknown"),
-                    "enabled": settings["printers"].get(printer_id, {}).get("enabled", True),
-                    "manual": False
-                }
-            save_settings(settings)
+            dismissed_printers.difference_update(discovered)
+            def remember_discovered(settings):
+                saved = settings.setdefault("printers", {})
+                for printer_id, printer in discovered.items():
+                    saved[printer_id] = {
+                        "ip": printer["ip"],
+                        "name": printer["name"],
+                        "model": printer.get("model", "Unknown"),
+                        "brand": printer.get("brand", "Unknown"),
+                        "enabled": saved.get(printer_id, {}).get("enabled", True),
+                        "manual": False
+                    }
+            settings_store.update(remember_discovered)
             
-            connect_printers(discovered)
-            socketio.emit('printers', printers)
+            connected = printer_registry.connections()
+            connect_printers({pid: printer_registry.get(pid) for pid in discovered if pid not in connected})
             
             return jsonify({"success": True, "printers": discovered, "count": len(discovered)})
         else:
@@ -858,51 +1040,41 @@ def add_manual_printer():
         
         printer_id = hashlib.md5(printer_ip.encode()).hexdigest()
         
-        settings = load_settings()
-        if printer_id in settings.get("printers", {}):
+        # Check and insert in one update, so two requests for the same IP
+        # can't both add it
+        added = []
+        def remember_manual(settings):
+            saved = settings.setdefault("printers", {})
+            if printer_id in saved:
+                return
+            saved[printer_id] = {
+                "ip": printer_ip,
+                "name": printer_name,
+                "model": "Manual",
+                "brand": "Unknown",
+                "enabled": True,
+                "manual": True
+            }
+            added.append(printer_id)
+        settings_store.update(remember_manual)
+        if not added:
             return jsonify({"success": False, "message": "Printer already exists"}), 400
         
-        printer = {
-            'connection': printer_id,
-            'name': printer_name,
-            'model': 'Manual',
-            'brand': 'Unknown',
-            'ip': printer_ip,
-            'protocol': 'Unknown',
-            'firmware': 'Unknown'
-        }
-        
-        printers[printer_id] = printer
-        
-        settings["printers"][printer_id] = {
-            "ip": printer_ip,
-            "name": printer_name,
-            "model": "Manual",
-            "brand": "Unknown",
-            "enabled": True,
-            "manual": True
-        }
-        save_settings(settings)
+        printer = PrinterRecord(connection=printer_id, name=printer_name, ip=printer_ip, model='Manual')
+        printer_registry.put(printer_id, printer)
         
         url = f"ws://{printer_ip}:3030/websocket"
         logger.info(f"Attempting to connect to printer at {url}")
+        conn = connection_engine.connect(printer_id, url, printer.name)
+        printer_registry.attach(printer_id, conn)
         
-        websocket.setdefaulttimeout(2)
-        ws = websocket.WebSocketApp(url,
-                                    on_message=ws_msg_handler,
-                                    on_open=lambda _: ws_connected_handler(printer['name']),
-                                    on_close=lambda _, s, m: logger.info(
-                                        "Connection to '{n}' closed: {m} ({s})".format(n=printer['name'], m=m, s=s)),
-                                    on_error=lambda _, e: logger.warning(
-                                        "Connection to '{n}' error: {e}".format(n=printer['name'], e=e))
-                                    )
-        websockets[printer_id] = ws
-        Thread(target=lambda: ws.run_forever(reconnect=1), daemon=True).start()
+        # Answer as soon as the first connection attempt succeeds or fails
+        connected = conn.wait_online(readiness_timeout)
+        if not connected:
+            logger.info(f"Printer at {printer_ip} not online yet ({conn.state}); retrying in the background")
         
-        time.sleep(0.5)
-        
-        socketio.emit('printers', printers)
-        return jsonify({"success": True, "printer": printer, "printer_id": printer_id})
+        return jsonify({"success": True, "printer": printer.to_dict(), "printer_id": printer_id,
+                        "connected": connected})
     except Exception as e:
         logger.error(f"Error adding manual printer: {e}")
         return jsonify({"success": False, "message": str(e)}), 500
@@ -912,19 +1084,19 @@ def add_manual_printer():
 def remove_printer(printer_id):
     """Remove a printer"""
     try:
-        if printer_id in websockets:
-            websockets[printer_id].close()
-            del websockets[printer_id]
+        if printer_registry.detach(printer_id) is not None:
+            connection_engine.disconnect(printer_id)
         
-        if printer_id in printers:
-            del printers[printer_id]
+        dismissed_printers.add(printer_id)
+        printer_state.forget(printer_id)
+        warm_cache.forget(printer_id)
+        status_delta.reset(printer_id)
+        state_emitter.discard(printer_id)
+        fleet_summaries.pop(printer_id, None)
         
-        settings = load_settings()
-        if printer_id in settings["printers"]:
-            del settings["printers"][printer_id]
-            save_settings(settings)
+        settings_store.update(lambda settings: settings.get("printers", {}).pop(printer_id, None))
+        printer_registry.remove(printer_id)
         
-        socketio.emit('printers', printers)
         return jsonify({"success": True, "message": "Printer removed"})
     except Exception as e:
         logger.error(f"Error removing printer: {e}")
@@ -935,133 +1107,273 @@ def remove_printer(printer_id):
 
 @app.route('/progress')
 def progress():
-    """Server-sent events for upload progress"""
+    """Server-sent events for upload progress, queue position and throughput"""
     upload_id = request.args.get('upload_id', 'default')
 
     def publish_progress():
-        max_iterations = 200  # Prevent infinite loop (100 seconds max)
-        iterations = 0
-
-        while iterations < max_iterations:
-            with uploadProgressLock:
-                current_progress = uploadProgress.get(upload_id, 0)
+        # The browser subscribes before its POST has finished arriving, so the
+        # transfer may not exist yet; give up if it never shows up
+        unknown_since = time.monotonic()
+        while True:
+            transfer = transfer_scheduler.get(upload_id)
+            if transfer is None:
+                if time.monotonic() - unknown_since > 100:
+                    break
+                report = {"id": upload_id, "state": "pending", "progress": 0, "position": None}
+            else:
+                report = transfer_scheduler.describe(transfer)
+
+            yield "data:{p}\n\n".format(p=codec.dumps(report))
+
+            if transfer is not None and transfer.finished:
+                break
+            time.sleep(0.5)
 
-            yield "data:{p}\n\n".format(p=current_progress)
+    return Response(publish_progress(), mimetype="text/event-stream")
 
-            if current_progress >= 100:
-                # Clean up this upload's progress after sending 100%
-                time.sleep(1)
-                with uploadProgressLock:
-                    if upload_id in uploadProgress:
-                        del uploadProgress[upload_id]
-                break
 
-            time.sleep(0.5)
-            iterations += 1
+@app.route('/transfers', methods=['GET'])
+def list_transfers():
+    """Queued, running and recently finished printer transfers"""
+    return jsonify({"transfers": transfer_scheduler.list(), "stats": transfer_scheduler.get_stats(),
+                    "uploader": chunk_uploader.get_stats(), "resumable": upload_sessions.list()})
 
-        # Final cleanup in case loop exited due to timeout
-        with uploadProgressLock:
-            if upload_id in uploadProgress:
-                del uploadProgress[upload_id]
 
-    return Response(publish_progress(), mimetype="text/event-stream")
+@app.route('/upload/session', methods=['GET'])
+def upload_session():
+    """Offset an unfinished upload of a file (printer, md5, size) can continue from"""
+    try:
+        size = int(request.args.get('size', ''))
+    except ValueError:
+        return jsonify({"success": False, "message": "Missing or invalid size"}), 400
+    session = upload_sessions.find(request.args.get('printer', ''), request.args.get('md5', ''), size)
+    return jsonify({"success": True, "offset": session.offset if session else 0})
 
 
 @app.route('/upload', methods=['GET', 'POST'])
 def upload_file():
     if request.method == 'POST':
-        # Check if another upload is in progress
-        if not uploadLock.acquire(blocking=False):
-            logger.warning("Upload already in progress")
-            return Response('{"upload": "error", "msg": "Another upload is already in progress. Please wait."}', status=429, mimetype="application/json")
-
+        if 'file' not in request.files:
+            logger.error("No 'file' parameter in request.")
+            return Response('{"upload": "error", "msg": "Malformed request - no file."}', status=400, mimetype="application/json")
+        file = request.files['file']
+        if file.filename == '':
+            logger.error('No file selected to be uploaded.')
+            return Response('{"upload": "error", "msg": "No file selected."}', status=400, mimetype="application/json")
+        form_data = request.form.to_dict()
+        if 'printer' not in form_data or form_data['printer'] == "":
+            logger.error("No 'printer' parameter in request.")
+            return Response('{"upload": "error", "msg": "Malformed request - no printer."}', status=400, mimetype="application/json")
+        printer_id = form_data['printer']
+        printer = printer_registry.get(printer_id)
+        if printer is None:
+            logger.error(f"Unknown printer {printer_id}.")
+            return Response('{"upload": "error", "msg": "Unknown printer."}', status=400, mimetype="application/json")
+        if file and not allowed_file(file.filename):
+            logger.error("Invalid filetype.")
+            return Response('{"upload": "error", "msg": "Invalid filetype."}', status=400, mimetype="application/json")
+
+        # Generate unique upload ID for progress tracking
+        upload_id = form_data.get('upload_id', str(uuid.uuid4()))
+
+        # Right after boot, wait until we know whether the USB gadget is usable
+        if not startup.wait('storage', readiness_timeout):
+            logger.warning("Storage check not finished; uploading over the network")
+
+        filename = secure_filename(file.filename)
         try:
-            if 'file' not in request.files:
-                logger.error("No 'file' parameter in request.")
-                return Response('{"upload": "error", "msg": "Malformed request - no file."}', status=400, mimetype="application/json")
-            file = request.files['file']
-            if file.filename == '':
-                logger.error('No file selected to be uploaded.')
-                return Response('{"upload": "error", "msg": "No file selected."}', status=400, mimetype="application/json")
-            form_data = request.form.to_dict()
-            if 'printer' not in form_data or form_data['printer'] == "":
-                logger.error("No 'printer' parameter in request.")
-                return Response('{"upload": "error", "msg": "Malformed request - no printer."}', status=400, mimetype="application/json")
-            printer = printers[form_data['printer']]
-            if file and not allowed_file(file.filename):
-                logger.error("Invalid filetype.")
-                return Response('{"upload": "error", "msg": "Invalid filetype."}', status=400, mimetype="application/json")
-
-            # Generate unique upload ID for progress tracking
-            upload_id = form_data.get('upload_id', str(uuid.uuid4()))
-
-            filename = secure_filename(file.filename)
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-
-            logger.info(f"Saving '{filename}' to {filepath} (upload_id: {upload_id})")
-            try:
+            if USE_USB_GADGET:
+                filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+                logger.info(f"Saving '{filename}' to {filepath} (upload_id: {upload_id})")
                 file.save(filepath)
                 logger.info(f"✓ File '{filename}' saved successfully!")
+                return usb_gadget_upload_response(upload_id, filename)
+
+            # Upload to printer via network, straight from the request's spooled
+            # copy; waits in the transfer queue while the printer (or the global
+            # limit) is busy
+            logger.info(f"Uploading '{filename}' to printer '{printer.name}' (upload_id: {upload_id})...")
+            stream = file.stream
+            stream.seek(0, os.SEEK_END)
+            total = stream.tell()
+            stream.seek(0)
+            transfer = transfer_scheduler.submit(
+                upload_id, printer_id,
+                lambda transfer: upload_file_to_printer(printer.ip, filename, stream, transfer),
+                filename=filename, total=total)
+            transfer.wait()
+            return network_upload_response(transfer, filename)
+
+        except TransferExists as e:
+            logger.error(f"Upload rejected: {e}")
+            return upload_id_conflict_response(upload_id)
+        except Exception as e:
+            logger.error(f"Upload failed: {e}")
+            return Response(f'{{"upload": "error", "msg": "Upload failed: {str(e)}", "upload_id": "{upload_id}"}}', status=500, mimetype="application/json")
+    else:
+        return Response("u r doin it rong", status=405, mimetype='text/plain')
 
-                if USE_USB_GADGET:
-                    # File saved to USB gadget - trigger refresh to notify printer
-                    logger.info("Triggering USB gadget refresh to notify printer...")
-                    refresh_success = trigger_usb_gadget_refresh()
 
-                    if refresh_success:
-                        msg = "File saved to USB gadget. Printer should detect it automatically."
-                    else:
-                        msg = "File saved to USB gadget. You may need to refresh on the printer or reconnect USB."
-
-                    return Response(
-                        json.dumps({
-                            "upload": "success",
-                            "msg": msg,
-                            "upload_id": upload_id,
-                            "usb_gadget": True,
-                            "filename": filename,
-                            "refresh_triggered": refresh_success
-                        }),
-                        status=200,
-                        mimetype="application/json"
-                    )
-                else:
-                    # Upload to printer via network
-                    logger.info(f"Uploading to printer '{printer['name']}'...")
-                    success = upload_file_to_printer(printer['ip'], filepath, upload_id)
-
-                    if success:
-                        return Response(
-                            json.dumps({
-                                "upload": "success",
-                                "msg": "File uploaded to printer",
-                                "upload_id": upload_id,
-                                "usb_gadget": False,
-                                "filename": filename
-                            }),
-                            status=200,
-                            mimetype="application/json"
-                        )
-                    else:
-                        return Response(
-                            json.dumps({
-                                "upload": "error",
-                                "msg": "Failed to upload to printer",
-                                "upload_id": upload_id,
-                                "usb_gadget": False
-                            }),
-                            status=500,
-                            mimetype="application/json"
-                        )
+@app.route('/upload/stream', methods=['POST'])
+def upload_stream():
+    """
+    Upload a file sent as the raw request body.
+
+    Query parameters are printer, filename, upload_id, md5 and offset. With
+    the MD5 (computed by the browser, see web/js/md5.js) the body is
+    forwarded to the printer part by part while it is still arriving,
+    holding at most two parts in memory and writing nothing to disk. Without
+    it the body is spooled and hashed first. In USB gadget mode it's written
+    straight to the gadget.
+
+    To continue an unfinished upload, the body holds the file from the
+    offset reported by /upload/session, passed as `offset`. ChitUI never
+    sees the bytes before the offset then, so it can't check the body
+    against the MD5; verification falls back to the printer's own check
+    of the finished file (`Check=1`).
+    """
+    printer_id = request.args.get('printer', '')
+    if printer_id == "":
+        logger.error("No 'printer' parameter in request.")
+        return Response('{"upload": "error", "msg": "Malformed request - no printer."}', status=400, mimetype="application/json")
+    printer = printer_registry.get(printer_id)
+    if printer is None:
+        logger.error(f"Unknown printer {printer_id}.")
+        return Response('{"upload": "error", "msg": "Unknown printer."}', status=400, mimetype="application/json")
+    filename = secure_filename(request.args.get('filename', ''))
+    if filename == '':
+        logger.error('No file selected to be uploaded.')
+        return Response('{"upload": "error", "msg": "No file selected."}', status=400, mimetype="application/json")
+    if not allowed_file(filename):
+        logger.error("Invalid filetype.")
+        return Response('{"upload": "error", "msg": "Invalid filetype."}', status=400, mimetype="application/json")
+    if request.content_length is None:
+        logger.error("Streamed upload without Content-Length.")
+        return Response('{"upload": "error", "msg": "Malformed request - no Content-Length."}', status=411, mimetype="application/json")
+    md5 = request.args.get('md5') or None
+    if md5 is not None and (len(md5) != 32 or any(c not in '0123456789abcdefABCDEF' for c in md5)):
+        logger.error(f"Invalid MD5 '{md5}'.")
+        return Response('{"upload": "error", "msg": "Malformed request - invalid MD5."}', status=400, mimetype="application/json")
+    # A body that continues an upload session holds the file from `offset` on
+    offset = request.args.get('offset', '0')
+    if not offset.isdigit() or (int(offset) and md5 is None):
+        logger.error(f"Invalid offset '{offset}'.")
+        return Response('{"upload": "error", "msg": "Malformed request - invalid offset."}', status=400, mimetype="application/json")
+    offset = int(offset)
+    total = offset + request.content_length
+    if offset:
+        session = upload_sessions.find(printer_id, md5, total)
+        current = session.offset if session else 0
+        if current != offset:
+            logger.error(f"Upload session for '{filename}' is at offset {current}, not {offset}.")
+            return jsonify({"upload": "error", "msg": "Upload session has changed; send the file again.",
+                            "offset": current}), 409
+
+    upload_id = request.args.get('upload_id') or str(uuid.uuid4())
+
+    # Right after boot, wait until we know whether the USB gadget is usable
+    if not startup.wait('storage', readiness_timeout):
+        logger.warning("Storage check not finished; uploading over the network")
+
+    stream = request.stream
+    spool = None
+    try:
+        if USE_USB_GADGET and offset:
+            return Response('{"upload": "error", "msg": "Only network uploads can be continued."}', status=400, mimetype="application/json")
+        if USE_USB_GADGET:
+            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+            logger.info(f"Saving streamed '{filename}' to {filepath} (upload_id: {upload_id})")
+            with open(filepath, 'wb') as f:
+                for part in read_parts(stream, total):
+                    f.write(part)
+            logger.info(f"✓ File '{filename}' saved successfully!")
+            return usb_gadget_upload_response(upload_id, filename)
+
+        source = stream
+        if md5 is None:
+            spool = tempfile.TemporaryFile(dir=spool_folder(total))
+            for part in read_parts(stream, total):
+                spool.write(part)
+            spool.seek(0)
+            source = spool
+
+        logger.info(f"Streaming '{filename}' to printer '{printer.name}' (upload_id: {upload_id})...")
+        transfer = transfer_scheduler.submit(
+            upload_id, printer_id,
+            lambda transfer: upload_file_to_printer(printer.ip, filename, source, transfer, md5, offset),
+            filename=filename, total=total)
+        if not transfer.wait() and spool is None:
+            # Read what's left of the body so the browser gets the error response
+            stream.exhaust()
+        return network_upload_response(transfer, filename)
+
+    except TransferExists as e:
+        logger.error(f"Upload rejected: {e}")
+        return upload_id_conflict_response(upload_id)
+    except Exception as e:
+        logger.error(f"Upload failed: {e}")
+        return Response(f'{{"upload": "error", "msg": "Upload failed: {str(e)}", "upload_id": "{upload_id}"}}', status=500, mimetype="application/json")
+    finally:
+        if spool is not None:
+            spool.close()
 
-            except Exception as e:
-                logger.error(f"Upload failed: {e}")
-                return Response(f'{{"upload": "error", "msg": "Upload failed: {str(e)}", "upload_id": "{upload_id}"}}', status=500, mimetype="application/json")
-        finally:
-            # Always release the lock
-            uploadLock.release()
+
+def upload_id_conflict_response(upload_id):
+    """Response for an upload whose upload_id belongs to a transfer still in progress"""
+    return jsonify({"upload": "error", "msg": "An upload with this upload_id is still in progress.",
+                    "upload_id": upload_id}), 409
+
+
+def usb_gadget_upload_response(upload_id, filename):
+    """Trigger a USB gadget refresh for a saved file and build the upload response"""
+    # File saved to USB gadget - trigger refresh to notify printer
+    logger.info("Triggering USB gadget refresh to notify printer...")
+    refresh_success = trigger_usb_gadget_refresh()
+
+    if refresh_success:
+        msg = "File saved to USB gadget. Printer should detect it automatically."
     else:
-        return Response("u r doin it rong", status=405, mimetype='text/plain')
+        msg = "File saved to USB gadget. You may need to refresh on the printer or reconnect USB."
+
+    return Response(
+        json.dumps({
+            "upload": "success",
+            "msg": msg,
+            "upload_id": upload_id,
+            "usb_gadget": True,
+            "filename": filename,
+            "refresh_triggered": refresh_success
+        }),
+        status=200,
+        mimetype="application/json"
+    )
+
+
+def network_upload_response(transfer, filename):
+    """Build the upload response for a finished printer transfer"""
+    if transfer.state == 'done':
+        return Response(
+            json.dumps({
+                "upload": "success",
+                "msg": "File uploaded to printer",
+                "upload_id": transfer.id,
+                "usb_gadget": False,
+                "filename": filename,
+                "rate": round(transfer.rate())
+            }),
+            status=200,
+            mimetype="application/json"
+        )
+    return Response(
+        json.dumps({
+            "upload": "error",
+            "msg": f"Failed to upload to printer: {transfer.error}" if transfer.error else "Failed to upload to printer",
+            "upload_id": transfer.id,
+            "usb_gadget": False
+        }),
+        status=500,
+        mimetype="application/json"
+    )
 
 
 @app.route('/usb-gadget/refresh', methods=['POST'])
@@ -1099,111 +1411,160 @@ def allowed_file(filename):
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-def upload_file_to_printer(printer_ip, filepath, upload_id):
-    """Upload file to printer in chunks via HTTP API"""
-    part_size = 1048576  # 1MB chunks
-    filename = os.path.basename(filepath)
-
-    # Initialize progress for this upload
-    with uploadProgressLock:
-        uploadProgress[upload_id] = 0
-
-    # Calculate MD5 hash
-    md5_hash = hashlib.md5()
-    with open(filepath, "rb") as f:
-        for byte_block in iter(lambda: f.read(4096), b""):
+def upload_file_to_printer(printer_ip, filename, stream, transfer, md5=None, offset=0):
+    """
+    Upload a file to the printer via its HTTP API (run by the transfer scheduler).
+
+    An earlier upload of the same file to the same printer that didn't finish
+    is continued from the last offset the printer acknowledged.
+
+    Args:
+        printer_ip: Printer address
+        filename: Name of the file on the printer
+        stream: File object to read the file from, starting at `offset`; must
+                be seekable unless md5 is given
+        transfer: Transfer whose progress is updated
+        md5: Hex MD5 of the file when known up front (e.g. from the browser).
+             The stream is then forwarded as it is read, and the last part is
+             only sent if the data matched (not checked when the stream starts
+             at `offset`; the printer's own check still applies). Otherwise it
+             is hashed first.
+        offset: Position in the file `stream` starts at, for clients that
+                continue an upload session by sending only the rest
+
+    Returns:
+        True if the printer accepted every part
+    """
+    verify = md5 is not None
+    if md5 is None:
+        md5_hash = hashlib.md5()
+        for byte_block in iter(lambda: stream.read(65536), b""):
             md5_hash.update(byte_block)
+        stream.seek(0)
+        md5 = md5_hash.hexdigest()
 
-    file_stats = os.stat(filepath)
-    post_data = {
-        'S-File-MD5': md5_hash.hexdigest(),
-        'Check': 1,
-        'Offset': 0,
-        'Uuid': uuid.uuid4(),
-        'TotalSize': file_stats.st_size,
-    }
-
-    url = 'http://{ip}:3030/uploadFile/upload'.format(ip=printer_ip)
-    num_parts = (int)(file_stats.st_size / part_size)
-    logger.info(f"Uploading file in {num_parts + 1} parts...")
-
-    i = 0
-    while i <= num_parts:
-        offset = i * part_size
-        progress_value = round(i / num_parts * 100) if num_parts > 0 else 100
-
-        # Update progress (thread-safe)
-        with uploadProgressLock:
-            uploadProgress[upload_id] = progress_value
-
-        with open(filepath, 'rb') as f:
-            f.seek(offset)
-            file_part = f.read(part_size)
-            logger.debug(f"Uploading part {i}/{num_parts} (offset: {offset})")
-
-            if not upload_file_part(url, post_data, filename, file_part, offset):
-                logger.error("Uploading file to printer failed.")
-                # Set progress to 0 to indicate failure
-                with uploadProgressLock:
-                    uploadProgress[upload_id] = 0
-                return False
-
-            logger.debug(f"Part {i}/{num_parts} uploaded.")
-        i += 1
-
-    # Set progress to 100% (thread-safe)
-    with uploadProgressLock:
-        uploadProgress[upload_id] = 100
+    session = upload_sessions.open(transfer.printer_id, md5, transfer.total, filename)
+    if offset and session.offset != offset:
+        transfer.error = f"Upload session is at offset {session.offset}, not {offset}"
+        return False
+    digest = None
+    if not offset and session.offset:
+        # The whole file was sent again; skip what the printer already has
+        if verify:
+            # Still hash the skipped bytes, so the last part is checked
+            # against md5 as in a fresh upload
+            digest = hashlib.md5()
+            for part in read_parts(stream, session.offset):
+                digest.update(part)
+        else:
+            stream.seek(session.offset)
+        offset = session.offset
+    if offset:
+        logger.info(f"Resuming '{filename}' at {offset} of {transfer.total} bytes")
+    transfer.sent = offset
 
-    logger.info(f"✓ Upload complete!")
+    def sent(nbytes):
+        transfer.sent += nbytes
+        upload_sessions.acked(session, transfer.sent)
 
-    # Delete the temporary file after successful upload
+    url = 'http://{ip}:3030/uploadFile/upload'.format(ip=printer_ip)
+    logger.info(f"Uploading '{filename}' ({transfer.total} bytes) to {printer_ip}...")
     try:
-        os.remove(filepath)
-        logger.debug(f"Temporary file {filepath} removed")
-    except OSError as e:
-        logger.warning(f"Could not remove temporary file {filepath}: {e}")
+        try:
+            # Shares the global upload bandwidth with other printers' transfers
+            chunk_uploader.upload(url, filename, stream, transfer.total, md5, verify=verify,
+                                  throttle=transfer_scheduler.throttle, progress=sent,
+                                  file_uuid=session.uuid, offset=offset, digest=digest)
+        except ResumeRejected as e:
+            # The printer dropped the partial file (e.g. it restarted)
+            upload_sessions.forget(session)
+            if verify:
+                raise UploadError(f"{e}; upload the file again to send it from the start")
+            logger.warning(f"{e}; sending '{filename}' from the start")
+            stream.seek(0)
+            session = upload_sessions.open(transfer.printer_id, md5, transfer.total, filename)
+            transfer.sent = 0
+            chunk_uploader.upload(url, filename, stream, transfer.total, md5,
+                                  throttle=transfer_scheduler.throttle, progress=sent,
+                                  file_uuid=session.uuid)
+    except UploadError as e:
+        logger.error(f"Uploading file to printer failed: {e}")
+        transfer.error = str(e)
+        if isinstance(e, ChecksumMismatch):
+            # Sending the same data again would fail the same way
+            upload_sessions.forget(session)
+        elif session.offset:
+            percent = int(session.offset * 100 / transfer.total)
+            transfer.error += f" ({percent}% is on the printer; upload the same file again to continue)"
+        upload_sessions.flush()
+        return False
 
+    upload_sessions.forget(session)
+    upload_sessions.flush()
+    logger.info(f"✓ Upload complete!")
     return True
 
 
-def upload_file_part(url, post_data, file_name, file_part, offset):
-    """Upload a single chunk to the printer"""
-    post_data['Offset'] = offset
-    post_files = {'File': (file_name, file_part)}
-    
-    try:
-        response = requests.post(url, data=post_data, files=post_files, timeout=30)
-        status = json.loads(response.text)
-        
-        if status.get('success'):
-            return True
-        else:
-            logger.error(f"Upload part failed: {status}")
-            return False
-    except Exception as e:
-        logger.error(f"Upload part error: {e}")
-        return False
+def read_parts(stream, total, part_size=UPLOAD_BLOCK_SIZE):
+    """
+    Yield `total` bytes from a stream in parts of `part_size` (the last may be
+    shorter; an empty file is one empty part). Only the current part is held
+    in memory.
+
+    Raises:
+        IOError: The stream ended early (e.g. the browser went away)
+    """
+    remaining = total
+    while True:
+        want = min(part_size, remaining)
+        part = stream.read(want)
+        while len(part) < want:
+            more = stream.read(want - len(part))
+            if not more:
+                raise IOError(f"Upload ended after {total - remaining + len(part)} of {total} bytes")
+            part += more
+        remaining -= want
+        yield part
+        if remaining <= 0:
+            break
 
 
-# Global variables for upload progress tracking (thread-safe)
-uploadProgress = {}  # Dictionary to track progress per upload session
-uploadProgressLock = threading.Lock()
-uploadLock = threading.Lock()  # Prevent concurrent uploads
+# Uploads to different printers run at the same time, one per printer
+transfer_scheduler = TransferScheduler(max_concurrent=upload_concurrency,
+                                       max_bandwidth=upload_bandwidth)
+# Sends each upload over a keep-alive session per printer, in parts sized
+# to the measured link, retrying failed parts
+chunk_uploader = ChunkUploader(max_part=upload_max_part, retries=upload_retries)
+# Unfinished uploads (Uuid and acknowledged offset per printer and file), so
+# sending the same file again continues where the printer left off
+upload_sessions = UploadSessionStore(UPLOAD_SESSIONS_FILE)
+atexit.register(upload_sessions.flush)
 
 
 # ============ SOCKETIO HANDLERS ============
 
+# Socket.IO event used to deliver each cached message kind
+STATE_EVENTS = {
+    'status': 'printer_status',
+    'attributes': 'printer_attributes',
+    'notice': 'printer_notice',
+}
+
+
 @socketio.on('connect')
 def sio_handle_connect(auth):
     logger.info('Client connected')
-    logger.info(f'Available printers: {list(printers.keys())}')
-    socketio.emit('printers', printers)
+    snapshot = printer_registry.snapshot()
+    logger.info(f'Available printers: {list(snapshot)}')
+    socketio.emit('printers', snapshot.printers, to=request.sid)
+    # Last-known state so the dashboard renders without querying the printers
+    socketio.emit('printer_snapshot', state_snapshot(list(snapshot)), to=request.sid)
 
 
 @socketio.on('disconnect')
 def sio_handle_disconnect():
     logger.info('Client disconnected')
+    viewing_printer.pop(request.sid, None)
 
 
 @socketio.on('printers')
@@ -1215,45 +1576,68 @@ def sio_handle_printers(data):
 @socketio.on('printer_info')
 def sio_handle_printer_status(data):
     logger.debug(f"client.printer_info >> {data['id']}")
-    get_printer_status(data['id'])
-    get_printer_attributes(data['id'])
+    subscribe_printer(request.sid, data['id'])
+    serve_printer_state(request.sid, data['id'], 'status', get_printer_status)
+    serve_printer_state(request.sid, data['id'], 'attributes', get_printer_attributes)
+
+
+@socketio.on('printer_status_resync')
+def sio_handle_printer_status_resync(data):
+    """Client missed a status delta and needs the full document again"""
+    logger.debug(f"client.printer_status_resync >> {data['id']}")
+    full = status_delta.full(data['id'])
+    if full is not None:
+        socketio.emit('printer_status', full, to=request.sid)
+    else:
+        get_printer_status(data['id'])
 
 
 @socketio.on('printer_files')
 def sio_handle_printer_files(data):
-    logger.debug(f'client.printer_files >> {json.dumps(data)}')
-    get_printer_files(data['id'], data['url'])
+    logger.opt(lazy=True).debug('client.printer_files >> {d}', d=lambda: codec.dumps(data))
+    subscribe_printer(request.sid, data['id'])
+    id, url = data['id'], data['url']
+    # Last-known list first, then the printer's answer replaces it
+    cached = warm_cache.files(id, url)
+    if cached is not None:
+        socketio.emit('printer_response', dict(cached, Stale=True), to=request.sid)
+
+    def remember(future):
+        if future.exception() is None:
+            warm_cache.set_files(id, url, future.result())
+
+    reply_printer_cmd(request.sid, id, 258, {"Url": url}).add_done_callback(remember)
 
 
 @socketio.on('action_delete')
 def sio_handle_action_delete(data):
-    logger.debug(f'client.action_delete >> {json.dumps(data)}')
+    logger.opt(lazy=True).debug('client.action_delete >> {d}', d=lambda: codec.dumps(data))
     
     send_printer_cmd(data['id'], 259, {"FileList": [data['data']]})
 
 
 @socketio.on('action_print')
 def sio_handle_action_print(data):
-    logger.debug(f'client.action_print >> {json.dumps(data)}')
+    logger.opt(lazy=True).debug('client.action_print >> {d}', d=lambda: codec.dumps(data))
     send_printer_cmd(data['id'], 128, {
                      "Filename": data['data'], "StartLayer": 0})
 
 
 @socketio.on('action_pause')
 def sio_handle_action_pause(data):
-    logger.debug(f'client.action_pause >> {json.dumps(data)}')
+    logger.opt(lazy=True).debug('client.action_pause >> {d}', d=lambda: codec.dumps(data))
     send_printer_cmd(data['id'], 129)
 
 
 @socketio.on('action_resume')
 def sio_handle_action_resume(data):
-    logger.debug(f'client.action_resume >> {json.dumps(data)}')
+    logger.opt(lazy=True).debug('client.action_resume >> {d}', d=lambda: codec.dumps(data))
     send_printer_cmd(data['id'], 131)
 
 
 @socketio.on('action_stop')
 def sio_handle_action_stop(data):
-    logger.debug(f'client.action_stop >> {json.dumps(data)}')
+    logger.opt(lazy=True).debug('client.action_stop >> {d}', d=lambda: codec.dumps(data))
     send_printer_cmd(data['id'], 130)
 
 
@@ -1269,7 +1653,7 @@ def sio_handle_action_wipe_storage(data):
     logger.warning(f"FORMATTING LOCAL STORAGE on printer {data['id']}")
     printer_id = data['id']
     
-    if printer_id not in printers:
+    if printer_registry.get(printer_id) is None:
         logger.error(f"Printer {printer_id} not found")
         return
     
@@ -1282,14 +1666,31 @@ def sio_handle_action_wipe_storage(data):
 
 @socketio.on('get_attributes')
 def sio_handle_get_attributes(data):
-    logger.debug(f'client.get_attributes >> {json.dumps(data)}')
+    logger.opt(lazy=True).debug('client.get_attributes >> {d}', d=lambda: codec.dumps(data))
+    # Explicit refresh (e.g. after wiping storage) always queries the printer
     get_printer_attributes(data['id'])
 
 
 @socketio.on('get_task_details')
 def sio_handle_get_task_details(data):
-    logger.debug(f'client.get_task_details >> {json.dumps(data)}')
-    send_printer_cmd(data['id'], 321, {"Id": [data['taskId']]})
+    logger.opt(lazy=True).debug('client.get_task_details >> {d}', d=lambda: codec.dumps(data))
+    reply_printer_cmd(request.sid, data['id'], 321, {"Id": [data['taskId']]})
+
+
+def printer_room(id):
+    """Socket.IO room receiving the traffic of one printer"""
+    return f"printer:{id}"
+
+
+def subscribe_printer(sid, id):
+    """Move a client into the room of the printer it is viewing"""
+    previous = viewing_printer.get(sid)
+    if previous == id:
+        return
+    if previous is not None:
+        leave_room(printer_room(previous), sid=sid)
+    join_room(printer_room(id), sid=sid)
+    viewing_printer[sid] = id
 
 
 # ============ PRINTER CONTROL FUNCTIONS ============
@@ -1306,120 +1707,251 @@ def get_printer_files(id, url):
     send_printer_cmd(id, 258, {"Url": url})
 
 
+def serve_printer_state(sid, id, kind, query):
+    """Answer a client from the state cache, querying the printer only when stale"""
+    message = printer_state.get_fresh(id, kind)
+    if message is not None:
+        if kind == 'status':
+            # Send the sequenced document so later deltas apply cleanly
+            message = status_delta.full(id) or message
+        socketio.emit(STATE_EVENTS[kind], message, to=sid)
+    else:
+        # Show the last-known state (e.g. from before a restart) while asking
+        stale = printer_state.get(id, kind)
+        if stale is not None:
+            socketio.emit(STATE_EVENTS[kind], dict(stale, Stale=True), to=sid)
+        query(id)
+
+
+def state_snapshot(ids):
+    """Cached state for several printers, with status as a sequenced full document"""
+    snapshot = printer_state.snapshot(ids)
+    for id, state in snapshot.items():
+        if 'status' in state:
+            state['status'] = status_delta.full(id) or state['status']
+        if printer_state.seeded(id):
+            # Only known from the previous run so far
+            state['stale'] = True
+    connections = printer_registry.connections()
+    for id in ids:
+        if id in connections:
+            snapshot.setdefault(id, {})['connection'] = connections[id].get_state()
+    return snapshot
+
+
 def send_printer_cmd(id, cmd, data={}):
-    printer = printers.get(id)
+    """Send a command; its response is broadcast to every client"""
+    future = command_api.call_async(id, cmd, data, broadcast=True)
+    return not (future.done() and future.exception() is not None)
+
+
+def reply_printer_cmd(sid, id, cmd, data={}):
+    """Send a command and deliver its response only to the requesting client"""
+    def deliver(future):
+        try:
+            socketio.emit('printer_response', future.result(), to=sid)
+        except CommandError as e:
+            logger.warning(f"Cmd {cmd} for client {sid} failed: {e}")
+
+    future = command_api.call_async(id, cmd, data)
+    future.add_done_callback(deliver)
+    return future
+
+
+def write_printer_cmd(id, cmd, data, request_id):
+    """Write an SDCP request to the printer's websocket"""
+    printer = printer_registry.get(id)
     if not printer:
         logger.error(f"Printer {id} not found")
         return False
         
-    if id not in websockets:
+    conn = printer_registry.connection(id)
+    if conn is None:
         logger.error(f"No websocket connection for printer {id}")
         return False
         
     ts = int(time.time())
     payload = {
-        "Id": printer['connection'],
+        "Id": printer.connection,
         "Data": {
             "Cmd": cmd,
             "Data": data,
-            "RequestID": os.urandom(8).hex(),
+            "RequestID": request_id,
             "MainboardID": id,
             "TimeStamp": ts,
             "From": 0
         },
         "Topic": "sdcp/request/" + id
     }
-    logger.debug("printer << \n{p}", p=json.dumps(payload, indent=4))
+    logger.opt(lazy=True).debug("printer << \n{p}", p=lambda: codec.dumps_pretty(payload))
     
     try:
-        websockets[id].send(json.dumps(payload))
+        # Queued per printer; identical queued queries share one request
+        carrier = conn.send_request(request_id, cmd, data, codec.dumps(payload))
+        if carrier != request_id and not pending_requests.alias(request_id, carrier):
+            return False
         return True
+    except QueueFull as e:
+        logger.warning(f"Command {cmd} for printer {id} rejected: {e}")
+        return False
     except Exception as e:
         logger.error(f"Failed to send command to printer {id}: {e}")
         return False
 
 
+# Responses are matched to their request by RequestID
+pending_requests = PendingRequests(default_timeout=10)
+command_api = CommandAPI(write_printer_cmd, pending_requests)
+app.extensions['chitui_commands'] = command_api
+
+
 # ============ PRINTER DISCOVERY & CONNECTION ============
 
-def discover_printers():
-    logger.info("Starting printer discovery.")
-    msg = b'M99999'
-    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM,
-                         socket.IPPROTO_UDP)
-    sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-    sock.settimeout(discovery_timeout)
-    sock.bind(('', 54781))
-    sock.sendto(msg, ("255.255.255.255", 3000))
-    socketOpen = True
-    discovered_printers = {}
-    while (socketOpen):
-        try:
-            data = sock.recv(8192)
-            save_discovered_printer(data, discovered_printers)
-        except TimeoutError:
-            sock.close()
-            break
-    logger.info("Discovery done.")
-    return discovered_printers
-
-
-def save_discovered_printer(data, printer_dict):
-    j = json.loads(data.decode('utf-8'))
-    printer = {}
-    printer['connection'] = j['Id']
-    printer['name'] = j['Data']['Name']
-    printer['model'] = j['Data']['MachineName']
-    printer['brand'] = j['Data']['BrandName']
-    printer['ip'] = j['Data']['MainboardIP']
-    printer['protocol'] = j['Data']['ProtocolVersion']
-    printer['firmware'] = j['Data']['FirmwareVersion']
-    printer_dict[j['Data']['MainboardID']] = printer
-    printers[j['Data']['MainboardID']] = printer
-    logger.info("Discovered: {n} ({i})".format(
-        n=printer['name'], i=printer['ip']))
-    return printer_dict
+def discover_printers(refresh=False):
+    """
+    Return discovered printers from the discovery cache.
+
+    Args:
+        refresh: Probe the network and wait `discovery_timeout` for replies
+                 instead of returning the cache (also done if the cache is empty)
+    """
+    discovered = discovery_service.results()
+    if refresh or not discovered:
+        discovered = discovery_service.sweep(discovery_timeout)
+    printer_registry.merge({printer_id: PrinterRecord.from_dict(printer)
+                            for printer_id, printer in discovered.items()}, replace=False)
+    return discovered
+
+
+def printer_discovered(printer_id, printer):
+    """Discovery callback: track new printers and follow IP changes"""
+    # Stream replies to the dialogs waiting on a sweep, not to every client
+    # on every background probe
+    for sid in list(discovery_listeners):
+        socketio.emit('printer_discovered', dict(printer, id=printer_id), to=sid)
+
+    known = printer_registry.get(printer_id)
+    if known is not None and known.ip == printer['ip']:
+        # Printer is answering again; don't wait out the reconnect backoff
+        connection_engine.wake(printer_id)
+        return
+    if printer_id in dismissed_printers:
+        return
+
+    logger.info("Discovered: {n} ({i})".format(n=printer['name'], i=printer['ip']))
+    record = PrinterRecord.from_dict(printer)
+    printer_registry.put(printer_id, record)
+    if known is not None:
+        # Printer moved to a new address; reconnect if we were connected
+        if printer_registry.connection(printer_id) is not None:
+            connect_printers({printer_id: record})
+    elif load_settings().get("auto_discover", True):
+        connect_printers({printer_id: record})
+
+
+def settings_changed(old, new):
+    discovery_service.subnets = new.get("discovery_subnets", [])
+
+
+settings_store.subscribe(settings_changed)
+
+# Printers removed by the user are not re-added by background discovery
+dismissed_printers = set()
+# Socket.IO clients whose /discover sweep is running
+discovery_listeners = set()
+discovery_service = DiscoveryService(on_result=printer_discovered,
+                                     interval=discovery_interval,
+                                     ttl=discovery_ttl)
 
 
 def connect_printers(printers_to_connect):
+    """Open (or reopen) connections to printers given as printer_id -> PrinterRecord"""
     for id, printer in printers_to_connect.items():
-        url = "ws://{ip}:3030/websocket".format(ip=printer['ip'])
-        logger.info("Connecting to: {n}".format(n=printer['name']))
-        websocket.setdefaulttimeout(1)
-        ws = websocket.WebSocketApp(url,on_message=ws_msg_handler,
-                                    on_open=lambda _: ws_connected_handler(
-                                        printer['name']),
-                                    on_close=lambda _, s, m: logger.info(
-                                        "Connection to '{n}' closed: {m} ({s})".format(n=printer['name'], m=m, s=s)),
-                                    on_error=lambda _, e: logger.info(
-                                        "Connection to '{n}' error: {e}".format(n=printer['name'], e=e))
-                                    )
-        websockets[id] = ws
-        Thread(target=lambda: ws.run_forever(reconnect=1), daemon=True).start()
+        url = "ws://{ip}:3030/websocket".format(ip=printer.ip)
+        logger.info("Connecting to: {n}".format(n=printer.name))
+        printer_registry.attach(id, connection_engine.connect(id, url, printer.name))
 
     return True
 
 
-def ws_connected_handler(name):
-    logger.info("Connected to: {n}".format(n=name))
-    socketio.emit('printers', printers)
+def printers_changed(old, new):
+    """Registry subscriber: clients get the printer list only when it changes"""
+    socketio.emit('printers', new.printers)
+    for printer_id, record in new.records.items():
+        if old.get(printer_id) != record:
+            warm_cache.update(printer_id, 'printer', record.to_dict())
 
 
-def ws_msg_handler(ws, msg):
-    try:
-        data = json.loads(msg)
-        logger.debug("printer >> \n{m}", m=json.dumps(data, indent=4))
+printer_registry.subscribe(printers_changed)
+
+
+def ws_connected_handler(conn):
+    logger.info("Connected to: {n}".format(n=conn.name))
+    # Clients get a full status again after a reconnect
+    status_delta.reset(conn.printer_id)
+
 
-        # Notify plugins of printer message
-        printer_id = data.get('MainboardID')
-        if printer_id:
-            plugin_manager.notify_printer_message(printer_id, data)
+def ws_closed_handler(conn):
+    logger.info("Connection to '{n}' closed".format(n=conn.name))
 
+
+def ws_error_handler(conn, error):
+    # Offline printers retry with backoff; only the first failure is worth a log line
+    if conn.failures == 1:
+        logger.info("Connection to '{n}' error: {e}".format(n=conn.name, e=error))
+    else:
+        logger.debug("Connection to '{n}' error ({f} failures): {e}".format(
+            n=conn.name, f=conn.failures, e=error))
+
+
+def ws_state_handler(conn, previous):
+    if conn.state == 'online':
+        record = printer_registry.get(conn.printer_id)
+        plugin_manager.notify_printer_connected(conn.printer_id, record.to_dict() if record else {})
+    elif previous == 'online':
+        plugin_manager.notify_printer_disconnected(conn.printer_id)
+    # A replaced connection winding down is not the printer's state
+    if printer_registry.connection(conn.printer_id) is conn:
+        socketio.emit('printer_connection', conn.get_state())
+
+
+def ws_dropped_handler(conn, request_id):
+    pending_requests.fail(request_id, CommandError(
+        f"Connection to '{conn.name}' closed before the command was sent"))
+
+
+def ws_msg_handler(ws, msg):
+    try:
+        data = codec.loads(msg)
+        # Pretty-printed only when debug logging is enabled
+        logger.opt(lazy=True).debug("printer >> \n{m}", m=lambda: codec.dumps_pretty(data))
+
+        # The connection's registry id, which rooms, caches and deltas are
+        # keyed by (not always the MainboardID in the topic)
+        printer_id = ws.printer_id
+
+        # Notify subscribed plugins of printer message
+        plugin_manager.notify_printer_message(printer_id, data)
+        data = for_printer(data, printer_id)
+
+        # Remember the last-known status/attributes/notice for new clients
+        kind = topic_kind(data['Topic'])
+        if kind is not None:
+            printer_state.update(printer_id, kind, data)
+            if kind != 'notice':
+                warm_cache.update(printer_id, kind, data)
+
+        # Printer traffic only goes to clients viewing that printer;
+        # errors and notices are rare and shown to everyone
+        room = printer_room(printer_id)
         if data['Topic'].startswith("sdcp/response/"):
-            socketio.emit('printer_response', data)
-        elif data['Topic'].startswith("sdcp/status/"):
-            socketio.emit('printer_status', data)
-        elif data['Topic'].startswith("sdcp/attributes/"):
-            socketio.emit('printer_attributes', data)
+            ws.ack(data.get('Data', {}).get('RequestID'))
+            request_entry = pending_requests.resolve(data)
+            if request_entry is None or request_entry.broadcast:
+                socketio.emit('printer_response', data, to=room)
+        elif data['Topic'].startswith("sdcp/status/") or data['Topic'].startswith("sdcp/attributes/"):
+            # Bursty topics are coalesced and emitted at a bounded rate
+            state_emitter.submit(printer_id, kind, data)
         elif data['Topic'].startswith("sdcp/error/"):
             socketio.emit('printer_error', data)
         elif data['Topic'].startswith("sdcp/notice/"):
@@ -1432,55 +1964,109 @@ def ws_msg_handler(ws, msg):
         logger.error(f"Error handling websocket message: {e}")
 
 
+def emit_printer_state(printer_id, kind, data):
+    """Emit the latest coalesced status/attributes message of a printer"""
+    room = printer_room(printer_id)
+    if kind == 'attributes':
+        socketio.emit('printer_attributes', data, to=room)
+        return
+
+    # Only the keys that changed since the last broadcast are sent
+    payload, is_full = status_delta.push(printer_id, data)
+    if payload is not None:
+        socketio.emit('printer_status' if is_full else 'printer_status_delta', payload, to=room)
+    # Fleet-wide list gets a small summary, and only when it changes
+    summary = status_summary(printer_id, data)
+    if fleet_summaries.get(printer_id) != summary:
+        fleet_summaries[printer_id] = summary
+        socketio.emit('printer_summary', summary)
+
+
+state_emitter = CoalescingEmitter(emit_printer_state, max_rate=status_emit_rate)
+
+
+# All printer websockets share a single event loop thread
+connection_engine = ConnectionEngine(on_message=ws_msg_handler,
+                                     on_open=ws_connected_handler,
+                                     on_close=ws_closed_handler,
+                                     on_error=ws_error_handler,
+                                     on_dropped=ws_dropped_handler,
+                                     on_state=ws_state_handler,
+                                     reconnect_delay=1,
+                                     max_reconnect_delay=max_reconnect_delay,
+                                     open_timeout=2,
+                                     heartbeat_interval=heartbeat_interval,
+                                     max_queue=outbound_queue_size,
+                                     max_unacked=outbound_max_unacked)
+
+
 def load_saved_printers():
     """Load and connect to saved printers from settings"""
     settings = load_settings()
     
-    if settings.get("auto_discover", False):
-        logger.info("Auto-discovery is enabled, discovering printers...")
-        discover_printers()
+    enabled = [printer_id for printer_id, printer_config in settings.get("printers", {}).items()
+               if printer_config.get("enabled", True)]
+    saved = {}
+    for printer_id in enabled:
+        if printer_id not in printer_registry.snapshot():
+            printer_config = settings["printers"][printer_id]
+            # Firmware/protocol aren't in settings; take them from the last run
+            cached = warm_cache.get(printer_id, 'printer') or {}
+            saved[printer_id] = PrinterRecord.from_dict({**cached, **printer_config, 'connection': printer_id})
+            logger.info(f"Loaded saved printer: {printer_config['name']} ({printer_config['ip']})")
+    # One change (and one 'printers' emit) for the whole list
+    printer_registry.merge(saved, replace=False)
     
-    for printer_id, printer_config in settings.get("printers", {}).items():
-        if printer_config.get("enabled", True):
-            if printer_id not in printers:
-                printer = {
-                    'connection': printer_id,
-                    'name': printer_config['name'],
-                    'model': printer_config.get('model', 'Unknown'),
-                    'brand': printer_config.get('brand', 'Unknown'),
-                    'ip': printer_config['ip'],
-                    'protocol': printer_config.get('protocol', 'Unknown'),
-                    'firmware': printer_config.get('firmware', 'Unknown')
-                }
-                printers[printer_id] = printer
-                logger.info(f"Loaded saved printer: {printer_config['name']} ({printer_config['ip']})")
-            
-            if printer_id not in websockets:
-                connect_printers({printer_id: printers[printer_id]})
+    connected = printer_registry.connections()
+    connect_printers({printer_id: printer_registry.get(printer_id) for printer_id in enabled
+                      if printer_id not in connected})
 
 
 # ============ MAIN ============
 
-def main():
+def start_discovery():
+    # Printers found are connected as their replies arrive
     settings = load_settings()
+    if settings.get("auto_discover", True):
+        logger.info("Starting with auto-discovery enabled")
+    else:
+        discovery_service.interval = None
+    discovery_service.subnets = settings.get("discovery_subnets", [])
+    discovery_service.start()
+
+
+def load_warm_cache():
+    """Serve the previous run's printer state until the printers answer"""
+    for printer_id, entry in warm_cache.load().items():
+        for kind in ('status', 'attributes'):
+            if kind in entry:
+                printer_state.seed(printer_id, kind, entry[kind])
 
-    # Load plugins
+
+def load_plugins():
     logger.info("Loading plugins...")
     plugin_manager.load_all_plugins(app, socketio)
 
-    if settings.get("auto_discover", True):
-        logger.info("Starting with auto-discovery enabled")
-        discovered = discover_printers()
-        if discovered:
-            connect_printers(discovered)
-            socketio.emit('printers', printers)
-        else:
-            logger.warning("No printers discovered.")
 
-    load_saved_printers()
+def main():
+    """Start up in stages; only what must precede the first request runs here"""
+    # Flask refuses new blueprints once it has served a request, so plugins
+    # load before the server binds; the warm cache is a single small read
+    startup.run_now('warm_cache', load_warm_cache)
+    startup.run_now('upload_sessions', upload_sessions.load)
+    startup.run_now('plugins', load_plugins)
+
+    # The rest runs while the HTTP server is already answering; /status
+    # reports progress under "startup"
+    startup.run('storage', detect_storage)
+    startup.run('discovery', start_discovery)
+    startup.run('printers', load_saved_printers)
 
 
 if __name__ == "__main__":
+    # systemd stops the service with SIGTERM; exit normally so atexit
+    # handlers write pending settings and the printer cache
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
     main()
 
     logger.info("=" * 60)
@@ -1495,13 +2081,7 @@ if __name__ == "__main__":
         logger.warning(f"  ⚠ Running with sudo - pip operations will affect root's Python environment")
     logger.info(f"Features:")
     logger.info(f"  ✓ Printer Management")
-    if USE_USB_GADGET:
-        logger.info(f"  ✓ File Upload (USB Gadget Mode)")
-        logger.info(f"     → Files saved to: {UPLOAD_FOLDER}")
-        logger.info(f"     → Connect USB to printer to access files")
-    else:
-        logger.info(f"  ✓ File Upload (Network Transfer)")
-        logger.info(f"     → Files uploaded directly to printer")
+    logger.info(f"  ✓ File Upload (USB gadget or network transfer, checked in the background)")
     if CAMERA_SUPPORT:
         logger.info(f"  ✓ Camera Streaming (RTSP)")
     else:
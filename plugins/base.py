@@ -5,6 +5,34 @@ Base plugin class for ChitUI plugin system
 from abc import ABC, abstractmethod
 from flask import Blueprint
 import os
+import re
+
+
+def dependency_installed(requirement):
+    """
+    Check a pip requirement (e.g. 'requests>=2.0.0') against installed packages.
+
+    Returns:
+        True if a matching distribution is installed
+    """
+    try:
+        from importlib import metadata
+    except ImportError:
+        # Python 3.7: let pip decide
+        return False
+    try:
+        from packaging.requirements import Requirement
+        parsed = Requirement(requirement)
+        name, specifier = parsed.name, parsed.specifier
+    except ImportError:
+        name, specifier = re.split(r'[<>=!~;\[\s]', requirement.strip(), maxsplit=1)[0], None
+    except Exception:
+        return False
+    try:
+        version = metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return False
+    return specifier is None or specifier.contains(version, prereleases=True)
 
 
 class ChitUIPlugin(ABC):
@@ -55,6 +83,24 @@ class ChitUIPlugin(ABC):
         """
         return []
 
+    def get_subscriptions(self):
+        """
+        Return the printer messages this plugin receives in on_printer_message.
+
+        Read from the 'subscriptions' key of plugin.json by default, e.g.:
+            {"topics": ["sdcp/status/*", "sdcp/error/*"], "commands": [321]}
+
+        Returns:
+            Dict with optional 'topics' (fnmatch patterns matched against the
+            message Topic) and 'commands' (Cmd numbers of sdcp/response/
+            messages), or None to receive every message
+        """
+        subscriptions = self.manifest.get('subscriptions')
+        if subscriptions is None and type(self).on_printer_message is ChitUIPlugin.on_printer_message:
+            # Plugin doesn't handle printer messages at all
+            return {}
+        return subscriptions
+
     def load_manifest(self):
         """Load plugin.json manifest file"""
         import json
@@ -65,16 +111,17 @@ class ChitUIPlugin(ABC):
         return {}
 
     def install_dependencies(self):
-        """Install plugin dependencies using pip"""
+        """Install missing plugin dependencies using pip"""
         import subprocess
-        deps = self.get_dependencies()
-        if deps:
-            for dep in deps:
-                try:
-                    subprocess.check_call(['pip', 'install', dep])
-                    return True
-                except subprocess.CalledProcessError:
-                    return False
+        # Checking installed distributions is instant; pip takes seconds even
+        # when there is nothing to do, and this runs on every startup
+        for dep in self.get_dependencies():
+            if dependency_installed(dep):
+                continue
+            try:
+                subprocess.check_call(['pip', 'install', dep])
+            except subprocess.CalledProcessError:
+                return False
         return True
 
     def get_blueprint(self):
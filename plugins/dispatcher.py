@@ -0,0 +1,212 @@
+"""
+Plugin Event Dispatcher for ChitUI
+
+Delivers printer events to each plugin on its own worker thread through a
+bounded queue, so a slow plugin never delays the printer connection or
+the other plugins.
+"""
+
+import fnmatch
+import threading
+import time
+from collections import deque
+from loguru import logger
+
+
+class PluginWorker:
+    """Worker thread and bounded event queue for a single plugin"""
+
+    def __init__(self, plugin_name, plugin, max_queue=256):
+        """
+        Initialize the worker.
+
+        Args:
+            plugin_name: Plugin directory name (used in logs and stats)
+            plugin: ChitUIPlugin instance receiving the events
+            max_queue: Queue size; the oldest event is dropped when full
+        """
+        self.plugin_name = plugin_name
+        self.plugin = plugin
+        self.max_queue = max_queue
+        self.queue = deque()
+        self.running = True
+        self.processed = 0
+        self.dropped = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name=f'plugin-{plugin_name}', daemon=True)
+        self._thread.start()
+
+    def put(self, handler, args):
+        """Queue a call of plugin.<handler>(*args)"""
+        with self._cond:
+            if len(self.queue) >= self.max_queue:
+                self.queue.popleft()
+                self.dropped += 1
+                if self.dropped == 1 or self.dropped % 100 == 0:
+                    logger.warning(f"Plugin {self.plugin_name} is falling behind, "
+                                   f"{self.dropped} events dropped")
+            self.queue.append((handler, args))
+            self._cond.notify()
+
+    def stop(self):
+        """Stop the worker once the current event is handled"""
+        with self._cond:
+            self.running = False
+            self.queue.clear()
+            self._cond.notify()
+
+    def get_stats(self):
+        """Return queue depth, overflow and handler latency figures"""
+        with self._cond:
+            return {
+                'queue_depth': len(self.queue),
+                'max_queue': self.max_queue,
+                'processed': self.processed,
+                'dropped': self.dropped,
+                'avg_ms': round(self.total_ms / self.processed, 2) if self.processed else None,
+                'max_ms': round(self.max_ms, 2),
+            }
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self.running and not self.queue:
+                    self._cond.wait()
+                if not self.running:
+                    return
+                handler, args = self.queue.popleft()
+
+            start = time.perf_counter()
+            try:
+                getattr(self.plugin, handler)(*args)
+            except Exception as e:
+                logger.error(f"Plugin error in {handler}: {e}")
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+            with self._cond:
+                self.processed += 1
+                self.total_ms += elapsed_ms
+                if elapsed_ms > self.max_ms:
+                    self.max_ms = elapsed_ms
+
+
+class PluginDispatcher:
+    """Fans printer events out to per-plugin workers"""
+
+    def __init__(self, max_queue=256):
+        """
+        Initialize the dispatcher.
+
+        Args:
+            max_queue: Queue size for each plugin worker
+        """
+        self.max_queue = max_queue
+        self.workers = {}
+        self._lock = threading.Lock()
+
+    def add(self, plugin_name, plugin):
+        """Start a worker for a loaded plugin"""
+        with self._lock:
+            previous = self.workers.get(plugin_name)
+            self.workers[plugin_name] = PluginWorker(plugin_name, plugin, self.max_queue)
+        if previous is not None:
+            previous.stop()
+
+    def remove(self, plugin_name):
+        """Stop the worker of an unloaded plugin"""
+        with self._lock:
+            worker = self.workers.pop(plugin_name, None)
+        if worker is not None:
+            worker.stop()
+
+    def dispatch(self, handler, *args):
+        """Queue plugin.<handler>(*args) for every plugin, in order per plugin"""
+        with self._lock:
+            workers = list(self.workers.values())
+        for worker in workers:
+            worker.put(handler, args)
+
+    def dispatch_to(self, plugin_names, handler, *args):
+        """Queue plugin.<handler>(*args) for the named plugins only"""
+        with self._lock:
+            workers = [self.workers[name] for name in plugin_names if name in self.workers]
+        for worker in workers:
+            worker.put(handler, args)
+
+    def get_stats(self):
+        """Return per-plugin queue statistics"""
+        with self._lock:
+            workers = list(self.workers.items())
+        return {name: worker.get_stats() for name, worker in workers}
+
+
+class SubscriptionIndex:
+    """
+    Routing index from printer message topics/commands to plugins.
+
+    Subscriptions come from ChitUIPlugin.get_subscriptions(). Routes are
+    computed once per distinct (topic, cmd) and cached, so dispatching a
+    message is a single dictionary lookup.
+    """
+
+    MAX_ROUTES = 4096
+
+    def __init__(self):
+        self._subscriptions = {}
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def set(self, plugin_name, subscriptions):
+        """
+        Register what a plugin subscribes to.
+
+        Args:
+            plugin_name: Plugin directory name
+            subscriptions: None for every message, otherwise a dict with
+                           optional 'topics' (fnmatch patterns) and 'commands'
+                           (Cmd numbers of sdcp/response/ messages)
+        """
+        if subscriptions is not None:
+            subscriptions = (
+                tuple(subscriptions.get('topics') or ()),
+                frozenset(int(c) for c in subscriptions.get('commands') or ()),
+            )
+        with self._lock:
+            self._subscriptions[plugin_name] = subscriptions
+            self._routes.clear()
+
+    def remove(self, plugin_name):
+        """Forget a plugin's subscriptions"""
+        with self._lock:
+            self._subscriptions.pop(plugin_name, None)
+            self._routes.clear()
+
+    def route(self, topic, cmd=None):
+        """
+        Return the names of the plugins interested in a message.
+
+        Args:
+            topic: Message Topic (e.g. 'sdcp/status/<MainboardID>')
+            cmd: Cmd number for sdcp/response/ messages, otherwise None
+        """
+        key = (topic, cmd)
+        with self._lock:
+            names = self._routes.get(key)
+            if names is None:
+                names = tuple(name for name, subscription in self._subscriptions.items()
+                              if self._matches(subscription, topic, cmd))
+                if len(self._routes) >= self.MAX_ROUTES:
+                    self._routes.clear()
+                self._routes[key] = names
+            return names
+
+    @staticmethod
+    def _matches(subscription, topic, cmd):
+        if subscription is None:
+            return True
+        patterns, commands = subscription
+        if cmd is not None and cmd in commands:
+            return True
+        return any(fnmatch.fnmatchcase(topic, pattern) for pattern in patterns)
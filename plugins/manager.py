@@ -9,6 +9,7 @@ import sys
 import json
 import importlib.util
 from loguru import logger
+from .dispatcher import PluginDispatcher, SubscriptionIndex
 
 
 class PluginManager:
@@ -25,6 +26,8 @@ class PluginManager:
         self.plugins = {}
         self.enabled_plugins = {}
         self.settings_file = os.path.expanduser('~/.chitui/plugin_settings.json')
+        self.dispatcher = PluginDispatcher()
+        self.subscriptions = SubscriptionIndex()
 
         # Ensure plugins directory exists
         os.makedirs(self.plugins_dir, exist_ok=True)
@@ -95,6 +98,7 @@ class PluginManager:
                     'description': manifest.get('description', ''),
                     'path': plugin_path,
                     'manifest': manifest,
+                    'subscriptions': manifest.get('subscriptions'),
                     'enabled': self.enabled_plugins.get(item, True)
                 }
             except Exception as e:
@@ -162,6 +166,8 @@ class PluginManager:
                 app.register_blueprint(blueprint, url_prefix=f'/plugin/{plugin_name}')
 
             self.plugins[plugin_name] = plugin_instance
+            self.subscriptions.set(plugin_name, plugin_instance.get_subscriptions())
+            self.dispatcher.add(plugin_name, plugin_instance)
             logger.info(f"Plugin loaded: {plugin_name} v{plugin_instance.get_version()}")
 
             return plugin_instance
@@ -195,6 +201,8 @@ class PluginManager:
 
         # Call shutdown hook if plugin is loaded
         if plugin_name in self.plugins:
+            self.dispatcher.remove(plugin_name)
+            self.subscriptions.remove(plugin_name)
             self.plugins[plugin_name].on_shutdown()
             del self.plugins[plugin_name]
 
@@ -225,25 +233,29 @@ class PluginManager:
         return info_list
 
     def notify_printer_connected(self, printer_id, printer_info):
-        """Notify all plugins that a printer connected"""
-        for plugin in self.plugins.values():
-            try:
-                plugin.on_printer_connected(printer_id, printer_info)
-            except Exception as e:
-                logger.error(f"Plugin error in on_printer_connected: {e}")
+        """Notify all plugins that a printer connected (on their worker threads)"""
+        self.dispatcher.dispatch('on_printer_connected', printer_id, printer_info)
 
     def notify_printer_disconnected(self, printer_id):
-        """Notify all plugins that a printer disconnected"""
-        for plugin in self.plugins.values():
-            try:
-                plugin.on_printer_disconnected(printer_id)
-            except Exception as e:
-                logger.error(f"Plugin error in on_printer_disconnected: {e}")
+        """Notify all plugins that a printer disconnected (on their worker threads)"""
+        self.dispatcher.dispatch('on_printer_disconnected', printer_id)
 
     def notify_printer_message(self, printer_id, message):
-        """Notify all plugins of a printer message"""
-        for plugin in self.plugins.values():
-            try:
-                plugin.on_printer_message(printer_id, message)
-            except Exception as e:
-                logger.error(f"Plugin error in on_printer_message: {e}")
+        """
+        Notify all plugins of a printer message.
+
+        Only plugins subscribed to the message topic (or response Cmd) get it.
+        Each plugin handles messages on its own worker thread, in the order
+        they arrived, so this returns without waiting for the plugins.
+        """
+        topic = message.get('Topic', '')
+        cmd = None
+        if topic.startswith('sdcp/response/') and isinstance(message.get('Data'), dict):
+            cmd = message['Data'].get('Cmd')
+        plugin_names = self.subscriptions.route(topic, cmd)
+        if plugin_names:
+            self.dispatcher.dispatch_to(plugin_names, 'on_printer_message', printer_id, message)
+
+    def get_dispatch_stats(self):
+        """Get per-plugin event queue depth, drops and handler latency"""
+        return self.dispatcher.get_stats()
@@ -10,6 +10,7 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../..'))
 
 from plugins.base import ChitUIPlugin
+from core import codec
 from flask import Blueprint, render_template_string, jsonify, request
 from datetime import datetime
 
@@ -112,8 +113,7 @@ class Plugin(ChitUIPlugin):
         try:
             # Format the message for display
             if isinstance(message, dict):
-                import json
-                msg_str = json.dumps(message, indent=2)
+                msg_str = codec.dumps_pretty(message)
             else:
                 msg_str = str(message)
 
@@ -6,6 +6,7 @@ var progress = null
 var printStatusModal = null
 var cameraFullscreenModal = null
 var cameraActive = false
+var statusDocs = {}  // Last full status message per printer, patched by deltas
 
 socket.on("connect", () => {
   console.log('socket.io connected: ' + socket.id);
@@ -73,13 +74,98 @@ socket.on("printer_notice", (data) => {
 });
 
 socket.on("printer_status", (data) => {
+  statusDocs[data.MainboardID] = data
   handle_printer_status(data)
 });
 
+socket.on("printer_status_delta", (delta) => {
+  var doc = statusDocs[delta.MainboardID]
+  if (doc && delta.Seq <= doc.Seq) {
+    // Already contained in a full document we received
+    return
+  }
+  if (!doc || delta.Seq !== doc.Seq + 1) {
+    // Missed an update (or never had a base document), ask for a full one
+    delete statusDocs[delta.MainboardID]
+    socket.emit("printer_status_resync", { id: delta.MainboardID })
+    return
+  }
+  applyStatusPatch(doc.Status, delta.Changes)
+  $.each(delta.Removed || [], function (i, path) {
+    removeStatusPath(doc.Status, path)
+  })
+  doc.Seq = delta.Seq
+  doc.TimeStamp = delta.TimeStamp
+  handle_printer_status(doc)
+});
+
 socket.on("printer_attributes", (data) => {
   handle_printer_attributes(data)
 });
 
+socket.on("printer_summary", (summary) => {
+  // Fleet-wide list update for printers this client isn't viewing
+  if (!printers[summary.MainboardID] || !summary.CurrentStatus) {
+    return
+  }
+  updatePrinterStatus({ MainboardID: summary.MainboardID, Status: { CurrentStatus: summary.CurrentStatus } })
+});
+
+socket.on("printer_connection", (data) => {
+  handle_printer_connection(data)
+});
+
+socket.on("printer_snapshot", (data) => {
+  // Last-known state cached by the server, sent once on connect
+  $.each(data, function (id, state) {
+    if (!printers[id]) {
+      return
+    }
+    if (state.connection) {
+      handle_printer_connection(state.connection)
+    }
+    if (state.stale) {
+      // Served from the previous run until the printer answers
+      $('#printer_' + id).attr('title', 'Last known state, refreshing')
+    }
+    if (state.status) {
+      statusDocs[id] = state.status
+      handle_printer_status(state.status)
+    }
+    if (state.attributes) {
+      handle_printer_attributes(state.attributes)
+    }
+    if (state.notice) {
+      // Don't alert old notices again, just keep them for reference
+      printers[id]['notice'] = state.notice
+    }
+  })
+});
+
+function handle_printer_connection(data) {
+  // Connection supervisor state: connecting, online, offline or backoff
+  if (!printers[data.id]) {
+    return
+  }
+  printers[data.id]['connection_state'] = data.state
+  var info = $('#printer_' + data.id).find('.printerInfo')
+  switch (data.state) {
+    case 'online':
+      $('#printer_' + data.id).removeAttr('title')
+      info.text("Connected")
+      updatePrinterStatusIcon(data.id, "success", false)
+      break
+    case 'connecting':
+      info.text("Connecting")
+      updatePrinterStatusIcon(data.id, "secondary", true)
+      break
+    default:
+      info.text(data.retry_in ? `Offline, retrying in ${Math.ceil(data.retry_in)}s` : "Offline")
+      updatePrinterStatusIcon(data.id, "danger", false)
+      break
+  }
+}
+
 function handle_printer_status(data) {
   if (!printers[data.MainboardID].hasOwnProperty('status')) {
     printers[data.MainboardID]['status'] = {}
@@ -113,6 +199,26 @@ function handle_printer_status(data) {
   }
 }
 
+function applyStatusPatch(target, changes) {
+  $.each(changes, function (key, val) {
+    if ($.isPlainObject(val) && $.isPlainObject(target[key])) {
+      applyStatusPatch(target[key], val)
+    } else {
+      target[key] = val
+    }
+  })
+}
+
+function removeStatusPath(target, path) {
+  for (var i = 0; i < path.length - 1; i++) {
+    target = target[path[i]]
+    if (!$.isPlainObject(target)) {
+      return
+    }
+  }
+  delete target[path[path.length - 1]]
+}
+
 function handle_printer_attributes(data) {
   console.log(data)
   if (!printers[data.MainboardID].hasOwnProperty('attributes')) {
@@ -281,13 +387,13 @@ function addPrinters(printers) {
       showPrinter($(this).data('printer-id'))
     })
     $("#printersList").append(item)
-    console.log('Emitting printer_info for printer:', id)
-    socket.emit("printer_info", { id: id })
   });
 }
 
 function showPrinter(id) {
   currentPrinter = id
+  // Subscribes this client to the printer's room and fetches its state
+  socket.emit("printer_info", { id: id })
   var p = printers[id]
   var printerIcon = (p.brand + '_' + p.model).split(" ").join("").toLowerCase()
   $('#printerName').text(p.name)
@@ -1080,25 +1186,54 @@ $('#btnUpload').on('click', function () {
 function uploadFile() {
   // Generate a unique upload ID for progress tracking
   var uploadId = generateUUID();
+  var file = $('#uploadFile')[0].files[0];
+
+  // With the file's MD5 computed here, the server forwards the upload to the
+  // printer while it arrives instead of receiving the whole file first
+  if (file && file.size > 0 && typeof md5File == 'function' && window.Promise) {
+    md5File(file, function (percent) {
+      $('#progressUpload').text('Checksum: ' + percent + '%').css('width', percent + '%');
+    }).then(function (md5) {
+      var printer = $('#uploadPrinter').val();
+      // An earlier upload of this file that didn't finish continues where
+      // the printer left off, so only the rest is sent
+      $.getJSON('/upload/session', { printer: printer, md5: md5, size: file.size }).always(function (session) {
+        var offset = (session && session.offset) || 0;
+        var query = $.param({ printer: printer, filename: file.name, upload_id: uploadId, md5: md5, offset: offset });
+        sendUpload(uploadId, { url: '/upload/stream?' + query, data: file.slice(offset), contentType: 'application/octet-stream' }, true);
+      });
+    }, function (error) {
+      console.warn('Could not checksum file, uploading without streaming:', error);
+      uploadForm(uploadId);
+    });
+  } else {
+    uploadForm(uploadId);
+  }
+}
 
+function uploadForm(uploadId) {
   // Get the form data and add the upload ID
   var formData = new FormData($('#formUpload')[0]);
   formData.append('upload_id', uploadId);
+  sendUpload(uploadId, { url: '/upload', data: formData, contentType: false }, false);
+}
 
-  // Start progress tracking BEFORE starting upload to avoid race condition
-  var progressEventSource = null;
-  var progressStarted = false;
+function sendUpload(uploadId, options, streaming) {
+  // A streamed upload goes to the printer as it is sent, so its progress is
+  // the printer's; a form upload reaches the printer after it has arrived
+  var progressEventSource = streaming ? fileTransferProgress(uploadId) : null;
+  var progressStarted = streaming;
 
   var req = $.ajax({
-    url: '/upload',
+    url: options.url,
     type: 'POST',
-    data: formData,
+    data: options.data,
     cache: false,
-    contentType: false,
+    contentType: options.contentType,
     processData: false,
     xhr: function () {
       var myXhr = $.ajaxSettings.xhr();
-      if (myXhr.upload) {
+      if (myXhr.upload && !streaming) {
         myXhr.upload.addEventListener('progress', function (e) {
           if (e.lengthComputable) {
             var percent = Math.floor(e.loaded / e.total * 100);
@@ -1195,10 +1330,20 @@ function fileTransferProgress(uploadId) {
   var progress = new EventSource('/progress?upload_id=' + uploadId);
 
   progress.onmessage = function (event) {
-    if (event.data > 0) {
-      $('#progressUpload').text('Upload to printer: ' + event.data + '%').css('width', event.data + '%').addClass('text-bg-warning');
+    // {state, position, progress, rate, ...} from the transfer scheduler
+    var transfer = JSON.parse(event.data)
+    if (transfer.state == 'queued') {
+      var waiting = transfer.position ? ' (#' + transfer.position + ')' : ''
+      $('#progressUpload').text('Queued for printer' + waiting).css('width', '100%').addClass('text-bg-warning');
+    } else if (transfer.progress > 0) {
+      var rate = transfer.rate ? ' - ' + (transfer.rate / 1048576).toFixed(1) + ' MB/s' : ''
+      $('#progressUpload').text('Upload to printer: ' + transfer.progress + '%' + rate).css('width', transfer.progress + '%').addClass('text-bg-warning');
+    }
+    if (transfer.state == 'failed') {
+      progress.close()
+      return
     }
-    if (event.data == 100) {
+    if (transfer.progress == 100) {
       setTimeout(function () {
         $('#progressUpload').text('0%').css('width', '0%');
         setTimeout(function () {
@@ -0,0 +1,152 @@
+/**
+ * Incremental MD5 for ChitUI
+ *
+ * The printer's upload protocol wants the file's MD5 with every chunk. When
+ * the browser computes it, the server can forward a file to the printer
+ * while it is still being uploaded instead of staging it first.
+ *
+ *   var md5 = new MD5();
+ *   md5.update(uint8Array);   // any number of times
+ *   md5.hex();                // '9e107d9d372bb6826bd81d3542a419d6'
+ *
+ *   md5File(file, onProgress).then(function (hex) { ... });
+ */
+(function (global) {
+  'use strict';
+
+  var SHIFTS = [7, 12, 17, 22, 5, 9, 14, 20, 4, 11, 16, 23, 6, 10, 15, 21];
+  var K = new Int32Array(64);
+  for (var i = 0; i < 64; i++) {
+    K[i] = Math.floor(Math.abs(Math.sin(i + 1)) * 4294967296);
+  }
+
+  function MD5() {
+    this.state = new Int32Array([0x67452301, 0xefcdab89, 0x98badcfe, 0x10325476]);
+    this.buffer = new Uint8Array(64);
+    this.buffered = 0;
+    this.length = 0;
+    this.words = new Int32Array(16);
+  }
+
+  MD5.prototype.update = function (bytes) {
+    var offset = 0;
+    var n = bytes.length;
+    this.length += n;
+
+    // Complete a block left over from the previous update
+    if (this.buffered) {
+      var take = Math.min(64 - this.buffered, n);
+      this.buffer.set(bytes.subarray(0, take), this.buffered);
+      this.buffered += take;
+      offset = take;
+      if (this.buffered < 64) return this;
+      this.block(this.buffer, 0);
+      this.buffered = 0;
+    }
+    for (; offset + 64 <= n; offset += 64) {
+      this.block(bytes, offset);
+    }
+    if (offset < n) {
+      this.buffer.set(bytes.subarray(offset), 0);
+      this.buffered = n - offset;
+    }
+    return this;
+  };
+
+  MD5.prototype.block = function (bytes, offset) {
+    var w = this.words;
+    for (var j = 0; j < 16; j++) {
+      var p = offset + j * 4;
+      w[j] = bytes[p] | (bytes[p + 1] << 8) | (bytes[p + 2] << 16) | (bytes[p + 3] << 24);
+    }
+    var s = this.state;
+    var a = s[0], b = s[1], c = s[2], d = s[3];
+    for (var r = 0; r < 64; r++) {
+      var f, g;
+      if (r < 16) {
+        f = (b & c) | (~b & d);
+        g = r;
+      } else if (r < 32) {
+        f = (d & b) | (~d & c);
+        g = (5 * r + 1) & 15;
+      } else if (r < 48) {
+        f = b ^ c ^ d;
+        g = (3 * r + 5) & 15;
+      } else {
+        f = c ^ (b | ~d);
+        g = (7 * r) & 15;
+      }
+      var shift = SHIFTS[(r >> 4) * 4 + (r & 3)];
+      var x = (a + f + K[r] + w[g]) | 0;
+      a = d;
+      d = c;
+      c = b;
+      b = (b + ((x << shift) | (x >>> (32 - shift)))) | 0;
+    }
+    s[0] = (s[0] + a) | 0;
+    s[1] = (s[1] + b) | 0;
+    s[2] = (s[2] + c) | 0;
+    s[3] = (s[3] + d) | 0;
+  };
+
+  MD5.prototype.hex = function () {
+    // Pad a copy so update() can still be called afterwards
+    var copy = new MD5();
+    copy.state.set(this.state);
+    copy.buffer.set(this.buffer);
+    copy.buffered = this.buffered;
+
+    var bits = this.length * 8;
+    var tail = new Uint8Array((this.buffered < 56 ? 64 : 128) - this.buffered);
+    tail[0] = 0x80;
+    var low = bits % 4294967296;
+    var high = Math.floor(bits / 4294967296);
+    for (var j = 0; j < 4; j++) {
+      tail[tail.length - 8 + j] = (low >>> (j * 8)) & 0xff;
+      tail[tail.length - 4 + j] = (high >>> (j * 8)) & 0xff;
+    }
+    copy.update(tail);
+
+    var hex = '';
+    for (var k = 0; k < 16; k++) {
+      var byte = (copy.state[k >> 2] >>> ((k & 3) * 8)) & 0xff;
+      hex += (byte < 16 ? '0' : '') + byte.toString(16);
+    }
+    return hex;
+  };
+
+  function readSlice(blob) {
+    return new Promise(function (resolve, reject) {
+      var reader = new FileReader();
+      reader.onload = function () { resolve(new Uint8Array(reader.result)); };
+      reader.onerror = function () { reject(reader.error); };
+      reader.readAsArrayBuffer(blob);
+    });
+  }
+
+  /**
+   * Hash a File/Blob in slices, so large files aren't read into memory at once.
+   * onProgress (optional) is called with the percent hashed so far.
+   * Returns a Promise of the hex digest.
+   */
+  function md5File(file, onProgress) {
+    var sliceSize = 4 * 1048576;
+    var md5 = new MD5();
+    var offset = 0;
+
+    function next() {
+      if (offset >= file.size) return Promise.resolve(md5.hex());
+      var end = Math.min(offset + sliceSize, file.size);
+      return readSlice(file.slice(offset, end)).then(function (bytes) {
+        md5.update(bytes);
+        offset = end;
+        if (onProgress) onProgress(Math.floor(offset / file.size * 100));
+        return next();
+      });
+    }
+    return next();
+  }
+
+  global.MD5 = MD5;
+  global.md5File = md5File;
+})(typeof window !== 'undefined' ? window : this);
@@ -26,6 +26,20 @@ $(document).ready(function() {
         currentSettings.auto_discover = $(this).is(':checked');
     });
 
+    // Discovery subnets
+    $('#discoverySubnets').change(function() {
+        currentSettings.discovery_subnets = $(this).val().split(',')
+            .map(function(s) { return s.trim(); })
+            .filter(function(s) { return s.length > 0; });
+    });
+
+    // Discovery replies stream in while a sweep is running
+    socket.on('printer_discovered', function(printer) {
+        if (discoveryFound === null) return;
+        discoveryFound[printer.id] = printer;
+        $('#discoverProgress').text(`Found ${Object.keys(discoveryFound).length}: ${printer.name} (${printer.ip})`);
+    });
+
     // Load settings when modal opens
     $('#modalSettings').on('show.bs.modal', function() {
         console.log('Settings modal opened');
@@ -61,6 +75,7 @@ function loadSettings() {
 function updateSettingsUI() {
     // Update auto-discover checkbox
     $('#autoDiscoverCheck').prop('checked', currentSettings.auto_discover || false);
+    $('#discoverySubnets').val((currentSettings.discovery_subnets || []).join(', '));
     
     // Update saved printers list
     const savedPrintersList = $('#savedPrintersList');
@@ -101,6 +116,9 @@ function updateSettingsUI() {
     }
 }
 
+// Printers found by the running discovery sweep (null when idle)
+let discoveryFound = null;
+
 // Discover printers
 function discoverPrinters() {
     const $btn = $('#btnDiscover');
@@ -108,13 +126,17 @@ function discoverPrinters() {
     
     $btn.prop('disabled', true);
     $spinner.removeClass('d-none');
+    discoveryFound = {};
+    $('#discoverProgress').text('');
     
     console.log('Starting printer discovery...');
     
     $.ajax({
         url: '/discover',
         method: 'POST',
-        timeout: 5000, // 5 second timeout
+        contentType: 'application/json',
+        data: JSON.stringify({ refresh: true, sid: socket.id }),
+        timeout: 30000, // subnet sweeps can take a few seconds
         success: function(data) {
             console.log('Discovery response:', data);
             if (data.success) {
@@ -137,6 +159,7 @@ function discoverPrinters() {
         complete: function() {
             $btn.prop('disabled', false);
             $spinner.addClass('d-none');
+            discoveryFound = null;
         }
     });
 }
@@ -185,14 +208,14 @@ function addManualPrinter() {
         success: function(data) {
             console.log('Add printer response:', data);
             if (data.success) {
-                showToast(`Added printer "${name}" - attempting to connect...`, 'success');
+                if (data.connected) {
+                    showToast(`Added printer "${name}" - connected`, 'success');
+                } else {
+                    showToast(`Added printer "${name}" - not reachable yet, retrying in the background`, 'warning');
+                }
                 $('#manualPrinterIP').val('');
                 $('#manualPrinterName').val('');
-                
-                // Wait a moment for connection, then reload settings
-                setTimeout(function() {
-                    loadSettings();
-                }, 1500);
+                loadSettings();
             } else {
                 showToast(data.message || 'Failed to add printer', 'danger');
             }